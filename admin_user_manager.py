@@ -1,140 +1,129 @@
-import requests
 import configparser
 import os
 import sys
-from typing import List, Dict, Any
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+
+from planfix_client import PlanfixClient, PlanfixError
+from task_index import TaskIndex, INDEX_FIELDS
+from task_model import REPORT_CLOSED_STATUSES
+
+# Типы фильтров Planfix по ролям пользователя в задаче
+ROLE_TYPES = {
+    2: 'assignee',   # исполнитель
+    3: 'assigner',   # постановщик
+    4: 'auditor',    # контролер
+}
+
+def summarize_role_tasks(role_tasks: Dict[int, List[Dict]]) -> Dict[str, int]:
+    """
+    Считает статистику пользователя по задачам, полученным для каждой роли:
+    активные и просроченные по ролям и уникальные задачи по всем ролям
+    """
+    stats = {}
+    all_task_ids = set()
+    all_overdue_ids = set()
+
+    for role_type, role_name in ROLE_TYPES.items():
+        active = 0
+        overdue = 0
+
+        for task in role_tasks.get(role_type, []):
+            status = task.get('status', {})
+            status_name = status.get('name', '') if isinstance(status, dict) else str(status)
+
+            # Подсчитываем активные (исключаем "Выполненная" и "Завершенная")
+            if status_name in REPORT_CLOSED_STATUSES:
+                continue
+
+            active += 1
+            task_id = task.get('id')
+            all_task_ids.add(task_id)
+            if task.get('overdue', False):
+                overdue += 1
+                all_overdue_ids.add(task_id)
+
+        stats[f'{role_name}_count'] = active
+        stats[f'{role_name}_overdue'] = overdue
+
+    stats['total'] = len(all_task_ids)
+    stats['overdue'] = len(all_overdue_ids)
+    stats['current'] = stats['total'] - stats['overdue']
+    return stats
 
 class PlanfixUserManager:
-    def __init__(self, account_url: str, api_token: str):
+    def __init__(self, account_url: str, api_token: str, max_concurrency: int = 8, rate_limit: float = 0):
         self.account_url = account_url.rstrip('/')
         self.api_token = api_token
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.api_token}'
-        })
+        self.client = PlanfixClient(
+            self.account_url, self.api_token,
+            max_concurrency=max_concurrency,
+            rate_limit=rate_limit
+        )
 
     def get_all_users(self) -> List[Dict[Any, Any]]:
         """Получает список всех пользователей"""
         try:
-            all_users = []
-            offset = 0
-            page_size = 100
-            
-            while True:
-                payload = {
-                    'offset': offset,
-                    'pageSize': page_size,
-                    'fields': 'id,name,lastname,midname,email,position,status,groups'
-                }
-                
-                response = self.session.post(
-                    f"{self.account_url}/user/list",
-                    json=payload,
-                    timeout=30
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('result') == 'fail':
-                        print(f"❌ Ошибка API: {data.get('error', 'Неизвестная ошибка')}")
-                        return []
-                    
-                    users = data.get('users', [])
-                    if not users:
-                        break
-                        
-                    all_users.extend(users)
-                    
-                    # Если получили меньше чем page_size, значит это последняя страница
-                    if len(users) < page_size:
-                        break
-                        
-                    offset += page_size
-                else:
-                    print(f"❌ Ошибка HTTP: {response.status_code}")
-                    return []
-            
-            return all_users
+            payload = {
+                'fields': 'id,name,lastname,midname,email,position,status,groups'
+            }
+            return self.client.fetch_pages("user/list", payload, 'users')
             
-        except Exception as e:
+        except PlanfixError as e:
             print(f"❌ Ошибка получения пользователей: {e}")
             return []
 
-    def get_user_tasks_count(self, user_id: str) -> Dict[str, int]:
-        """Получает количество задач пользователя по ролям (ПРОСТАЯ РАБОЧАЯ ВЕРСИЯ)"""
+    def build_task_index(self) -> TaskIndex:
+        """Выгружает весь список задач одним проходом по страницам и строит индекс по пользователям"""
         try:
-            # 1. ИСПОЛНИТЕЛЬ - простой запрос
-            assignee_tasks = self._get_simple_tasks_by_role(user_id, role_type=2)
-            
-            # 2. ПОСТАНОВЩИК - простой запрос  
-            assigner_tasks = self._get_simple_tasks_by_role(user_id, role_type=3)
-            
-            # 3. КОНТРОЛЕР - простой запрос
-            auditor_tasks = self._get_simple_tasks_by_role(user_id, role_type=4)
-            
-            # Подсчитываем активные (исключаем "Выполненная" и "Завершенная")
-            def count_active_and_overdue(tasks):
-                active = []
-                overdue = 0
-                for task in tasks:
-                    status = task.get('status', {})
-                    status_name = status.get('name', '') if isinstance(status, dict) else str(status)
-                    
-                    if status_name not in ['Выполненная', 'Завершенная']:
-                        active.append(task)
-                        if task.get('overdue', False):
-                            overdue += 1
-                
-                return len(active), overdue
-            
-            assignee_count, assignee_overdue = count_active_and_overdue(assignee_tasks)
-            assigner_count, assigner_overdue = count_active_and_overdue(assigner_tasks)
-            auditor_count, auditor_overdue = count_active_and_overdue(auditor_tasks)
-            
-            # Объединяем уникальные задачи по ID
-            all_task_ids = set()
-            all_overdue_ids = set()
-            
-            for task in assignee_tasks + assigner_tasks + auditor_tasks:
-                status = task.get('status', {})
-                status_name = status.get('name', '') if isinstance(status, dict) else str(status)
-                
-                if status_name not in ['Выполненная', 'Завершенная']:
-                    task_id = task.get('id')
-                    all_task_ids.add(task_id)
-                    if task.get('overdue', False):
-                        all_overdue_ids.add(task_id)
-            
-            total_count = len(all_task_ids)
-            total_overdue = len(all_overdue_ids)
-            
-            return {
-                'total': total_count,
-                'overdue': total_overdue,
-                'current': total_count - total_overdue,
-                'assignee_count': assignee_count,
-                'assigner_count': assigner_count,
-                'auditor_count': auditor_count,
-                'assignee_overdue': assignee_overdue,
-                'assigner_overdue': assigner_overdue,
-                'auditor_overdue': auditor_overdue
-            }
-            
-        except Exception as e:
-            return {
-                'total': 0, 'overdue': 0, 'current': 0,
-                'assignee_count': 0, 'assigner_count': 0, 'auditor_count': 0,
-                'assignee_overdue': 0, 'assigner_overdue': 0, 'auditor_overdue': 0
+            # Задачи сворачиваются в компактные записи прямо при потоковом разборе ответа
+            entries = self.client.fetch_pages("task/list", {"fields": INDEX_FIELDS}, 'tasks',
+                                              transform=TaskIndex.entry)
+        except PlanfixError as e:
+            print(f"❌ Ошибка получения задач: {e}")
+            return None
+
+        return TaskIndex.from_entries(entries)
+
+    def get_user_tasks_count(self, user_id: str) -> Dict[str, int]:
+        """Получает количество задач пользователя по ролям"""
+        role_tasks = {
+            role_type: self._get_simple_tasks_by_role(user_id, role_type)
+            for role_type in ROLE_TYPES
+        }
+        return summarize_role_tasks(role_tasks)
+
+    def iter_users_tasks_counts(self, user_ids: Iterable[str]) -> Iterator[Tuple[str, Dict[str, int]]]:
+        """
+        Считает задачи для списка пользователей.
+        Все запросы "пользователь x роль" выполняются параллельно (не больше
+        max_concurrency одновременно и с учетом rate_limit клиента), статистика
+        пользователя выдается сразу, как только получены все его роли
+        """
+        pending = {str(user_id): {} for user_id in user_ids}
+        if not pending:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.client.max_concurrency) as executor:
+            futures = {
+                executor.submit(self._get_simple_tasks_by_role, user_id, role_type): (user_id, role_type)
+                for user_id in pending
+                for role_type in ROLE_TYPES
             }
 
+            for future in as_completed(futures):
+                user_id, role_type = futures[future]
+                role_tasks = pending[user_id]
+                role_tasks[role_type] = future.result()
+
+                if len(role_tasks) == len(ROLE_TYPES):
+                    yield user_id, summarize_role_tasks(pending.pop(user_id))
+
     def _get_simple_tasks_by_role(self, user_id: str, role_type: int) -> List[Dict]:
         """Простое получение задач по типу роли БЕЗ сложной логики"""
         try:
             payload = {
-                "offset": 0,
-                "pageSize": 100,
                 "filters": [
                     {
                         "type": role_type,
@@ -145,28 +134,16 @@ class PlanfixUserManager:
                 "fields": "id,name,status,overdue"
             }
             
-            response = self.session.post(
-                f"{self.account_url}/task/list",
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('result') != 'fail':
-                    return data.get('tasks', [])
-            
-            return []
+            return self.client.fetch_pages("task/list", payload, 'tasks')
             
-        except Exception:
+        except PlanfixError as e:
+            print(f"⚠️ Не удалось получить задачи пользователя {user_id} (роль {role_type}): {e}")
             return []
     
     def _get_tasks_by_role(self, user_id: str, role_type: int) -> List[Dict]:
         """Получает задачи пользователя по конкретной роли"""
         try:
             payload = {
-                "offset": 0,
-                "pageSize": 200,
                 "filters": [
                     {
                         "type": role_type,
@@ -177,20 +154,9 @@ class PlanfixUserManager:
                 "fields": "id,status,overdue,endDateTime,name"
             }
             
-            response = self.session.post(
-                f"{self.account_url}/task/list",
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('result') != 'fail':
-                    return data.get('tasks', [])
+            return self.client.fetch_pages("task/list", payload, 'tasks')
             
-            return []
-            
-        except Exception:
+        except PlanfixError:
             return []
 
     def test_connection(self) -> bool:
@@ -201,21 +167,9 @@ class PlanfixUserManager:
                 "pageSize": 1,
                 "fields": "id,name"
             }
-            response = self.session.post(
-                f"{self.account_url}/user/list",
-                json=payload,
-                timeout=10
-            )
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('result') == 'fail':
-                    print(f"❌ API ошибка: {data.get('error', 'Неизвестная ошибка')}")
-                    return False
-                return True
-            else:
-                print(f"❌ HTTP ошибка: {response.status_code}")
-                return False
-        except Exception as e:
+            self.client.post("user/list", payload, timeout=10)
+            return True
+        except PlanfixError as e:
             print(f"❌ Ошибка соединения: {e}")
             return False
 
@@ -230,6 +184,11 @@ def load_admin_config():
 [Planfix]
 api_token = ВАШ_АДМИНСКИЙ_ТОКЕН
 account_url = https://your-account.planfix.com/rest
+
+[Settings]
+# Необязательно: параллельные запросы и лимит запросов в секунду
+max_parallel_requests = 8
+requests_per_second = 10
         """)
         return None, None
     
@@ -250,8 +209,22 @@ account_url = https://your-account.planfix.com/rest
         print(f"❌ Ошибка чтения конфигурации: {e}")
         return None, None
 
-def display_users_table(users: List[Dict], show_tasks: bool = False, manager: PlanfixUserManager = None):
-    """Отображает таблицу пользователей с расширенной статистикой по ролям"""
+def load_admin_settings() -> Dict[str, Any]:
+    """Загружает необязательные настройки запросов из секции [Settings] admin_config.ini"""
+    config = configparser.ConfigParser()
+    config.read('admin_config.ini', encoding='utf-8')
+    
+    return {
+        'max_parallel_requests': config.getint('Settings', 'max_parallel_requests', fallback=8),
+        'requests_per_second': config.getfloat('Settings', 'requests_per_second', fallback=10.0)
+    }
+
+def display_users_table(users: List[Dict], show_tasks: bool = False, manager: PlanfixUserManager = None,
+                        task_index: TaskIndex = None):
+    """
+    Отображает таблицу пользователей с расширенной статистикой по ролям.
+    Статистика берется из task_index, если он передан, иначе запрашивается через manager
+    """
     if not users:
         print("❌ Пользователи не найдены")
         return
@@ -268,6 +241,7 @@ def display_users_table(users: List[Dict], show_tasks: bool = False, manager: Pl
         print(f"{'ID':<4} {'ИМЯ':<20} {'EMAIL':<25} {'ДОЛЖНОСТЬ':<15}")
         print(f"{'-'*4} {'-'*20} {'-'*25} {'-'*15}")
     
+    rows = {}
     for user in users:
         user_id = str(user.get('id', ''))
         name = user.get('name', '')
@@ -285,9 +259,22 @@ def display_users_table(users: List[Dict], show_tasks: bool = False, manager: Pl
         email = email[:24] if email else 'Не указан'
         position = position[:14] if position else 'Не указана'
         
-        if show_tasks and manager:
-            print(f"  Анализирую задачи для {full_name}...", end='\r')
-            task_stats = manager.get_user_tasks_count(user_id)
+        if show_tasks and task_index is not None:
+            task_stats = task_index.stats(user_id)
+            print(f"{user_id:<4} {full_name:<20} {email:<25} {task_stats['total']:<6} {task_stats['overdue']:<6} "
+                  f"{task_stats['assignee_count']:<7} {task_stats['assigner_count']:<7} {task_stats['auditor_count']:<6}")
+        elif show_tasks and manager:
+            rows[user_id] = (full_name, email)
+        else:
+            print(f"{user_id:<4} {full_name:<20} {email:<25} {position:<15}")
+    
+    if rows:
+        # Строки выводятся по мере готовности статистики пользователя
+        start_time = time.perf_counter()
+        done = 0
+        for user_id, task_stats in manager.iter_users_tasks_counts(rows):
+            full_name, email = rows[user_id]
+            done += 1
             
             # Форматируем строку с основной статистикой
             total = task_stats['total']
@@ -297,8 +284,9 @@ def display_users_table(users: List[Dict], show_tasks: bool = False, manager: Pl
             auditor = task_stats['auditor_count']
             
             print(f"{user_id:<4} {full_name:<20} {email:<25} {total:<6} {overdue:<6} {assignee:<7} {assigner:<7} {auditor:<6}")
-        else:
-            print(f"{user_id:<4} {full_name:<20} {email:<25} {position:<15}")
+            print(f"  Готово {done}/{len(rows)}...", end='\r')
+        
+        print(f"⏱️ Статистика по {done} пользователям получена за {time.perf_counter() - start_time:.1f} с")
     
     if show_tasks:
         print(f"\n📊 РАСШИФРОВКА КОЛОНОК:")
@@ -383,7 +371,12 @@ def main():
         return
     
     # Создаем менеджер
-    manager = PlanfixUserManager(account_url, api_token)
+    settings = load_admin_settings()
+    manager = PlanfixUserManager(
+        account_url, api_token,
+        max_concurrency=settings['max_parallel_requests'],
+        rate_limit=settings['requests_per_second']
+    )
     
     # Тестируем соединение
     print("🔌 Тестирую подключение к Planfix...")
@@ -406,10 +399,11 @@ def main():
         print(f"\n📋 МЕНЮ:")
         print("1. Показать всех пользователей")
         print("2. Показать пользователей с количеством задач")
-        print("3. Генерировать шаблоны config.ini")
+        print("3. Показать пользователей с количеством задач (одна выгрузка всех задач)")
+        print("4. Генерировать шаблоны config.ini")
         print("0. Выход")
         
-        choice = input("\nВыберите действие (0-3): ").strip()
+        choice = input("\nВыберите действие (0-4): ").strip()
         
         if choice == '1':
             display_users_table(users, show_tasks=False)
@@ -417,6 +411,13 @@ def main():
             print("⏳ Получаю данные о задачах для каждого пользователя...")
             display_users_table(users, show_tasks=True, manager=manager)
         elif choice == '3':
+            print("⏳ Выгружаю все задачи и строю индекс по пользователям...")
+            start_time = time.perf_counter()
+            task_index = manager.build_task_index()
+            if task_index is not None:
+                print(f"✅ Проиндексировано {task_index.tasks_count} активных задач за {time.perf_counter() - start_time:.1f} с")
+                display_users_table(users, show_tasks=True, task_index=task_index)
+        elif choice == '4':
             generate_config_templates(users)
         elif choice == '0':
             print("👋 До свидания!")
@@ -0,0 +1,990 @@
+"""
+Офлайн-бенчмарки Planfix Reminder на локальной заглушке Planfix API
+Запуск: python benchmark.py [сценарий ...]
+Сравнение с сохраненными результатами: python benchmark.py --save base.json, затем --compare base.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from typing import List, Dict
+
+import enhanced_planfix_reminder as reminder
+import planfix_client
+import serializer
+from admin_user_manager import PlanfixUserManager, load_admin_config
+from metrics import registry as metrics
+from task_index import TaskIndex, INDEX_FIELDS
+from team_poller import TeamPoller, make_server
+from planfix_client import PlanfixClient
+from fake_planfix_server import (
+    FakePlanfixServer, generate_tasks, generate_users, post_task_event,
+    anonymize_account, save_fixture, load_fixture
+)
+from webhook_receiver import WebhookReceiver
+from task_model import Task, parse_end_date
+
+def legacy_categorize_tasks(tasks: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    Прежняя реализация categorize_tasks (эталон для сравнения)
+    """
+    today = datetime.date.today()
+    tomorrow = today + datetime.timedelta(days=1)
+    
+    categorized = {
+        'overdue': [],
+        'urgent': [],
+        'current': []
+    }
+    
+    closed_statuses = ['Выполненная', 'Отменена', 'Закрыта', 'Завершенная']
+    
+    for task in tasks:
+        try:
+            status = task.get('status', {})
+            status_name = status.get('name', '') if isinstance(status, dict) else str(status)
+            
+            if status_name in closed_statuses:
+                continue
+            
+            if task.get('overdue', False):
+                categorized['overdue'].append(task)
+                continue
+            
+            end_date_info = task.get('endDateTime')
+            end_date = None
+            
+            if end_date_info:
+                if isinstance(end_date_info, dict):
+                    date_str = (end_date_info.get('datetime') or 
+                              end_date_info.get('date') or 
+                              end_date_info.get('dateTimeUtcSeconds'))
+                else:
+                    date_str = str(end_date_info)
+                
+                if date_str:
+                    try:
+                        if 'T' in date_str:
+                            end_date = datetime.datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
+                        elif '-' in date_str:
+                            formats_to_try = ['%d-%m-%Y', '%Y-%m-%d', '%d-%m-%y']
+                            for date_format in formats_to_try:
+                                try:
+                                    end_date = datetime.datetime.strptime(date_str, date_format).date()
+                                    break
+                                except ValueError:
+                                    continue
+                        elif '.' in date_str:
+                            formats_to_try = ['%d.%m.%Y', '%d.%m.%y']
+                            for date_format in formats_to_try:
+                                try:
+                                    end_date = datetime.datetime.strptime(date_str, date_format).date()
+                                    break
+                                except ValueError:
+                                    continue
+                    except Exception:
+                        pass
+            
+            if not end_date:
+                end_date_str = task.get('endDate', '')
+                if end_date_str:
+                    try:
+                        if 'T' in end_date_str:
+                            end_date = datetime.datetime.fromisoformat(end_date_str.replace('Z', '+00:00')).date()
+                        else:
+                            for date_format in ['%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y']:
+                                try:
+                                    end_date = datetime.datetime.strptime(end_date_str, date_format).date()
+                                    break
+                                except ValueError:
+                                    continue
+                    except Exception:
+                        pass
+            
+            if end_date:
+                if end_date < today:
+                    categorized['overdue'].append(task)
+                elif end_date <= tomorrow:
+                    categorized['urgent'].append(task)
+                else:
+                    categorized['current'].append(task)
+            else:
+                categorized['current'].append(task)
+                
+        except Exception:
+            categorized['current'].append(task)
+    
+    return categorized
+
+def configure_reminder(server: FakePlanfixServer, filter_id: str = None, user_id: str = '1'):
+    """Настраивает app_config напоминалки на работу с заглушкой"""
+    reminder.app_config['planfix']['api_token'] = 'benchmark'
+    reminder.app_config['planfix']['account_url'] = server.url
+    reminder.app_config['planfix']['filter_id'] = filter_id
+    reminder.app_config['planfix']['user_id'] = user_id
+    # Заглушка не ограничивает частоту запросов
+    reminder.app_config['requests_per_second'] = 0
+
+def measure(func, rounds: int) -> dict:
+    """Выполняет func rounds раз и возвращает статистику времени (мс)"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+    }
+
+# Медианы измерений текущего запуска: "сценарий: измерение" -> мс (для --save и --compare)
+RESULTS = {}
+current_scenario = ''
+
+def print_result(name: str, result: dict):
+    """Выводит строку результата и запоминает медиану для сравнения запусков"""
+    RESULTS[f"{current_scenario}: {name.strip()}"] = round(result['median'], 3)
+    print(f"   {name:<40} min {result['min']:8.1f} мс   median {result['median']:8.1f} мс   max {result['max']:8.1f} мс")
+
+# Проверки корректности, не прошедшие в текущем запуске (код выхода 1)
+FAILED_CHECKS = []
+
+def print_mismatches(name: str, count: int, suffix: str = ''):
+    """Выводит число расхождений с эталоном; ненулевое число считается провалом запуска"""
+    if count:
+        FAILED_CHECKS.append(f"{current_scenario}: {name} ({count})")
+    print(f"   {name:<40} {count:10d}{suffix}{'   ❌' if count else ''}")
+
+def load_account(args, count: int = None, users_count: int = 20):
+    """Задачи и пользователи для сценария: из фикстуры --fixture или синтетические"""
+    if args.fixture:
+        return load_fixture(args.fixture)
+    return generate_tasks(count or args.tasks, users_count=users_count), generate_users(users_count)
+
+def busiest_user(tasks: List[Dict]) -> str:
+    """id сотрудника, который исполнитель в наибольшем числе задач (для записанных аккаунтов)"""
+    assignees = Counter(
+        str(user.get('id', '')).replace('user:', '')
+        for task in tasks for user in (task.get('assignees') or {}).get('users', [])
+    )
+    return assignees.most_common(1)[0][0] if assignees else '1'
+
+def fake_server(args, tasks: List[Dict], users: List[Dict] = None) -> FakePlanfixServer:
+    """Заглушка с задержкой, размером страницы и долей ошибок из параметров запуска"""
+    return FakePlanfixServer(tasks, latency=args.latency, users=users, error_rate=args.error_rate,
+                             max_page_size=args.page_size, include_total=args.total)
+
+class TimedQueue(queue.Queue):
+    """Очередь уведомлений, запоминающая момент постановки первого окна"""
+    def __init__(self):
+        super().__init__()
+        self.first_put = None
+
+    def put(self, item, block=True, timeout=None):
+        if self.first_put is None:
+            self.first_put = time.perf_counter()
+        super().put(item, block, timeout)
+
+def measure_poll_to_toast(api, rounds: int) -> tuple:
+    """
+    Полный цикл poll_tasks(): запросы, категоризация, допуск и постановка окон в очередь.
+    Первый (холодный) опрос заполняет кэш подробностей и не учитывается.
+    Возвращает статистику времени до первого уведомления в очереди и до конца опроса
+    """
+    reminder.planfix_api = api
+    saved_queue = reminder.toast_queue
+    first_toast, whole_poll = [], []
+
+    for round_number in range(rounds + 1):
+        # Каждый опрос начинается без открытых и закрытых пользователем окон
+        reminder.closed_tasks.clear()
+        reminder.toast_queue = TimedQueue()
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            reminder.poll_tasks()
+        if round_number:
+            whole_poll.append((time.perf_counter() - start) * 1000)
+            if reminder.toast_queue.first_put is not None:
+                first_toast.append((reminder.toast_queue.first_put - start) * 1000)
+
+        while not reminder.toast_queue.empty():
+            reminder.toast_queue.get_nowait().is_closed = True
+        reminder.cleanup_closed_windows()
+
+    reminder.toast_queue = saved_queue
+
+    def stats(timings):
+        if not timings:
+            return {'min': 0.0, 'median': 0.0, 'max': 0.0}
+        return {'min': min(timings), 'median': statistics.median(timings), 'max': max(timings)}
+
+    return stats(first_toast), stats(whole_poll)
+
+def bench_roles(args):
+    """Опрос по ролям: последовательные запросы против параллельных"""
+    print(f"\n⏱️ ОПРОС ПО РОЛЯМ ({args.tasks} задач, задержка {args.latency * 1000:.0f} мс)")
+
+    with FakePlanfixServer(generate_tasks(args.tasks), latency=args.latency) as server:
+        configure_reminder(server)
+        api = reminder.PlanfixAPI()
+        user_id = reminder.app_config['planfix']['user_id']
+
+        def sequential_poll():
+            for role_type in (2, 3, 4):
+                api._get_tasks_by_role_type(user_id, role_type)
+
+        print_result("последовательно (3 роли)", measure(sequential_poll, args.rounds))
+        print_result("параллельно get_filtered_tasks()", measure(api.get_filtered_tasks, args.rounds))
+
+def bench_sync(args):
+    """Трафик на один опрос: полная загрузка против инкрементальной синхронизации"""
+    print(f"\n📦 ТРАФИК НА ОПРОС ({args.tasks} задач)")
+
+    with FakePlanfixServer(generate_tasks(args.tasks), latency=0) as server:
+        configure_reminder(server)
+        api = reminder.PlanfixAPI()
+
+        def traffic(poll):
+            sent_before = server.bytes_sent
+            requests_before = server.requests_count
+            poll()
+            return server.bytes_sent - sent_before, server.requests_count - requests_before
+
+        full_bytes, full_requests = traffic(api.get_filtered_tasks)
+        api.sync_tasks()
+        delta_bytes, delta_requests = traffic(api.sync_tasks)
+
+        print(f"   {'полная загрузка':<40} {full_bytes / 1024:10.1f} КБ   запросов: {full_requests}")
+        print(f"   {'инкрементальная (без изменений)':<40} {delta_bytes / 1024:10.1f} КБ   запросов: {delta_requests}")
+
+def bench_fields(args):
+    """Профили полей: трафик и время разбора JSON на один опрос"""
+    print(f"\n🧾 ПРОФИЛИ ПОЛЕЙ ({args.tasks} задач, уведомлений за опрос: {reminder.app_config['max_total_windows']})")
+
+    tasks = generate_tasks(args.tasks)
+    with FakePlanfixServer(tasks, latency=0) as server:
+        configure_reminder(server)
+
+        for profile, fields in reminder.FIELD_PROFILES.items():
+            reminder.app_config['field_profile'] = profile
+            api = reminder.PlanfixAPI()
+
+            sent_before = server.bytes_sent
+            requests_before = server.requests_count
+            records = api.get_tasks()
+            # Подробности догружаются только для задач, которые попадут в уведомления
+            api.load_details(records[:reminder.app_config['max_total_windows']])
+            poll_bytes = server.bytes_sent - sent_before
+            poll_requests = server.requests_count - requests_before
+
+            payload = json.dumps({'tasks': [FakePlanfixServer._project(task, fields) for task in tasks]})
+            decode = measure(lambda: json.loads(payload), args.rounds)
+
+            print(f"   {profile:<40} {poll_bytes / 1024:10.1f} КБ   запросов: {poll_requests}   "
+                  f"разбор JSON всех задач: {decode['median']:.1f} мс")
+
+    reminder.app_config['field_profile'] = 'classify'
+
+def bench_categorize(args):
+    """Категоризация: прежняя реализация против однопроходной classify_tasks по записям Task"""
+    for count in (10_000, 100_000):
+        tasks = generate_tasks(count)
+        print(f"\n🗂️ КАТЕГОРИЗАЦИЯ ({count} задач)")
+
+        def ingest():
+            parse_end_date.cache_clear()
+            return [Task.from_api(task, '1') for task in tasks]
+
+        records = ingest()
+
+        print_result("прежняя categorize_tasks", measure(lambda: legacy_categorize_tasks(tasks), args.rounds))
+        print_result("загрузка в Task + classify_tasks", measure(lambda: reminder.classify_tasks(ingest()), args.rounds))
+        print_result("classify_tasks по готовым Task", measure(lambda: reminder.classify_tasks(records), args.rounds))
+
+def bench_memory(args):
+    """Память на задачу: исходные словари API против записей Task"""
+    print(f"\n🧠 ПАМЯТЬ НА ЗАДАЧУ ({args.tasks} задач)")
+
+    def allocated(build):
+        tracemalloc.start()
+        data = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del data
+        return size / args.tasks
+
+    payload = json.dumps(generate_tasks(args.tasks))
+    raw_size = allocated(lambda: json.loads(payload))
+    task_size = allocated(lambda: [Task.from_api(task, '1') for task in json.loads(payload)])
+
+    print(f"   {'словарь из task/list':<40} {raw_size:10.0f} байт")
+    print(f"   {'Task (__slots__)':<40} {task_size:10.0f} байт")
+
+def bench_admin(args):
+    """Отчет администратора: подсчет задач пользователей по очереди против пакетного"""
+    users_count = 60
+    print(f"\n👥 ОТЧЕТ АДМИНИСТРАТОРА ({users_count} пользователей, {args.tasks} задач, задержка {args.latency * 1000:.0f} мс)")
+
+    tasks = generate_tasks(args.tasks, users_count=users_count)
+    with FakePlanfixServer(tasks, latency=args.latency, users=generate_users(users_count)) as server:
+        manager = PlanfixUserManager(server.url, 'benchmark')
+        user_ids = [str(user['id']) for user in manager.get_all_users()]
+
+        reference = {}
+
+        def sequential_report():
+            for user_id in user_ids:
+                reference[user_id] = manager.get_user_tasks_count(user_id)
+
+        def batched_report():
+            return dict(manager.iter_users_tasks_counts(user_ids))
+
+        print_result("по очереди get_user_tasks_count()", measure(sequential_report, 1))
+        print_result("пакетно iter_users_tasks_counts()", measure(batched_report, args.rounds))
+
+        def indexed_report():
+            task_index = manager.build_task_index()
+            return {user_id: task_index.stats(user_id) for user_id in user_ids}
+
+        requests_before = server.requests_count
+        print_result("индекс по одной выгрузке задач", measure(indexed_report, args.rounds))
+        index_requests = (server.requests_count - requests_before) // args.rounds
+
+        batched = batched_report()
+        indexed = indexed_report()
+        mismatches = sum(1 for user_id in user_ids if batched.get(user_id) != reference[user_id])
+        index_mismatches = sum(1 for user_id in user_ids if indexed.get(user_id) != reference[user_id])
+        print_mismatches('расхождений со статистикой по очереди', mismatches)
+        print_mismatches('расхождений индекса', index_mismatches, f"   запросов на отчет: {index_requests}")
+
+def bench_paging(args):
+    """Загрузка всех страниц task/list: total известен (одна волна) против волн до неполной страницы"""
+    tasks, users = load_account(args)
+    print(f"\n📄 СТРАНИЦЫ task/list ({len(tasks)} задач, страница {args.page_size}, "
+          f"задержка {args.latency * 1000:.0f} мс)")
+
+    loaded = {}
+    for include_total, title in ((False, 'без total: волны до неполной страницы'),
+                                 (True, 'с total: все страницы одной волной')):
+        with FakePlanfixServer(tasks, latency=args.latency, users=users, max_page_size=args.page_size,
+                               include_total=include_total) as server:
+            # Готовый фильтр - один длинный список, где и видна разница в пагинации
+            configure_reminder(server, filter_id='1')
+            api = reminder.PlanfixAPI()
+            requests_before = server.requests_count
+            print_result(title, measure(api.get_filtered_tasks, args.rounds))
+            requests_per_poll = (server.requests_count - requests_before) / args.rounds
+            print(f"   {'  запросов на опрос':<40} {requests_per_poll:10.1f}")
+            loaded[include_total] = [task.get('id') for task in api.get_filtered_tasks()]
+
+    print_mismatches('расхождений в задачах', int(loaded[False] != loaded[True]))
+
+def bench_retry(args):
+    """Опрос при временных ошибках Planfix: без повторов против повторов с задержкой"""
+    error_rate = 0.2
+    polls = args.rounds * 4
+    print(f"\n🔁 ОПРОС ПРИ ОШИБКАХ 503 ({error_rate:.0%} запросов, {polls} опросов)")
+
+    with FakePlanfixServer(generate_tasks(args.tasks), latency=0, error_rate=error_rate) as server:
+        configure_reminder(server)
+
+        for max_retries in (0, 3):
+            reminder.app_config['max_retries'] = max_retries
+            api = reminder.PlanfixAPI()
+            api.client.backoff_base = 0.01
+
+            complete = 0
+            start = time.perf_counter()
+            for _ in range(polls):
+                api.get_filtered_tasks()
+                complete += not api.degraded
+            elapsed = (time.perf_counter() - start) * 1000
+
+            print(f"   {f'max_retries = {max_retries}':<40} полных опросов: {complete}/{polls}   {elapsed:8.1f} мс")
+
+def bench_stream(args):
+    """Пиковая память выгрузки всех задач: ответ целиком против потокового разбора"""
+    count = max(args.tasks, 20_000)
+    print(f"\n🌊 ВЫГРУЗКА ВСЕХ ЗАДАЧ ({count} задач, все поля)")
+
+    with FakePlanfixServer(generate_tasks(count), latency=0) as server:
+        manager = PlanfixUserManager(server.url, 'benchmark')
+        client = manager.client
+
+        def whole_responses():
+            # Прежний подход: response.json() каждой страницы, словари копятся целиком
+            tasks = []
+            offset = 0
+            while True:
+                page = client.post("task/list", {"offset": offset, "pageSize": 100}).get('tasks', [])
+                tasks.extend(page)
+                if len(page) < 100:
+                    return TaskIndex.build(tasks)
+                offset += 100
+
+        def peak(build):
+            tracemalloc.start()
+            start = time.perf_counter()
+            index = build()
+            elapsed = (time.perf_counter() - start) * 1000
+            size = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return index, size, elapsed
+
+        reference, whole_peak, whole_time = peak(whole_responses)
+        index, stream_peak, stream_time = peak(manager.build_task_index)
+
+        print(f"   {'ответ целиком (response.json)':<40} пик {whole_peak / 1024 / 1024:8.1f} МБ   {whole_time:8.1f} мс")
+        print(f"   {'потоковый разбор + TaskIndex.entry':<40} пик {stream_peak / 1024 / 1024:8.1f} МБ   {stream_time:8.1f} мс")
+        print(f"   {'индексы совпадают':<40} {str(dict(index.by_user_role) == dict(reference.by_user_role)):>10}")
+
+# Выгрузка пользователей из репозитория - образец ответа user/list для bench_decode
+USERS_SAMPLE_FILE = 'planfix_users.json'
+
+def bench_decode(args):
+    """Разбор ответов task/list и user/list: стандартный json против быстрых библиотек"""
+    print(f"\n🧬 РАЗБОР JSON (доступная библиотека: {serializer.BACKEND}, "
+          f"типизированный разбор: {'да' if serializer.TYPED_DECODING else 'нет'})")
+
+    tasks = generate_tasks(args.tasks)
+    payloads = [
+        ('task/list, все поля', 'tasks', reminder.TASK_FIELDS),
+        ('task/list, профиль classify', 'tasks', reminder.FIELD_PROFILES['classify']),
+        ('task/list, поля индекса', 'tasks', INDEX_FIELDS),
+    ]
+    recorded = []
+    for name, items_key, fields in payloads:
+        page = [FakePlanfixServer._project(task, fields) for task in tasks]
+        recorded.append((name, items_key, fields, json.dumps({'result': 'success', 'tasks': page}, ensure_ascii=False).encode('utf-8')))
+    if os.path.exists(USERS_SAMPLE_FILE):
+        with open(USERS_SAMPLE_FILE, 'rb') as f:
+            users = json.loads(f.read())
+        recorded.append(('user/list (planfix_users.json)', 'users', 'id,name,lastname,midname,email,position,status,groups',
+                         json.dumps({'result': 'success', 'users': users * 50}, ensure_ascii=False).encode('utf-8')))
+
+    for name, items_key, fields, data in recorded:
+        print(f"   {name} - {len(data) / 1024:.0f} КБ")
+        print_result("  json.loads", measure(lambda: json.loads(data), args.rounds))
+        print_result(f"  serializer.loads ({serializer.BACKEND})", measure(lambda: serializer.loads(data), args.rounds))
+        if serializer.TYPED_DECODING:
+            print_result("  serializer.decode_list (msgspec)",
+                         measure(lambda: serializer.decode_list(data, items_key, fields), args.rounds))
+
+class FakeToast:
+    """Окно уведомления без GUI для проверки допуска"""
+    def __init__(self, task_id: str, category: str):
+        self.task_id = task_id
+        self.category = category
+        self.is_closed = False
+
+def bench_admission(args):
+    """Допуск уведомлений: тысячи решений should_show_notification за цикл (с проверкой по прежнему алгоритму)"""
+    decisions = args.tasks * 10
+    print(f"\n🪟 ДОПУСК УВЕДОМЛЕНИЙ ({decisions} решений)")
+
+    rnd = random.Random(7)
+    categories = ['overdue', 'urgent', 'current']
+    saved_limits = {key: reminder.app_config[key] for key in ('max_total_windows', 'max_windows_per_category')}
+    reminder.app_config['max_total_windows'] = 300
+    reminder.app_config['max_windows_per_category'] = 120
+    reminder.closed_tasks.clear()
+    registry = reminder.active_windows
+    opened = []
+    mismatches = 0
+
+    def expected_decision(task_id, category):
+        # Прежний алгоритм - перебор списка окон
+        if any(w.task_id == task_id for w in opened):
+            return False
+        if len(opened) >= reminder.app_config['max_total_windows']:
+            return False
+        return len([w for w in opened if w.category == category]) < reminder.app_config['max_windows_per_category']
+
+    try:
+        start = time.perf_counter()
+        check_time = 0.0
+        for _ in range(decisions):
+            task_id = str(rnd.randint(1, args.tasks))
+            category = rnd.choice(categories)
+
+            check_start = time.perf_counter()
+            admitted = reminder.should_show_notification(task_id, category)
+            check_time += time.perf_counter() - check_start
+
+            if admitted != expected_decision(task_id, category):
+                mismatches += 1
+
+            if admitted:
+                toast = FakeToast(task_id, category)
+                registry.add(toast)
+                opened.append(toast)
+
+            # Пользователь закрывает часть окон
+            if opened and rnd.random() < 0.3:
+                toast = opened.pop(rnd.randrange(len(opened)))
+                toast.is_closed = True
+                registry.remove(toast)
+
+        total_time = time.perf_counter() - start
+    finally:
+        for toast in opened:
+            registry.remove(toast)
+        reminder.app_config.update(saved_limits)
+
+    print(f"   {'среднее время решения':<40} {check_time / decisions * 1e6:10.2f} мкс")
+    print(f"   {'весь цикл с эталонной проверкой':<40} {total_time * 1000:10.1f} мс")
+    print_mismatches('расхождений с эталоном', mismatches)
+
+def bench_team(args):
+    """Нагрузка на Planfix: каждый рабочий стол опрашивает сам против общего сервера опроса"""
+    desktops = 20
+    print(f"\n🛰️ ОПРОС КОМАНДЫ ({desktops} рабочих мест, {args.tasks} задач, {args.rounds} циклов опроса)")
+
+    with FakePlanfixServer(generate_tasks(args.tasks, users_count=desktops), latency=0) as server:
+        configure_reminder(server)
+        reminder.app_config['incremental_sync'] = True
+        user_ids = [str(user_id) for user_id in range(1, desktops + 1)]
+
+        direct_apis = {}
+        for user_id in user_ids:
+            reminder.app_config['planfix']['user_id'] = user_id
+            direct_apis[user_id] = reminder.PlanfixAPI()
+
+        direct_ids = {}
+        requests_before = server.requests_count
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for user_id, api in direct_apis.items():
+                direct_ids[user_id] = {task.id for task in api.get_tasks()}
+        direct_time = (time.perf_counter() - start) * 1000
+        direct_requests = server.requests_count - requests_before
+
+        poller = TeamPoller(PlanfixClient(server.url, 'benchmark'))
+        team_server = make_server(poller, 'team', '127.0.0.1', 0)
+        threading.Thread(target=team_server.serve_forever, daemon=True).start()
+        reminder.app_config['team_server_url'] = f"http://127.0.0.1:{team_server.server_address[1]}"
+        reminder.app_config['team_server_token'] = 'team'
+
+        team_apis = {}
+        for user_id in user_ids:
+            reminder.app_config['planfix']['user_id'] = user_id
+            team_apis[user_id] = reminder.PlanfixAPI()
+
+        team_ids = {}
+        requests_before = server.requests_count
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            poller.poll()
+            for user_id, api in team_apis.items():
+                team_ids[user_id] = {task.id for task in api.get_tasks()}
+        team_time = (time.perf_counter() - start) * 1000
+        team_requests = server.requests_count - requests_before
+
+        team_server.shutdown()
+        team_server.server_close()
+        reminder.app_config['team_server_url'] = ''
+        reminder.app_config['incremental_sync'] = False
+
+    mismatches = sum(1 for user_id in user_ids if direct_ids[user_id] != team_ids[user_id])
+    print(f"   {'каждое рабочее место само':<40} запросов к Planfix: {direct_requests:6d}   {direct_time:8.1f} мс")
+    print(f"   {'общий сервер опроса':<40} запросов к Planfix: {team_requests:6d}   {team_time:8.1f} мс")
+    print_mismatches('расхождений в задачах', mismatches)
+
+def bench_webhook(args):
+    """Задержка уведомления об изменении задачи: событие webhook против опроса"""
+    events = args.rounds * 4
+    print(f"\n🔔 WEBHOOK-СОБЫТИЯ ({events} изменений задач, {args.tasks} задач, задержка {args.latency * 1000:.0f} мс)")
+
+    with FakePlanfixServer(generate_tasks(args.tasks), latency=args.latency) as server:
+        configure_reminder(server)
+        api = reminder.PlanfixAPI()
+        reminder.planfix_api = api
+        reminder.current_tasks = api.get_tasks()
+        reminder.closed_tasks.clear()
+
+        requests_before = server.requests_count
+        api.get_tasks()
+        poll_requests = server.requests_count - requests_before
+
+        # Задачи пользователя, которые еще не просрочены - событие сделает их просроченными
+        candidates = [task.id for task in reminder.current_tasks if not task.overdue][:events]
+        overdue_date = {'date': (datetime.date.today() - datetime.timedelta(days=1)).strftime('%d-%m-%Y')}
+
+        stop = threading.Event()
+
+        def monitor():
+            while not stop.is_set():
+                for kind, key in reminder.scheduler.wait():
+                    reminder.handle_scheduled_event(kind, key)
+
+        threading.Thread(target=monitor, daemon=True).start()
+
+        latencies = []
+        requests_before = server.requests_count
+        with WebhookReceiver(reminder.on_webhook_event, port=0) as receiver:
+            for task_id in candidates:
+                server.update_task(task_id, overdue=True, endDateTime=overdue_date)
+                start = time.perf_counter()
+                post_task_event(receiver.url, task_id)
+                toast = reminder.toast_queue.get(timeout=10)
+                latencies.append((time.perf_counter() - start) * 1000)
+                reminder.active_windows.remove(toast)
+        event_requests = server.requests_count - requests_before
+
+        stop.set()
+        reminder.scheduler.schedule_in(0, 'benchmark_stop')
+        reminder.closed_tasks.clear()
+
+    interval = reminder.app_config['check_interval']
+    print(f"   {'событие -> уведомление (медиана)':<40} {statistics.median(latencies):10.1f} мс   max {max(latencies):8.1f} мс")
+    print(f"   {'опрос -> уведомление (в среднем)':<40} {interval / 2 * 1000:10.1f} мс   (check_interval {interval} с)")
+    print(f"   {'запросов на одно событие':<40} {event_requests / len(candidates):10.1f}")
+    print(f"   {'запросов на один опрос':<40} {poll_requests:10d}")
+
+def bench_scale(args):
+    """Рост времени с размером аккаунта: опрос, категоризация, статистика сотрудника, опрос -> уведомление"""
+    sizes = [None] if args.fixture else args.sizes
+
+    for count in sizes:
+        tasks, users = load_account(args, count)
+        user_id = busiest_user(tasks) if args.fixture else '1'
+        print(f"\n📈 АККАУНТ {len(tasks)} задач (задержка {args.latency * 1000:.0f} мс, "
+              f"страница {args.page_size}, ошибок {args.error_rate:.0%})")
+
+        with fake_server(args, tasks, users) as server:
+            configure_reminder(server, user_id=user_id)
+            api = reminder.PlanfixAPI()
+            manager = PlanfixUserManager(server.url, 'benchmark')
+            records = api.to_records(api.get_filtered_tasks())
+
+            print_result(f"get_filtered_tasks() [{len(tasks)}]", measure(api.get_filtered_tasks, args.rounds))
+            print_result(f"categorize_tasks() [{len(tasks)}]",
+                         measure(lambda: reminder.categorize_tasks(records), args.rounds))
+            print_result(f"get_user_tasks_count() [{len(tasks)}]",
+                         measure(lambda: manager.get_user_tasks_count(user_id), args.rounds))
+
+            first_toast, whole_poll = measure_poll_to_toast(api, args.rounds)
+            print_result(f"опрос -> первое уведомление [{len(tasks)}]", first_toast)
+            print_result(f"опрос целиком [{len(tasks)}]", whole_poll)
+
+def bench_poll(args):
+    """Опрос -> уведомление по этапам poll_tasks (по метрикам poll_stage_seconds)"""
+    tasks, users = load_account(args)
+    mode = 'инкрементальная синхронизация' if reminder.app_config['incremental_sync'] else 'полная загрузка'
+    print(f"\n⏳ ОПРОС -> УВЕДОМЛЕНИЕ ({len(tasks)} задач, {mode}, задержка {args.latency * 1000:.0f} мс)")
+
+    with fake_server(args, tasks, users) as server:
+        configure_reminder(server, user_id=busiest_user(tasks) if args.fixture else '1')
+        api = reminder.PlanfixAPI()
+
+        # Этапы считаются без холодного опроса
+        measure_poll_to_toast(api, 0)
+        metrics.reset()
+        first_toast, whole_poll = measure_poll_to_toast(api, args.rounds)
+        stages = {
+            timer['labels']['stage']: timer for timer in metrics.snapshot()['timers']
+            if timer['name'] == 'poll_stage_seconds'
+        }
+
+    print_result("первое уведомление в очереди", first_toast)
+    print_result("опрос целиком", whole_poll)
+    for stage in ('fetch', 'categorize', 'dispatch', 'cache'):
+        if stage in stages:
+            timer = stages[stage]
+            print(f"   {f'  этап {stage}':<40} в среднем {timer['sum'] / timer['count'] * 1000:8.1f} мс   "
+                  f"max {timer['max'] * 1000:8.1f} мс")
+
+def bench_digest(args):
+    """Проверка с большим списком отклоненных задач: окно на задачу против сводки по категориям"""
+    count = max(args.tasks, 5_000)
+    cycles = args.rounds * 4
+    print(f"\n🗒️ СВОДКА ({count} задач в фильтре, {cycles} проверок, 5 изменившихся задач)")
+
+    # Все задачи фильтра - задачи сотрудника; пользователь уже нажал "Готово" на каждой
+    with FakePlanfixServer(generate_tasks(count), latency=0) as server:
+        configure_reminder(server, filter_id='1')
+        reminder.app_config['field_profile'] = 'full'
+        api = reminder.PlanfixAPI()
+        reminder.planfix_api = api
+        tasks = api.get_tasks()
+    categorized = reminder.categorize_tasks(tasks)
+    changed_ids = {task.id for task in tasks[:5]}
+    dismissed = {
+        str(task.id): {'closed_time': datetime.datetime.now(), 'snooze_until': None, 'auto_closed': False}
+        for task in tasks if task.id not in changed_ids
+    }
+
+    calls = Counter()
+    should_show, format_message = reminder.should_show_notification, reminder.format_task_message
+
+    def counting(name, func):
+        def wrapper(*func_args):
+            calls[name] += 1
+            return func(*func_args)
+        return wrapper
+
+    reminder.should_show_notification = counting('should_show', should_show)
+    reminder.format_task_message = counting('format', format_message)
+
+    def run(threshold: int):
+        reminder.app_config['digest_threshold'] = threshold
+        calls.clear()
+        shown = 0
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(cycles):
+                reminder.closed_tasks.clear()
+                reminder.closed_tasks.update(dismissed)
+                shown += reminder.dispatch_notifications(reminder.apply_digest_mode(categorized, changed_ids))
+                while not reminder.toast_queue.empty():
+                    reminder.toast_queue.get_nowait().is_closed = True
+                reminder.cleanup_closed_windows()
+        elapsed = (time.perf_counter() - start) * 1000 / cycles
+        return elapsed, calls['should_show'] // cycles, calls['format'] // cycles, shown // cycles
+
+    try:
+        for title, threshold in (("окно на задачу", 0), ("сводка (digest_threshold = 20)", 20)):
+            elapsed, checks, formatted, shown = run(threshold)
+            print(f"   {title:<40} {elapsed:8.2f} мс/проверку   проверок допуска: {checks:6d}   "
+                  f"текстов: {formatted:3d}   окон: {shown}")
+    finally:
+        reminder.should_show_notification, reminder.format_task_message = should_show, format_message
+        reminder.app_config['digest_threshold'] = 0
+        reminder.app_config['field_profile'] = 'classify'
+        reminder.closed_tasks.clear()
+        reminder.digests.clear()
+
+class FakeTrayIcon:
+    """Иконка трея без GUI: считает замены изображения"""
+    def __init__(self):
+        self.icon_updates = 0
+        self.menu = None
+        self._icon = None
+
+    @property
+    def icon(self):
+        return self._icon
+
+    @icon.setter
+    def icon(self, image):
+        self._icon = image
+        self.icon_updates += 1
+
+def bench_tray(args):
+    """Обновление иконки трея после проверки: отрисовка каждый раз против кэша"""
+    cycles = args.rounds * 100
+    print(f"\n🖼️ ИКОНКА ТРЕЯ ({cycles} циклов обновления)")
+
+    # pystray подключается к графической среде уже при импорте (на Linux без X - DisplayNameError)
+    try:
+        reminder.pystray.resolve()
+        reminder.Image.resolve()
+    except Exception as e:
+        print(f"   ⏭️ Пропущено: трей недоступен ({type(e).__name__}: {e})")
+        return
+
+    rnd = random.Random(3)
+    # Счетчики меняются от проверки к проверке, состояние иконки - редко
+    stats = [
+        {'total': 50, 'overdue': rnd.randint(1, 5) if cycle % 100 < 80 else 0, 'urgent': rnd.randint(0, 3)}
+        for cycle in range(cycles)
+    ]
+
+    def legacy_update():
+        for cycle_stats in stats:
+            reminder.current_stats.update(cycle_stats)
+            # Прежнее поведение: новая картинка и загрузка шрифта на каждую проверку
+            reminder.get_tray_font.cache_clear()
+            reminder.tray_icon.icon = reminder.render_tray_icon(reminder.tray_icon_state())
+            reminder.tray_icon.menu = reminder.get_tray_menu()
+
+    def cached_update():
+        for cycle_stats in stats:
+            reminder.current_stats.update(cycle_stats)
+            reminder.update_tray_icon()
+
+    reminder.tray_icon = FakeTrayIcon()
+    reminder.shown_tray_state = None
+    reminder.prerender_tray_icons()
+
+    legacy = measure(legacy_update, 1)
+    reminder.tray_icon = FakeTrayIcon()
+    cached = measure(cached_update, 1)
+    icon_updates = reminder.tray_icon.icon_updates
+    reminder.tray_icon = None
+
+    print(f"   {'отрисовка на каждую проверку':<40} {legacy['median'] / cycles * 1000:10.1f} мкс/цикл")
+    print(f"   {'кэш и пропуск без изменений':<40} {cached['median'] / cycles * 1000:10.1f} мкс/цикл")
+    print(f"   {'замен иконки в трее':<40} {icon_updates:10d} из {cycles}")
+
+# Библиотеки, которые напоминалка загружает только при первом использовании
+DEFERRED_MODULES = ('tkinter', 'pystray', 'PIL.Image', 'PIL.ImageDraw', 'plyer', 'winsound', 'webbrowser')
+
+def measure_import(code: str) -> Dict[str, int]:
+    """
+    Запускает code в новом интерпретаторе с -X importtime и возвращает
+    суммарное время импорта (мкс) по модулям верхнего уровня
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Вложенные импорты выводятся с отступом - учитываем только верхний уровень
+        if not name[1:].startswith(' '):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+def bench_importtime(args):
+    """Холодный импорт напоминалки: с отложенными GUI-библиотеками и с загрузкой всех сразу"""
+    print(f"\n🚀 ХОЛОДНЫЙ ИМПОРТ (-X importtime, медиана из {args.rounds} запусков)")
+
+    eager_code = ''.join(
+        f"\ntry:\n    import {name}\nexcept Exception:\n    pass" for name in DEFERRED_MODULES
+    ) + "\nimport enhanced_planfix_reminder"
+
+    runs = {'lazy': [], 'eager': []}
+    for _ in range(args.rounds):
+        runs['lazy'].append(measure_import("import enhanced_planfix_reminder"))
+        runs['eager'].append(measure_import(eager_code))
+
+    for title, key in (("отложенные импорты (как сейчас)", 'lazy'), ("все библиотеки сразу", 'eager')):
+        totals = [sum(modules.values()) for modules in runs[key]]
+        print(f"   {title:<40} {statistics.median(totals) / 1000:10.1f} мс")
+
+    print("   Самые дорогие модули при загрузке всех сразу:")
+    last_run = runs['eager'][-1]
+    for name, cumulative in sorted(last_run.items(), key=lambda item: -item[1])[:8]:
+        print(f"      {name:<37} {cumulative / 1000:10.1f} мс")
+
+BENCHMARKS = {
+    'scale': bench_scale,
+    'poll': bench_poll,
+    'roles': bench_roles,
+    'sync': bench_sync,
+    'fields': bench_fields,
+    'decode': bench_decode,
+    'categorize': bench_categorize,
+    'memory': bench_memory,
+    'admission': bench_admission,
+    'digest': bench_digest,
+    'admin': bench_admin,
+    'stream': bench_stream,
+    'paging': bench_paging,
+    'retry': bench_retry,
+    'team': bench_team,
+    'webhook': bench_webhook,
+    'tray': bench_tray,
+    'importtime': bench_importtime,
+}
+
+def record_fixture(path: str):
+    """
+    Записывает задачи и пользователей рабочего аккаунта (admin_config.ini) в фикстуру.
+    Названия, описания и имена заменяются синтетическим текстом той же длины
+    """
+    api_token, account_url = load_admin_config()
+    if not api_token:
+        return
+
+    manager = PlanfixUserManager(account_url, api_token)
+    print("⏳ Загрузка задач и пользователей...")
+    tasks = manager.client.fetch_pages("task/list", {"fields": reminder.TASK_FIELDS}, 'tasks')
+    users = manager.get_all_users()
+
+    tasks, users = anonymize_account(tasks, users)
+    save_fixture(path, tasks, users)
+    print(f"💾 Фикстура сохранена: {path} ({len(tasks)} задач, {len(users)} пользователей)")
+
+def compare_results(path: str, tolerance: float) -> int:
+    """
+    Сравнивает медианы текущего запуска с сохраненными (--save).
+    Замедление больше tolerance (и больше 1 мс - шум таймера) считается регрессией.
+    Возвращает количество регрессий
+    """
+    baseline = serializer.load_file(path)
+    regressions = 0
+
+    print(f"\n📐 СРАВНЕНИЕ С {path} (допуск {tolerance:.0%})")
+    for name, median in RESULTS.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        slower = median > before * (1 + tolerance) and median - before > 1
+        regressions += slower
+        change = (median - before) / before if before else 0.0
+        print(f"   {'❌' if slower else '✅'} {name:<55} {before:8.1f} -> {median:8.1f} мс ({change:+.0%})")
+
+    print(f"   Регрессий: {regressions}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарки Planfix Reminder")
+    parser.add_argument('scenarios', nargs='*', help=f"Сценарии: {', '.join(BENCHMARKS)} (по умолчанию все)")
+    parser.add_argument('--tasks', type=int, default=1000, help="Количество синтетических задач")
+    parser.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')],
+                        default=[1_000, 10_000, 100_000], help="Размеры аккаунтов для сценария scale, через запятую")
+    parser.add_argument('--latency', type=float, default=0.1, help="Задержка ответа заглушки, сек")
+    parser.add_argument('--page-size', type=int, default=planfix_client.PAGE_SIZE,
+                        help="Размер страницы task/list и user/list")
+    parser.add_argument('--total', action='store_true',
+                        help="Заглушка возвращает total в ответах списков (сценарии scale и poll)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Доля запросов, на которые заглушка отвечает 503 (сценарии scale и poll)")
+    parser.add_argument('--rounds', type=int, default=5, help="Повторов на измерение")
+    parser.add_argument('--fixture', help="Файл фикстуры аккаунта вместо синтетических задач (сценарии scale и poll)")
+    parser.add_argument('--record', metavar='PATH', help="Записать фикстуру с рабочего аккаунта (admin_config.ini) и выйти")
+    parser.add_argument('--save', metavar='PATH', help="Сохранить медианы измерений в JSON")
+    parser.add_argument('--compare', metavar='PATH', help="Сравнить с сохраненными медианами (код выхода 1 при регрессии)")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Допустимое замедление для --compare")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixture(args.record)
+        return
+
+    unknown = [name for name in args.scenarios if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+
+    planfix_client.PAGE_SIZE = args.page_size
+
+    print("🏁 PLANFIX REMINDER BENCHMARK")
+    print("=" * 60)
+
+    global current_scenario
+    for name in args.scenarios or BENCHMARKS:
+        current_scenario = name
+        BENCHMARKS[name](args)
+
+    if args.save:
+        serializer.dump_file(RESULTS, args.save)
+        print(f"\n💾 Результаты сохранены: {args.save}")
+    regressions = compare_results(args.compare, args.tolerance) if args.compare else 0
+    if FAILED_CHECKS:
+        print("\n❌ Не пройдены проверки корректности:")
+        for check in FAILED_CHECKS:
+            print(f"   {check}")
+    if regressions or FAILED_CHECKS:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,19 @@
-import requests
 import configparser
 import os
 import json
 from typing import List, Dict, Any
 
+from json_stream import iter_array_items
+from planfix_client import PlanfixClient
+
 class DebugTaskManager:
     def __init__(self, account_url: str, api_token: str):
         self.account_url = account_url.rstrip('/')
         self.api_token = api_token
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.api_token}'
-        })
+        # Отладке нужны сырые ответы (HTTP-статус, текст), поэтому используем
+        # сессию общего клиента напрямую - с тем же пулом соединений и сжатием
+        self.client = PlanfixClient(self.account_url, self.api_token)
+        self.session = self.client.session
 
     def debug_user_tasks(self, user_id: str, user_name: str):
         """Отладочная проверка задач пользователя"""
@@ -108,21 +109,21 @@ class DebugTaskManager:
                 "fields": "id,name,status,overdue,endDateTime,assignees,participants,auditors,assigner"
             }
             
+            # Ответ разбирается потоково: задачи проверяются по мере получения
             response = self.session.post(
                 f"{self.account_url}/task/list",
                 json=payload,
-                timeout=30
+                timeout=30,
+                stream=True
             )
             
             if response.status_code == 200:
-                data = response.json()
-                all_tasks = data.get('tasks', [])
-                print(f"   ✅ Получено {len(all_tasks)} задач всего в системе")
-                
                 user_tasks = []
                 user_id_str = str(user_id)
+                received = 0
                 
-                for task in all_tasks:
+                for task in iter_array_items(response.iter_content(64 * 1024), 'tasks'):
+                    received += 1
                     is_user_involved = False
                     involvement_reason = []
                     
@@ -167,6 +168,7 @@ class DebugTaskManager:
                         task['involvement_reason'] = involvement_reason
                         user_tasks.append(task)
                 
+                print(f"   ✅ Получено {received} задач всего в системе")
                 print(f"   ✅ Найдено {len(user_tasks)} задач связанных с пользователем")
                 
                 # Показываем найденные задачи
@@ -1,6 +1,7 @@
-import requests
 import configparser
 
+from planfix_client import PlanfixClient
+
 def get_user_tasks_simple(user_id, session, account_url):
     """Максимально простая версия без сложной логики"""
     print(f"🔍 Проверяю пользователя ID={user_id}...")
@@ -69,11 +70,8 @@ def main():
     api_token = config['Planfix']['api_token']
     account_url = config['Planfix']['account_url']
     
-    session = requests.Session()
-    session.headers.update({
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {api_token}'
-    })
+    # Сессия общего клиента: keep-alive пул и сжатие ответов
+    session = PlanfixClient(account_url, api_token).session
     
     # Тестируем всех пользователей
     users = [
@@ -1,30 +1,58 @@
-import requests
 import time
-from plyer import notification
 import datetime
 import sys
 import configparser
 import os
-import json
 from typing import List, Dict, Any
-import tkinter as tk
-from tkinter import ttk
 import threading
-import winsound
-import webbrowser
-from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import queue
-import pystray
-from PIL import Image, ImageDraw
-import io
-import base64
+from collections import deque
+from itertools import islice
+from functools import lru_cache
 from pathlib import Path
+from lazy_import import LazyModule
+from metrics import registry as metrics
+from planfix_client import PlanfixClient, PlanfixError
+from task_cache import TaskCache
+from task_model import Task, CLOSED_STATUSES, ROLE_ASSIGNEE, ROLE_ASSIGNER, ROLE_AUDITOR
+from scheduler import EventScheduler
+from window_registry import WindowRegistry
+
+# GUI и системные библиотеки загружаются при первом использовании (см. LazyModule)
+tk = LazyModule('tkinter')
+pystray = LazyModule('pystray')
+Image = LazyModule('PIL.Image')
+ImageDraw = LazyModule('PIL.ImageDraw')
+notification = LazyModule('plyer', 'notification')
+winsound = LazyModule('winsound')
+webbrowser = LazyModule('webbrowser')
 
 # Глобальные переменные (все будут загружены из config.ini)
 app_config = {
     'check_interval': 300,
     'max_windows_per_category': 5,
     'max_total_windows': 10,
+    'max_parallel_requests': 4,
+    'http_pool_size': 10,
+    'requests_per_second': 5,
+    'max_retries': 3,
+    'toast_stagger_ms': 300,
+    'digest_threshold': 0,
+    'incremental_sync': False,
+    'full_sync_every': 12,
+    'field_profile': 'classify',
+    'team_server_url': '',
+    'team_server_token': '',
+    'webhook_port': 0,
+    'webhook_host': '127.0.0.1',
+    'webhook_secret': '',
+    'reconcile_interval': 1800,
+    'metrics_port': 0,
+    'metrics_host': '127.0.0.1',
+    'metrics_file': '',
+    'use_cache': True,
+    'cache_file': 'planfix_cache.db',
     'notifications': {
         'current': True,
         'urgent': True,
@@ -45,62 +73,116 @@ app_config = {
 
 # Глобальная очередь для Toast-уведомлений
 toast_queue = queue.Queue()
-# Список активных окон для управления позициями
-active_windows = []
+# Реестр активных окон для лимитов и управления позициями
+active_windows = WindowRegistry()
+# Пул готовых окон уведомлений (только GUI-поток)
+toast_pool = None
+# Менеджер уведомлений GUI-потока (будится при постановке уведомления в очередь)
+toast_manager = None
+# Окна-сводки режима digest_threshold
+digests = {}  # категория: DigestNotification
 # Система отслеживания закрытых задач
 closed_tasks = {}  # task_id: {'closed_time': datetime, 'snooze_until': datetime, 'auto_closed': bool}
 
 # Глобальные переменные для трея
 tray_icon = None
+tray_icon_images = {}     # состояние: готовая иконка
+shown_tray_state = None   # состояние иконки, показанной в трее
 is_paused = False
 pause_until = None
 last_check_time = None
 current_stats = {'total': 0, 'overdue': 0, 'urgent': 0}
 planfix_api = None
+# Локальный кэш состояния (снимок задач, закрытые задачи, время проверки)
+task_cache = None
+# Задачи последней успешной проверки (для локальной переоценки без запроса к API)
+current_tasks = []
+# Планировщик событий потока мониторинга
+scheduler = EventScheduler()
+webhook_receiver = None
+poll_counter = 0
 
-class ToastNotification:
+# Поля задач, запрашиваемые у task/list
+TASK_FIELDS = "id,name,description,endDateTime,startDateTime,status,priority,assignees,participants,auditors,assigner,overdue"
+# Минимальный набор полей для дешевой проверки изменений (инкрементальная синхронизация)
+PROBE_FIELDS = "id,status,endDateTime,overdue"
+# Профили полей для регулярного опроса (настройка field_profile):
+# classify - только то, что нужно категоризации, остальное догружается по id
+# для задач, по которым действительно будет показано уведомление; full - все поля сразу
+FIELD_PROFILES = {
+    'classify': PROBE_FIELDS,
+    'full': TASK_FIELDS,
+}
+# Поля для текста уведомления (format_task_message)
+DETAILS_FIELDS = "id,name,endDateTime,status,overdue,assignees"
+
+# Через сколько секунд повторить опрос, если Planfix не ответил
+DEGRADED_RETRY_INTERVAL = 30
+
+# Сколько окон уведомлений каждой категории построить заранее при запуске
+TOAST_POOL_PREWARM = 2
+
+# Заголовки окон-сводок по категориям
+DIGEST_TITLES = {
+    'overdue': '🔴 Просрочено',
+    'urgent': '🟡 Срочно',
+    'current': '📋 Текущие задачи',
+}
+
+# Цвета иконки трея по состоянию (см. tray_icon_state)
+TRAY_COLORS = {
+    'paused': (128, 128, 128),   # Серый - на паузе
+    'overdue': (255, 68, 68),    # Красный - есть просроченные
+    'urgent': (255, 136, 0),     # Оранжевый - есть срочные
+    'ok': (0, 200, 0),           # Зеленый - все хорошо
+}
+
+# Виртуальное событие Tk, которым другие потоки будят GUI-поток
+TOAST_QUEUED_EVENT = '<<ToastQueued>>'
+
+# Оформление окон уведомлений по категориям
+TOAST_STYLES = {
+    'overdue': {
+        'bg_color': '#FF4444',
+        'text_color': 'white',
+        'border_color': '#CC0000',
+        'duration': None,
+        'sound': True,
+        'sound_type': 'critical'
+    },
+    'urgent': {
+        'bg_color': '#FF8800',
+        'text_color': 'white',
+        'border_color': '#CC4400', 
+        'duration': None,
+        'sound': True,
+        'sound_type': 'warning'
+    },
+    'current': {
+        'bg_color': '#0066CC',
+        'text_color': 'white',
+        'border_color': '#003388',
+        'duration': None,
+        'sound': False,
+        'sound_type': None
+    }
+}
+
+class ToastWindow:
     """
-    Кастомное Toast-уведомление поверх всех окон с возможностью перетаскивания
+    Заранее построенное окно уведомления одной категории.
+    Виджеты создаются один раз; при показе в окно подставляются тексты
+    и уведомление-владелец (toast), которому передаются нажатия кнопок.
+    При закрытии окно только скрывается и возвращается в ToastWindowPool
     """
-    def __init__(self, title: str, message: str, category: str, task_id: str = None):
-        self.title = title
-        self.message = message
+    WIDTH = 320
+    HEIGHT = 140
+
+    def __init__(self, master_root, category: str):
         self.category = category
-        self.task_id = task_id
-        self.root = None
-        self.is_closed = False
-        self.drag_data = {"x": 0, "y": 0}
-        
-        # Настройки внешнего вида по категориям
-        self.styles = {
-            'overdue': {
-                'bg_color': '#FF4444',
-                'text_color': 'white',
-                'border_color': '#CC0000',
-                'duration': None,
-                'sound': True,
-                'sound_type': 'critical'
-            },
-            'urgent': {
-                'bg_color': '#FF8800',
-                'text_color': 'white',
-                'border_color': '#CC4400', 
-                'duration': None,
-                'sound': True,
-                'sound_type': 'warning'
-            },
-            'current': {
-                'bg_color': '#0066CC',
-                'text_color': 'white',
-                'border_color': '#003388',
-                'duration': None,
-                'sound': False,
-                'sound_type': None
-            }
-        }
+        self.toast = None
+        style = TOAST_STYLES.get(category, TOAST_STYLES['current'])
         
-    def create_window(self, master_root):
-        """Создает окно уведомления в главном потоке"""
         self.root = tk.Toplevel(master_root)
         self.root.withdraw()
         
@@ -108,15 +190,6 @@ class ToastNotification:
         self.root.attributes('-topmost', True)
         self.root.attributes('-alpha', 0.95)
         
-        style = self.styles.get(self.category, self.styles['current'])
-        
-        window_width = 320
-        window_height = 140
-        
-        x, y = self._calculate_position(window_width, window_height)
-        
-        self.root.geometry(f"{window_width}x{window_height}+{x}+{y}")
-        
         container = tk.Frame(
             self.root, 
             bg=style['border_color'], 
@@ -133,7 +206,7 @@ class ToastNotification:
             'overdue': '🔴',
             'urgent': '🟡',
             'current': '📋'
-        }.get(self.category, '📋')
+        }.get(category, '📋')
         
         icon_label = tk.Label(
             title_bar,
@@ -144,20 +217,20 @@ class ToastNotification:
         )
         icon_label.pack(side='left', padx=(5, 0), pady=2)
         
-        task_id_label = tk.Label(
+        self.task_id_label = tk.Label(
             title_bar,
-            text=f"#{self.task_id}" if self.task_id else "",
+            text="",
             font=('Arial', 8),
             fg=style['text_color'],
             bg=style['bg_color']
         )
-        task_id_label.pack(side='left', padx=(5, 0), pady=2)
+        self.task_id_label.pack(side='left', padx=(5, 0), pady=2)
         
         close_btn = tk.Button(
             title_bar,
             text="✕",
             font=('Arial', 8, 'bold'),
-            command=self._close,
+            command=lambda: self._dispatch('_close'),
             bg=style['text_color'],
             fg=style['bg_color'],
             relief='flat',
@@ -170,7 +243,7 @@ class ToastNotification:
             title_bar,
             text="📌",
             font=('Arial', 6),
-            command=self._toggle_pin,
+            command=lambda: self._dispatch('_toggle_pin'),
             bg=style['text_color'],
             fg=style['bg_color'],
             relief='flat',
@@ -179,20 +252,16 @@ class ToastNotification:
         )
         pin_btn.pack(side='right', padx=(0, 2), pady=2)
         
-        title_bar.bind("<Button-1>", self._start_drag)
-        title_bar.bind("<B1-Motion>", self._on_drag)
-        icon_label.bind("<Button-1>", self._start_drag)
-        icon_label.bind("<B1-Motion>", self._on_drag)
-        task_id_label.bind("<Button-1>", self._start_drag) 
-        task_id_label.bind("<B1-Motion>", self._on_drag)
+        for widget in (title_bar, icon_label, self.task_id_label):
+            widget.bind("<Button-1>", lambda event: self._dispatch('_start_drag', event))
+            widget.bind("<B1-Motion>", lambda event: self._dispatch('_on_drag', event))
         
         content_frame = tk.Frame(container, bg=style['bg_color'], padx=8, pady=5)
         content_frame.pack(fill='both', expand=True, padx=1, pady=(0, 1))
         
-        task_title = self.title.split(': ', 1)[-1] if ': ' in self.title else self.title
-        title_label = tk.Label(
+        self.title_label = tk.Label(
             content_frame,
-            text=task_title,
+            text="",
             font=('Arial', 9, 'bold'),
             fg=style['text_color'],
             bg=style['bg_color'],
@@ -200,14 +269,11 @@ class ToastNotification:
             justify='left',
             anchor='w'
         )
-        title_label.pack(fill='x', pady=(0, 3))
+        self.title_label.pack(fill='x', pady=(0, 3))
         
-        message_lines = self.message.split('\n')[:2]
-        message_text = '\n'.join(message_lines)
-        
-        info_label = tk.Label(
+        self.info_label = tk.Label(
             content_frame,
-            text=message_text,
+            text="",
             font=('Arial', 7),
             fg=style['text_color'],
             bg=style['bg_color'],
@@ -215,31 +281,31 @@ class ToastNotification:
             justify='left',
             anchor='w'
         )
-        info_label.pack(fill='x', pady=(0, 5))
+        self.info_label.pack(fill='x', pady=(0, 5))
         
         button_frame = tk.Frame(content_frame, bg=style['bg_color'])
         button_frame.pack(fill='x')
         
-        if self.task_id:
-            open_btn = tk.Button(
-                button_frame,
-                text="Открыть",
-                font=('Arial', 7),
-                command=self._open_task,
-                bg='white',
-                fg='black',
-                relief='flat',
-                padx=6,
-                pady=1
-            )
-            open_btn.pack(side='left', padx=(0, 3))
+        # Кнопка "Открыть" показывается только уведомлениям с задачей (см. bind)
+        self.open_btn = tk.Button(
+            button_frame,
+            text="Открыть",
+            font=('Arial', 7),
+            command=lambda: self._dispatch('_open_task'),
+            bg='white',
+            fg='black',
+            relief='flat',
+            padx=6,
+            pady=1
+        )
         
-        if self.category in ['overdue', 'urgent']:
+        self.first_left_btn = None
+        if category in ['overdue', 'urgent']:
             snooze_btn = tk.Button(
                 button_frame,
                 text="15мин",
                 font=('Arial', 7),
-                command=self._snooze,
+                command=lambda: self._dispatch('_snooze'),
                 bg='lightgray',
                 fg='black',
                 relief='flat',
@@ -247,12 +313,13 @@ class ToastNotification:
                 pady=1
             )
             snooze_btn.pack(side='left', padx=(0, 3))
+            self.first_left_btn = snooze_btn
         
         remind_btn = tk.Button(
             button_frame,
             text="1ч",
             font=('Arial', 7),
-            command=self._remind_later,
+            command=lambda: self._dispatch('_remind_later'),
             bg='lightyellow',
             fg='black',
             relief='flat',
@@ -260,12 +327,13 @@ class ToastNotification:
             pady=1
         )
         remind_btn.pack(side='left', padx=(0, 3))
+        self.first_left_btn = self.first_left_btn or remind_btn
         
         done_btn = tk.Button(
             button_frame,
             text="Готово",
             font=('Arial', 7),
-            command=self._mark_done,
+            command=lambda: self._dispatch('_mark_done'),
             bg='lightgreen',
             fg='black',
             relief='flat',
@@ -273,8 +341,111 @@ class ToastNotification:
             pady=1
         )
         done_btn.pack(side='right')
+    
+    def bind(self, toast: 'ToastNotification', x: int, y: int):
+        """Подставляет в окно данные уведомления и размещает его (окно остается скрытым)"""
+        self.toast = toast
+        
+        self.task_id_label.config(text=f"#{toast.task_id}" if toast.task_id else "")
+        
+        task_title = toast.title.split(': ', 1)[-1] if ': ' in toast.title else toast.title
+        self.title_label.config(text=task_title)
+        self.info_label.config(text='\n'.join(toast.message.split('\n')[:2]))
+        
+        if toast.task_id and not self.open_btn.winfo_ismapped():
+            self.open_btn.pack(side='left', padx=(0, 3), before=self.first_left_btn)
+        elif not toast.task_id:
+            self.open_btn.pack_forget()
+        
+        # Закрепление и прозрачность могли остаться от предыдущего уведомления
+        self.root.attributes('-topmost', True)
+        self.root.attributes('-alpha', 0.0)
+        self.root.geometry(f"{self.WIDTH}x{self.HEIGHT}+{x}+{y}")
+    
+    def hide(self):
+        """Скрывает окно и отвязывает уведомление"""
+        self.toast = None
+        self.root.withdraw()
+    
+    def destroy(self):
+        """Уничтожает окно"""
+        self.toast = None
+        try:
+            self.root.destroy()
+        except tk.TclError:
+            pass
+    
+    def _dispatch(self, method: str, *args):
+        """Передает действие пользователя текущему уведомлению"""
+        if self.toast and not self.toast.is_closed:
+            getattr(self.toast, method)(*args)
+
+class ToastWindowPool:
+    """
+    Пул скрытых окон уведомлений по категориям.
+    Показ уведомления берет готовое окно из пула, закрытие возвращает его обратно,
+    так что виджеты не строятся заново на каждое уведомление.
+    Используется только из GUI-потока
+    """
+    def __init__(self):
+        self._free = {}  # категория: [ToastWindow]
+        self.created_count = 0
+    
+    def acquire(self, master_root, category: str) -> ToastWindow:
+        """Возвращает свободное окно категории (или строит новое)"""
+        free = self._free.setdefault(category, [])
+        if free:
+            return free.pop()
+        
+        self.created_count += 1
+        return ToastWindow(master_root, category)
+    
+    def release(self, window: ToastWindow):
+        """Возвращает окно в пул (лишние окна сверх лимита категории уничтожаются)"""
+        free = self._free.setdefault(window.category, [])
+        if len(free) < app_config['max_windows_per_category']:
+            window.hide()
+            free.append(window)
+        else:
+            window.destroy()
+    
+    def prewarm(self, master_root, count: int):
+        """Заранее строит до count окон каждой включенной категории"""
+        for category in TOAST_STYLES:
+            if not app_config['notifications'].get(category, True):
+                continue
+            free = self._free.setdefault(category, [])
+            while len(free) < count:
+                self.created_count += 1
+                window = ToastWindow(master_root, category)
+                free.append(window)
+
+class ToastNotification:
+    """
+    Кастомное Toast-уведомление поверх всех окон с возможностью перетаскивания.
+    Окно берется из пула toast_pool при показе и возвращается в него при закрытии
+    """
+    def __init__(self, title: str, message: str, category: str, task_id: str = None):
+        self.title = title
+        self.message = message
+        self.category = category
+        self.task_id = task_id
+        self.window = None
+        self.root = None
+        self.is_closed = False
+        self.drag_data = {"x": 0, "y": 0}
         
-        active_windows.append(self)
+    def create_window(self, master_root):
+        """Показывает уведомление в окне из пула (в главном потоке)"""
+        style = TOAST_STYLES.get(self.category, TOAST_STYLES['current'])
+        
+        self.window = toast_pool.acquire(master_root, self.category)
+        self.root = self.window.root
+        
+        x, y = self._calculate_position(ToastWindow.WIDTH, ToastWindow.HEIGHT)
+        self.window.bind(self, x, y)
+        
+        active_windows.mark_shown(self)
         
         if style['sound']:
             threading.Thread(target=self._play_sound, args=(style['sound_type'],), daemon=True).start()
@@ -293,7 +464,8 @@ class ToastNotification:
         offset_x = 10
         offset_y = 30
         
-        same_category_count = len([w for w in active_windows if w.category == self.category and not w.is_closed])
+        # Учитываем только уже показанные окна (в active_windows есть и ожидающие показа)
+        same_category_count = active_windows.shown_count(self.category)
         
         x = start_x - (same_category_count * offset_x)
         y = start_y + (same_category_count * offset_y)
@@ -335,7 +507,8 @@ class ToastNotification:
                         pass
         fade_in()
     
-    def _play_sound(self, sound_type: str):
+    @staticmethod
+    def _play_sound(sound_type: str):
         """Воспроизводит звуковой сигнал"""
         try:
             if sound_type == 'critical':
@@ -350,13 +523,7 @@ class ToastNotification:
     def _open_task(self):
         """Открывает задачу в браузере"""
         if self.task_id:
-            try:
-                account_url = app_config['planfix']['account_url'].replace('/rest', '')
-                task_url = f"{account_url}/task/{self.task_id}/"
-                webbrowser.open(task_url)
-            except Exception:
-                task_url = f"https://planfix.com/task/{self.task_id}/"
-                webbrowser.open(task_url)
+            open_task_page(self.task_id)
     
     def _snooze(self):
         """Откладывает уведомление на 15 минут"""
@@ -409,46 +576,361 @@ class ToastNotification:
                 'auto_closed': False
             }
         
-        if self in active_windows:
-            active_windows.remove(self)
+        persist_closed_tasks()
+        schedule_snooze_expiry(self.task_id)
         
-        if self.root:
+        active_windows.remove(self)
+        
+        if self.window:
+            window, self.window, self.root = self.window, None, None
             try:
-                self.root.destroy()
+                toast_pool.release(window)
             except tk.TclError:
                 pass
 
+class DigestWindow:
+    """
+    Окно-сводка категории с виртуализированным списком задач.
+    В Listbox всегда только видимые строки (ROWS): при прокрутке они заполняются
+    заново из списка задач, поэтому сотни и тысячи задач не замедляют GUI,
+    а текст строки формируется только для видимых задач
+    """
+    WIDTH = 380
+    HEIGHT = 290
+    ROWS = 12
+    
+    def __init__(self, master_root, digest: 'DigestNotification'):
+        self.digest = digest
+        self.tasks = []
+        self.offset = 0
+        self.is_visible = False
+        style = TOAST_STYLES.get(digest.category, TOAST_STYLES['current'])
+        
+        self.root = tk.Toplevel(master_root)
+        self.root.withdraw()
+        self.root.overrideredirect(True)
+        self.root.attributes('-topmost', True)
+        self.root.attributes('-alpha', 0.95)
+        
+        container = tk.Frame(self.root, bg=style['border_color'], relief='raised', bd=2)
+        container.pack(fill='both', expand=True, padx=2, pady=2)
+        
+        title_bar = tk.Frame(container, bg=style['bg_color'], height=25)
+        title_bar.pack(fill='x', padx=1, pady=(1, 0))
+        title_bar.pack_propagate(False)
+        
+        self.header_label = tk.Label(
+            title_bar,
+            text="",
+            font=('Arial', 9, 'bold'),
+            fg=style['text_color'],
+            bg=style['bg_color']
+        )
+        self.header_label.pack(side='left', padx=(5, 0), pady=2)
+        
+        close_btn = tk.Button(
+            title_bar,
+            text="✕",
+            font=('Arial', 8, 'bold'),
+            command=digest._close,
+            bg=style['text_color'],
+            fg=style['bg_color'],
+            relief='flat',
+            width=2,
+            height=1
+        )
+        close_btn.pack(side='right', padx=(0, 5), pady=2)
+        
+        for widget in (title_bar, self.header_label):
+            widget.bind("<Button-1>", digest._start_drag)
+            widget.bind("<B1-Motion>", digest._on_drag)
+        
+        list_frame = tk.Frame(container, bg=style['bg_color'], padx=5, pady=5)
+        list_frame.pack(fill='both', expand=True, padx=1)
+        
+        self.scrollbar = tk.Scrollbar(list_frame, orient='vertical', command=self._on_scrollbar)
+        self.scrollbar.pack(side='right', fill='y')
+        
+        self.listbox = tk.Listbox(
+            list_frame,
+            height=self.ROWS,
+            font=('Arial', 8),
+            activestyle='none',
+            exportselection=False,
+            bg='white',
+            fg='black'
+        )
+        self.listbox.pack(side='left', fill='both', expand=True)
+        self.listbox.bind("<Double-Button-1>", lambda event: self._open_selected())
+        # Колесо мыши: Windows/macOS - <MouseWheel>, X11 - кнопки 4/5
+        self.listbox.bind("<MouseWheel>", lambda event: self._scroll_by(-3 if event.delta > 0 else 3))
+        self.listbox.bind("<Button-4>", lambda event: self._scroll_by(-3))
+        self.listbox.bind("<Button-5>", lambda event: self._scroll_by(3))
+        
+        button_frame = tk.Frame(container, bg=style['bg_color'], padx=5)
+        button_frame.pack(fill='x', pady=(0, 5))
+        
+        open_btn = tk.Button(
+            button_frame,
+            text="Открыть",
+            font=('Arial', 7),
+            command=self._open_selected,
+            bg='white',
+            fg='black',
+            relief='flat',
+            padx=6,
+            pady=1
+        )
+        open_btn.pack(side='left', padx=(0, 3))
+        
+        remind_btn = tk.Button(
+            button_frame,
+            text="1ч",
+            font=('Arial', 7),
+            command=digest._remind_later,
+            bg='lightyellow',
+            fg='black',
+            relief='flat',
+            padx=6,
+            pady=1
+        )
+        remind_btn.pack(side='left')
+    
+    def set_tasks(self, tasks: List[Task]):
+        """Подставляет новый список задач (перерисовываются только видимые строки)"""
+        self.tasks = tasks
+        self.offset = min(self.offset, max(0, len(tasks) - self.ROWS))
+        title = DIGEST_TITLES.get(self.digest.category, DIGEST_TITLES['current'])
+        self.header_label.config(text=f"{title}: {len(tasks)}")
+        self._render()
+    
+    def show(self, x: int, y: int):
+        """Показывает окно в заданной позиции"""
+        self.root.geometry(f"{self.WIDTH}x{self.HEIGHT}+{x}+{y}")
+        self.root.deiconify()
+        self.is_visible = True
+    
+    def hide(self):
+        """Скрывает окно (виджеты остаются для следующего показа)"""
+        self.root.withdraw()
+        self.is_visible = False
+    
+    def _render(self):
+        """Заполняет Listbox строками задач, попадающих в видимую область"""
+        visible = self.tasks[self.offset:self.offset + self.ROWS]
+        self.digest.request_details(visible)
+        self.listbox.delete(0, 'end')
+        if visible:
+            self.listbox.insert('end', *(format_digest_line(task) for task in visible))
+        
+        total = len(self.tasks)
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(visible)) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def _scroll_by(self, rows: int):
+        """Прокручивает список на rows строк"""
+        self._scroll_to(self.offset + rows)
+        return 'break'
+    
+    def _scroll_to(self, offset: int):
+        offset = max(0, min(offset, len(self.tasks) - self.ROWS))
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+    
+    def _on_scrollbar(self, action: str, value: str, unit: str = None):
+        """Обработчик полосы прокрутки (moveto <доля> / scroll <n> units|pages)"""
+        if action == 'moveto':
+            self._scroll_to(int(float(value) * len(self.tasks)))
+        elif action == 'scroll':
+            step = self.ROWS if unit == 'pages' else 1
+            self._scroll_by(int(value) * step)
+    
+    def _open_selected(self):
+        """Открывает в браузере выбранную задачу"""
+        selection = self.listbox.curselection()
+        if selection and self.offset + selection[0] < len(self.tasks):
+            open_task_page(self.tasks[self.offset + selection[0]].id)
+
+class DigestNotification:
+    """
+    Сводка по категории (режим digest_threshold): одно окно со всеми задачами
+    категории вместо окна на каждую задачу.
+    Поток мониторинга подменяет список задач (update) и ставит сводку в общую
+    очередь уведомлений, окно строится один раз и обновляется в GUI-потоке
+    (create_window). Сводка не занимает места в лимитах окон уведомлений
+    """
+    def __init__(self, category: str):
+        self.category = category
+        self.task_id = None
+        self.tasks = []
+        self.window = None
+        self.root = None
+        self.is_closed = False
+        self.snooze_until = None
+        self.drag_data = {"x": 0, "y": 0}
+        # Видимые задачи без названия (профиль classify) для догрузки в потоке мониторинга
+        self.pending_details = deque()
+        self.requested = set()
+    
+    def update(self, tasks: List[Task]) -> bool:
+        """
+        Подменяет список задач (поток мониторинга).
+        Возвращает True, если окно нужно показать, обновить или скрыть
+        """
+        was_shown = bool(self.tasks)
+        self.tasks = tasks
+        self.is_closed = False
+        # Подробности могли устареть - видимые строки снова запросят их при отрисовке
+        self.requested = set()
+        if not tasks:
+            return was_shown
+        return not (self.snooze_until and datetime.datetime.now() < self.snooze_until)
+    
+    def create_window(self, master_root):
+        """Показывает, обновляет или скрывает окно сводки (в главном потоке)"""
+        tasks = self.tasks
+        if not tasks:
+            if self.window:
+                self.window.hide()
+            return
+        
+        if self.window is None:
+            self.window = DigestWindow(master_root, self)
+            self.root = self.window.root
+        
+        self.window.set_tasks(tasks)
+        if not self.window.is_visible:
+            self.window.show(*self._calculate_position())
+            style = TOAST_STYLES.get(self.category, TOAST_STYLES['current'])
+            if style['sound']:
+                threading.Thread(target=ToastNotification._play_sound, args=(style['sound_type'],), daemon=True).start()
+    
+    def request_details(self, tasks: List[Task]):
+        """Просит поток мониторинга догрузить названия видимых задач (GUI-поток)"""
+        if not planfix_api:
+            return
+        missing = [task for task in tasks if task.id not in self.requested and planfix_api.needs_details(task)]
+        if missing:
+            self.requested.update(task.id for task in missing)
+            self.pending_details.extend(missing)
+            scheduler.schedule_in(0, 'digest_details', self.category)
+    
+    def _calculate_position(self):
+        """Сводки стоят столбцом слева от окон уведомлений, по одной на категорию"""
+        screen_width = 1920
+        x = screen_width - ToastWindow.WIDTH - DigestWindow.WIDTH - 40
+        index = list(TOAST_STYLES).index(self.category) if self.category in TOAST_STYLES else 0
+        y = 20 + index * (DigestWindow.HEIGHT + 10)
+        return x, y
+    
+    def _start_drag(self, event):
+        """Начало перетаскивания"""
+        self.drag_data["x"] = event.x_root - self.root.winfo_x()
+        self.drag_data["y"] = event.y_root - self.root.winfo_y()
+    
+    def _on_drag(self, event):
+        """Процесс перетаскивания"""
+        x = event.x_root - self.drag_data["x"]
+        y = event.y_root - self.drag_data["y"]
+        self.root.geometry(f"+{x}+{y}")
+    
+    def _snooze(self, minutes: int):
+        """Скрывает сводку; следующая проверка покажет ее не раньше чем через minutes минут"""
+        self.snooze_until = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
+        if self.window:
+            self.window.hide()
+    
+    def _remind_later(self):
+        """Напоминает позже (через 1 час)"""
+        self._snooze(60)
+    
+    def _close(self):
+        """Закрывает сводку (повторно - как окна уведомлений той же категории)"""
+        self._snooze({'overdue': 5, 'urgent': 15}.get(self.category, 30))
+
 class ToastManager:
     """
     Менеджер Toast-уведомлений, работающий в главном потоке
     """
     def __init__(self):
+        global toast_pool
+        
         self.root = tk.Tk()
         self.root.withdraw()
         self.root.title("Planfix Reminder")
+        toast_pool = ToastWindowPool()
+        # Первые окна строятся заранее, пока GUI простаивает
+        self.root.after_idle(toast_pool.prewarm, self.root, TOAST_POOL_PREWARM)
+        # Уведомления, ожидающие показа (появляются по одному с интервалом toast_stagger_ms)
+        self.pending = deque()
+        self.is_showing = False
+        # GUI-поток спит, пока другой поток не поставит уведомление в очередь
+        self._wakeup_pending = False
+        self.root.bind(TOAST_QUEUED_EVENT, lambda event: self.check_queue())
         self.check_queue()
         
+    def wakeup(self):
+        """
+        Будит GUI-поток после toast_queue.put (вызывается из любого потока).
+        Пока предыдущее пробуждение не обработано, новые события не отправляются
+        """
+        if self._wakeup_pending:
+            return
+        self._wakeup_pending = True
+        try:
+            self.root.event_generate(TOAST_QUEUED_EVENT, when='tail')
+        except (tk.TclError, RuntimeError):
+            # Цикл событий еще не запущен или уже остановлен
+            self._wakeup_pending = False
+        
     def check_queue(self):
-        """Проверяет очередь уведомлений"""
+        """Забирает уведомления из очереди и запускает их показ"""
+        self._wakeup_pending = False
         try:
             while True:
-                toast = toast_queue.get_nowait()
-                toast.create_window(self.root)
+                self.pending.append(toast_queue.get_nowait())
         except queue.Empty:
             pass
         
-        self.root.after(100, self.check_queue)
+        if self.pending and not self.is_showing:
+            self._show_next()
+    
+    def _show_next(self):
+        """Показывает следующее уведомление и планирует показ остальных"""
+        if not self.pending:
+            self.is_showing = False
+            return
+        
+        self.is_showing = True
+        toast = self.pending.popleft()
+        
+        if not toast.is_closed:
+            try:
+                toast.create_window(self.root)
+            except Exception as e:
+                print(f"❌ Ошибка показа уведомления: {e}")
+                toast.is_closed = True
+                active_windows.remove(toast)
+        
+        self.root.after(app_config['toast_stagger_ms'], self._show_next)
     
     def run(self):
-        """Запускает цикл обработки событий"""
+        """
+        Запускает цикл обработки событий.
+        Уведомления, поставленные до запуска цикла (например, по кэшу задач при старте),
+        не смогли разбудить GUI - их забираем сразу после запуска
+        """
+        self.root.after_idle(self.check_queue)
         self.root.mainloop()
 
 def cleanup_closed_windows():
     """
     Удаляет закрытые окна из списка активных
     """
-    global active_windows
-    active_windows = [w for w in active_windows if not w.is_closed]
+    active_windows.prune()
 
 def should_show_notification(task_id: str, category: str) -> bool:
     """
@@ -457,16 +939,13 @@ def should_show_notification(task_id: str, category: str) -> bool:
     if not task_id:
         return True
     
-    cleanup_closed_windows()
-    
     # 1. ПРОВЕРЯЕМ УЖЕ ОТКРЫТЫЕ ОКНА
-    for window in active_windows:
-        if window.task_id == task_id:
-            return False
+    if active_windows.has_task(task_id):
+        return False
     
     # 2. ПРОВЕРЯЕМ ЛИМИТЫ ОКОН
-    active_count = len(active_windows)
-    category_count = len([w for w in active_windows if w.category == category])
+    active_count = active_windows.count()
+    category_count = active_windows.count(category)
     
     if active_count >= app_config['max_total_windows']:
         return False
@@ -510,97 +989,408 @@ def cleanup_old_closed_tasks():
     for task_id in to_remove:
         del closed_tasks[task_id]
 
+def persist_closed_tasks():
+    """
+    Сохраняет закрытые и отложенные уведомления в локальный кэш
+    """
+    if task_cache:
+        try:
+            task_cache.save_closed_tasks(closed_tasks)
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить закрытые задачи в кэш: {e}")
+
+def schedule_snooze_expiry(task_id: str):
+    """
+    Планирует повторную проверку задачи в момент окончания отложения
+    """
+    task_info = closed_tasks.get(task_id) if task_id else None
+    if task_info and task_info['snooze_until']:
+        scheduler.schedule(task_info['snooze_until'], 'snooze', task_id)
+
+def open_task_cache():
+    """
+    Открывает локальный кэш и восстанавливает из него закрытые задачи,
+    время последней проверки и снимок задач. Возвращает задачи из кэша
+    """
+    global task_cache, last_check_time
+    
+    if not app_config['use_cache']:
+        return []
+    
+    cache_path = Path(app_config['cache_file'])
+    if not cache_path.is_absolute():
+        cache_path = Path(__file__).parent.absolute() / cache_path
+    
+    try:
+        task_cache = TaskCache(str(cache_path))
+        closed_tasks.update(task_cache.load_closed_tasks())
+        for task_id in list(closed_tasks):
+            schedule_snooze_expiry(task_id)
+        last_check_time = task_cache.load_last_check_time()
+        tasks = task_cache.load_tasks()
+        details = task_cache.load_details()
+    except Exception as e:
+        print(f"⚠️ Локальный кэш недоступен ({cache_path}): {e}")
+        task_cache = None
+        return []
+    
+    if tasks and planfix_api:
+        planfix_api.restore_snapshot(tasks, details)
+    
+    return tasks
+
+def save_task_cache(tasks: List[Task]):
+    """
+    Сохраняет результат успешной проверки в локальный кэш
+    """
+    if not task_cache:
+        return
+    
+    try:
+        task_cache.save_tasks(tasks)
+        if planfix_api:
+            task_cache.save_details(list(planfix_api.details.values()))
+        task_cache.save_closed_tasks(closed_tasks)
+        if last_check_time:
+            task_cache.save_last_check_time(last_check_time)
+    except Exception as e:
+        print(f"⚠️ Не удалось сохранить кэш: {e}")
+
 class PlanfixAPI:
     def __init__(self):
         self.account_url = app_config['planfix']['account_url'].rstrip('/')
         self.api_token = app_config['planfix']['api_token']
         self.filter_id = app_config['planfix']['filter_id']
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.api_token}'
-        })
+        self.client = PlanfixClient(
+            self.account_url,
+            self.api_token,
+            max_concurrency=app_config['max_parallel_requests'],
+            pool_size=app_config['http_pool_size'],
+            rate_limit=app_config['requests_per_second'],
+            max_retries=app_config['max_retries']
+        )
+        
+        # Общий сервер опроса команды (team_poller.py) вместо прямого опроса Planfix
+        self.team_client = None
+        if app_config['team_server_url'] and not self.filter_id:
+            self.team_client = PlanfixClient(
+                app_config['team_server_url'],
+                app_config['team_server_token'],
+                max_concurrency=1,
+                pool_size=1,
+                max_retries=app_config['max_retries']
+            )
+        
+        # Локальный снимок задач для инкрементальной синхронизации
+        self.snapshot = {}       # task_id: Task
+        self.details = {}        # task_id: Task с полями DETAILS_FIELDS (профиль classify)
+        self.last_changed_ids = set()
+        self._polls_since_full_sync = 0
+        self._fetch_failed = False
+
+    def get_tasks(self) -> List[Task]:
+        """
+        Получает актуальный список задач в режиме, выбранном в config.ini.
+        Если Planfix не ответил (полностью или по одной из ролей), возвращается
+        последний успешно полученный снимок, а degraded становится True
+        """
+        if self.team_client:
+            return self._get_team_tasks()
+        
+        if app_config['incremental_sync']:
+            tasks = self.sync_tasks()
+        else:
+            tasks = self._full_sync()
+        
+        # Подробности нужны только задачам из текущего снимка
+        for task_id in set(self.details) - set(self.snapshot):
+            del self.details[task_id]
+        return tasks
+
+    def poll_fields(self) -> str:
+        """Поля регулярного опроса по профилю field_profile"""
+        return FIELD_PROFILES[app_config['field_profile']]
+
+    def load_details(self, tasks: List[Task]) -> List[Task]:
+        """
+        Возвращает записи с полями для текста уведомления.
+        В профиле classify название и исполнители догружаются по id (параллельно)
+        и кэшируются, пока не изменятся статус или сроки задачи.
+        Если догрузить не удалось, возвращается исходная запись
+        """
+        if app_config['field_profile'] != 'classify' or self.team_client:
+            return tasks
+        
+        missing = [task for task in tasks if self.needs_details(task)]
+        metrics.inc('details_cache_requests_total', len(tasks) - len(missing), result='hit')
+        metrics.inc('details_cache_requests_total', len(missing), result='miss')
+        if missing:
+            user_id = app_config['planfix']['user_id']
+            fetched = self.client.map(lambda task: self.get_task(task.id, DETAILS_FIELDS), missing)
+            for task, data in zip(missing, fetched):
+                if data:
+                    self.details[task.id] = Task.from_api(data, user_id)
+        
+        return [self.details.get(task.id, task) for task in tasks]
+
+    def needs_details(self, task: Task) -> bool:
+        """Нужно ли догружать поля уведомления (нет в кэше или изменились статус/сроки)"""
+        if app_config['field_profile'] != 'classify' or self.team_client:
+            return False
+        cached = self.details.get(task.id)
+        return cached is None or cached.fingerprint() != task.fingerprint()
+    
+    def _record_fetch_error(self, error: Exception):
+        """Отмечает неудачный опрос: последний снимок остается, ошибка попадает в лог и метрики"""
+        self._fetch_failed = True
+        metrics.inc('planfix_fetch_errors_total', error=type(error).__name__)
+        print(f"⚠️ Ошибка получения задач: {error}")
+
+    @property
+    def degraded(self) -> bool:
+        """Последний опрос не удался - используются данные предыдущего снимка"""
+        return self._fetch_failed
+
+    def to_records(self, tasks: List[Dict[Any, Any]]) -> List[Task]:
+        """Преобразует задачи из ответа API в компактные записи Task"""
+        user_id = app_config['planfix']['user_id']
+        return [Task.from_api(task, user_id) for task in tasks]
+
+    def get_filtered_tasks(self, fields: str = TASK_FIELDS) -> List[Dict[Any, Any]]:
+        """
+        Получает задачи по фильтру ИЛИ по ролям пользователя
+        """
+        self._fetch_failed = False
+        try:
+            if self.filter_id:
+                return self._get_tasks_by_filter(fields)
+            else:
+                return self._get_tasks_by_roles(fields)
+        except Exception as e:
+            self._record_fetch_error(e)
+            return []
+
+    def sync_tasks(self) -> List[Task]:
+        """
+        Инкрементальная синхронизация задач.
+        Первый опрос (и каждый full_sync_every-й) загружает полный список, остальные
+        запрашивают только PROBE_FIELDS и догружают по id лишь новые и изменившиеся
+        задачи. Снимок хранится в self.snapshot, id изменений - в self.last_changed_ids
+        """
+        if not self.snapshot or self._polls_since_full_sync >= app_config['full_sync_every']:
+            return self._full_sync()
+        
+        probe = self.get_filtered_tasks(fields=PROBE_FIELDS)
+        if self._fetch_failed:
+            # Не удалось получить список - оставляем последний снимок
+            self.last_changed_ids = set()
+            return list(self.snapshot.values())
+        
+        self._polls_since_full_sync += 1
+        
+        # Записи Task создаются только для изменившихся задач, остальные остаются из снимка
+        probe_ids = []
+        changed_ids = []
+        probe_tasks = {}
+        for probe_task in probe:
+            task_id = probe_task.get('id')
+            probe_ids.append(task_id)
+            known_task = self.snapshot.get(task_id)
+            if known_task is None or known_task.fingerprint() != Task.api_fingerprint(probe_task):
+                changed_ids.append(task_id)
+                probe_tasks[task_id] = probe_task
+        
+        # Задачи, пропавшие из выборки (закрыты или сняты с пользователя)
+        for task_id in set(self.snapshot) - set(probe_ids):
+            del self.snapshot[task_id]
+        
+        if changed_ids and self.poll_fields() == PROBE_FIELDS:
+            # Проба уже содержит все поля профиля - догружать нечего
+            user_id = app_config['planfix']['user_id']
+            for task_id in changed_ids:
+                self.snapshot[task_id] = Task.from_api(probe_tasks[task_id], user_id)
+        elif changed_ids:
+            user_id = app_config['planfix']['user_id']
+            for task_id, task in zip(changed_ids, self.client.map(self.get_task, changed_ids)):
+                # Если догрузить не удалось, оставляем старую запись - повторим в следующий раз
+                if task:
+                    self.snapshot[task_id] = Task.from_api(task, user_id)
+        
+        self.last_changed_ids = set(changed_ids)
+        return [self.snapshot[task_id] for task_id in probe_ids if task_id in self.snapshot]
+
+    def _get_team_tasks(self) -> List[Task]:
+        """
+        Получает задачи пользователя с общего сервера опроса команды.
+        Сервер сам опрашивает Planfix за всех сотрудников и отдает готовые записи
+        со всеми полями уведомления, поэтому догрузка по id не нужна
+        """
+        roles = ','.join(
+            role for role, role_key in (
+                ('assignee', 'include_assignee'),
+                ('assigner', 'include_assigner'),
+                ('auditor', 'include_auditor'),
+            )
+            if app_config['roles'][role_key]
+        )
+        
+        try:
+            data = self.team_client.get("tasks", params={
+                "user_id": app_config['planfix']['user_id'],
+                "roles": roles
+            })
+            tasks = [Task.from_dict(task) for task in data.get('tasks', [])]
+        except (PlanfixError, KeyError, ValueError):
+            self._fetch_failed = True
+            self.last_changed_ids = set()
+            return list(self.snapshot.values())
+        
+        # Сервер сам не смог опросить Planfix - его снимок тоже устаревший
+        self._fetch_failed = bool(data.get('degraded'))
+        self.last_changed_ids = {
+            task.id for task in tasks
+            if task.id not in self.snapshot or self.snapshot[task.id].fingerprint() != task.fingerprint()
+        }
+        self.snapshot = {task.id: task for task in tasks}
+        return tasks
+
+    def refresh_task(self, task_id) -> Task:
+        """
+        Обновляет в снимке одну задачу по событию webhook (один запрос task/{id}).
+        Возвращает актуальную запись или None, если задача закрыта, удалена или
+        больше не относится к пользователю - тогда она убирается из снимка.
+        В режиме filter_id новые задачи не добавляются: попадание в фильтр
+        проверит очередной опрос. Временные ошибки Planfix пробрасываются
+        """
+        key = next((known_id for known_id in self.snapshot if str(known_id) == str(task_id)), task_id)
+        
+        try:
+            data = self.client.get(f"task/{task_id}", params={"fields": TASK_FIELDS}).get('task')
+        except PlanfixError as e:
+            if e.transient:
+                raise
+            data = None
+        
+        task = Task.from_api(data, app_config['planfix']['user_id']) if data else None
+        if task and not self._is_own_task(task, data, key):
+            task = None
+        
+        self.last_changed_ids = {key}
+        if task is None:
+            self.snapshot.pop(key, None)
+            self.details.pop(key, None)
+            return None
+        
+        self.snapshot[task.id] = task
+        self.details[task.id] = task
+        return task
 
-    def get_filtered_tasks(self) -> List[Dict[Any, Any]]:
+    def _is_own_task(self, task: Task, data: Dict, key) -> bool:
+        """Входит ли задача в выборку пользователя (активна и в одной из включенных ролей)"""
+        if self._active_task_or_none(data) is None:
+            return False
+        if self.filter_id:
+            return key in self.snapshot
+        
+        role_mask = sum(
+            bit for bit, role_key in (
+                (ROLE_ASSIGNEE, 'include_assignee'),
+                (ROLE_ASSIGNER, 'include_assigner'),
+                (ROLE_AUDITOR, 'include_auditor'),
+            )
+            if app_config['roles'][role_key]
+        )
+        return bool(task.roles & role_mask)
+
+    def restore_snapshot(self, tasks: List[Task], details: List[Task] = ()):
         """
-        Получает задачи по фильтру ИЛИ по ролям пользователя
+        Восстанавливает снимок задач и догруженные поля уведомлений (например,
+        из локального кэша), чтобы уведомления по ним не требовали запросов task/{id}
         """
+        self.snapshot = {task.id: task for task in tasks}
+        self.details = {task.id: task for task in details if task.id in self.snapshot}
+        self._polls_since_full_sync = 0
+
+    def _full_sync(self) -> List[Task]:
+        """Полностью перезагружает снимок задач"""
+        tasks = self.to_records(self.get_filtered_tasks(self.poll_fields()))
+        if self._fetch_failed:
+            self.last_changed_ids = set()
+            return list(self.snapshot.values())
+        
+        self.last_changed_ids = {
+            task.id for task in tasks
+            if task.id not in self.snapshot or self.snapshot[task.id].fingerprint() != task.fingerprint()
+        }
+        self.snapshot = {task.id: task for task in tasks}
+        self._polls_since_full_sync = 0
+        return tasks
+
+    def get_task(self, task_id, fields: str = TASK_FIELDS) -> Dict[Any, Any]:
+        """Получает одну задачу по id (None при ошибке)"""
         try:
-            if self.filter_id:
-                return self._get_tasks_by_filter()
-            else:
-                return self._get_tasks_by_roles()
-        except Exception:
-            return []
+            data = self.client.get(f"task/{task_id}", params={"fields": fields})
+            return data.get('task')
+        except PlanfixError:
+            return None
 
-    def _get_tasks_by_filter(self) -> List[Dict[Any, Any]]:
+    def _get_tasks_by_filter(self, fields: str = TASK_FIELDS) -> List[Dict[Any, Any]]:
         """Получает задачи по готовому фильтру Planfix"""
         try:
             payload = {
-                "offset": 0,
-                "pageSize": 100,
                 "filterId": int(self.filter_id),
-                "fields": "id,name,description,endDateTime,startDateTime,status,priority,assignees,participants,auditors,assigner,overdue"
+                "fields": fields
             }
             
-            response = self.session.post(
-                f"{self.account_url}/task/list",
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('result') != 'fail':
-                    all_tasks = data.get('tasks', [])
-                    return self._filter_active_tasks(all_tasks)
+            return self._fetch_all_pages(payload)
             
-            return []
-            
-        except Exception:
+        except Exception as e:
+            self._record_fetch_error(e)
             return []
 
-    def _get_tasks_by_roles(self) -> List[Dict[Any, Any]]:
-        """Получает задачи по ролям пользователя"""
+    def _get_tasks_by_roles(self, fields: str = TASK_FIELDS) -> List[Dict[Any, Any]]:
+        """
+        Получает задачи по ролям пользователя.
+        Запросы по включенным ролям выполняются параллельно, поэтому время опроса
+        равно самому медленному из них, а не их сумме
+        """
         user_id = app_config['planfix']['user_id']
         all_tasks = []
         task_ids_seen = set()
         
-        # 1. Задачи где пользователь - ИСПОЛНИТЕЛЬ
-        if app_config['roles']['include_assignee']:
-            assignee_tasks = self._get_tasks_by_role_type(user_id, role_type=2)
-            for task in assignee_tasks:
-                task_id = task.get('id')
-                if task_id not in task_ids_seen:
-                    task_ids_seen.add(task_id)
-                    all_tasks.append(task)
-        
-        # 2. Задачи где пользователь - POSTАНОВЩИК
-        if app_config['roles']['include_assigner']:
-            assigner_tasks = self._get_tasks_by_role_type(user_id, role_type=3)
-            for task in assigner_tasks:
-                task_id = task.get('id')
-                if task_id not in task_ids_seen:
-                    task_ids_seen.add(task_id)
-                    all_tasks.append(task)
-        
-        # 3. Задачи где пользователь - КОНТРОЛЕР/УЧАСТНИК
-        if app_config['roles']['include_auditor']:
-            auditor_tasks = self._get_tasks_by_role_type(user_id, role_type=4)
-            for task in auditor_tasks:
-                task_id = task.get('id')
-                if task_id not in task_ids_seen:
-                    task_ids_seen.add(task_id)
-                    all_tasks.append(task)
-        
-        return self._filter_active_tasks(all_tasks)
-
-    def _get_tasks_by_role_type(self, user_id: str, role_type: int) -> List[Dict]:
+        # 2 - ИСПОЛНИТЕЛЬ, 3 - ПОСТАНОВЩИК, 4 - КОНТРОЛЕР/УЧАСТНИК
+        role_types = [
+            role_type for role_key, role_type in (
+                ('include_assignee', 2),
+                ('include_assigner', 3),
+                ('include_auditor', 4),
+            )
+            if app_config['roles'][role_key]
+        ]
+        
+        if not role_types:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=len(role_types)) as executor:
+            futures = [
+                executor.submit(self._get_tasks_by_role_type, user_id, role_type, fields)
+                for role_type in role_types
+            ]
+            
+            # Сливаем результаты по мере готовности
+            for future in as_completed(futures):
+                for task in future.result():
+                    task_id = task.get('id')
+                    if task_id not in task_ids_seen:
+                        task_ids_seen.add(task_id)
+                        all_tasks.append(task)
+        
+        return all_tasks
+
+    def _get_tasks_by_role_type(self, user_id: str, role_type: int, fields: str = TASK_FIELDS) -> List[Dict]:
         """Получает задачи по конкретному типу роли"""
         try:
             payload = {
-                "offset": 0,
-                "pageSize": 100,
                 "filters": [
                     {
                         "type": role_type,
@@ -608,42 +1398,43 @@ class PlanfixAPI:
                         "value": f"user:{user_id}"
                     }
                 ],
-                "fields": "id,name,description,endDateTime,startDateTime,status,priority,assignees,participants,auditors,assigner,overdue"
+                "fields": fields
             }
             
-            response = self.session.post(
-                f"{self.account_url}/task/list",
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('result') != 'fail':
-                    return data.get('tasks', [])
+            return self._fetch_all_pages(payload)
             
+        except Exception as e:
+            self._record_fetch_error(e)
             return []
-            
-        except Exception:
+
+    def _fetch_all_pages(self, payload: Dict) -> List[Dict]:
+        """
+        Получает все страницы task/list (параллельно, через общий клиент).
+        Закрытые задачи отбрасываются прямо при потоковом разборе ответа
+        """
+        try:
+            return self.client.fetch_pages("task/list", payload, 'tasks', transform=self._active_task_or_none)
+        except PlanfixError as e:
+            self._record_fetch_error(e)
             return []
 
-    def _filter_active_tasks(self, all_tasks: List[Dict]) -> List[Dict]:
-        """Фильтрует только активные задачи (убирает закрытые)"""
-        active_tasks = []
-        closed_statuses = ['Выполненная', 'Отменена', 'Закрыта', 'Завершенная']
-        
-        for task in all_tasks:
-            status = task.get('status', {})
-            status_name = status.get('name', '') if isinstance(status, dict) else str(status)
-            
-            if status_name not in closed_statuses:
-                active_tasks.append(task)
+    @staticmethod
+    def _active_task_or_none(task: Dict) -> Dict:
+        """Возвращает задачу, если она активна, иначе None (закрытые отбрасываются)"""
+        status = task.get('status', {})
+        status_name = status.get('name', '') if isinstance(status, dict) else str(status)
         
-        return active_tasks
+        if status_name in CLOSED_STATUSES:
+            return None
+        return task
 
     def test_connection(self) -> bool:
-        """Тестирует соединение с API"""
+        """Тестирует соединение с API (или с сервером опроса команды)"""
         try:
+            if self.team_client:
+                self.team_client.get("health", timeout=10)
+                return True
+            
             if self.filter_id:
                 payload = {
                     "offset": 0,
@@ -658,113 +1449,54 @@ class PlanfixAPI:
                     "fields": "id,name"
                 }
             
-            response = self.session.post(
-                f"{self.account_url}/task/list",
-                json=payload,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('result') == 'fail':
-                    return False
-                return True
-            else:
-                return False
+            self.client.post("task/list", payload, timeout=10)
+            return True
         except Exception:
             return False
 
-def categorize_tasks(tasks: List[Dict]) -> Dict[str, List[Dict]]:
+def classify_tasks(tasks: List[Task], today: datetime.date = None) -> Dict[str, List[int]]:
     """
-    Категоризует задачи на текущие, просроченные и срочные
+    Классифицирует задачи за один проход.
+    Возвращает индексы задач по категориям overdue/urgent/current (без копирования задач).
+    Статус не проверяется - закрытые задачи уже отброшены в PlanfixAPI._active_task_or_none
     """
-    today = datetime.date.today()
+    today = today or datetime.date.today()
     tomorrow = today + datetime.timedelta(days=1)
     
-    categorized = {
-        'overdue': [],
-        'urgent': [],
-        'current': []
-    }
-    
-    closed_statuses = ['Выполненная', 'Отменена', 'Закрыта', 'Завершенная']
+    overdue = []
+    urgent = []
+    current = []
     
-    for task in tasks:
-        try:
-            status = task.get('status', {})
-            status_name = status.get('name', '') if isinstance(status, dict) else str(status)
-            
-            if status_name in closed_statuses:
-                continue
-            
-            if task.get('overdue', False):
-                categorized['overdue'].append(task)
-                continue
-            
-            end_date_info = task.get('endDateTime')
-            end_date = None
-            
-            if end_date_info:
-                if isinstance(end_date_info, dict):
-                    date_str = (end_date_info.get('datetime') or 
-                              end_date_info.get('date') or 
-                              end_date_info.get('dateTimeUtcSeconds'))
-                else:
-                    date_str = str(end_date_info)
-                
-                if date_str:
-                    try:
-                        if 'T' in date_str:
-                            end_date = datetime.datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
-                        elif '-' in date_str:
-                            formats_to_try = ['%d-%m-%Y', '%Y-%m-%d', '%d-%m-%y']
-                            for date_format in formats_to_try:
-                                try:
-                                    end_date = datetime.datetime.strptime(date_str, date_format).date()
-                                    break
-                                except ValueError:
-                                    continue
-                        elif '.' in date_str:
-                            formats_to_try = ['%d.%m.%Y', '%d.%m.%y']
-                            for date_format in formats_to_try:
-                                try:
-                                    end_date = datetime.datetime.strptime(date_str, date_format).date()
-                                    break
-                                except ValueError:
-                                    continue
-                    except Exception:
-                        pass
-            
-            if not end_date:
-                end_date_str = task.get('endDate', '')
-                if end_date_str:
-                    try:
-                        if 'T' in end_date_str:
-                            end_date = datetime.datetime.fromisoformat(end_date_str.replace('Z', '+00:00')).date()
-                        else:
-                            for date_format in ['%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y']:
-                                try:
-                                    end_date = datetime.datetime.strptime(end_date_str, date_format).date()
-                                    break
-                                except ValueError:
-                                    continue
-                    except Exception:
-                        pass
-            
-            if end_date:
-                if end_date < today:
-                    categorized['overdue'].append(task)
-                elif end_date <= tomorrow:
-                    categorized['urgent'].append(task)
-                else:
-                    categorized['current'].append(task)
-            else:
-                categorized['current'].append(task)
-                
-        except Exception:
-            categorized['current'].append(task)
+    for index, task in enumerate(tasks):
+        if task.overdue:
+            overdue.append(index)
+            continue
+        
+        end_date = task.end_date
+        
+        if not end_date:
+            current.append(index)
+        elif end_date < today:
+            overdue.append(index)
+        elif end_date <= tomorrow:
+            urgent.append(index)
+        else:
+            current.append(index)
     
-    return categorized
+    return {
+        'overdue': overdue,
+        'urgent': urgent,
+        'current': current
+    }
+
+def categorize_tasks(tasks: List[Task]) -> Dict[str, List[Task]]:
+    """
+    Категоризует задачи на текущие, просроченные и срочные
+    """
+    return {
+        category: [tasks[index] for index in indices]
+        for category, indices in classify_tasks(tasks).items()
+    }
 
 def show_toast_notification(title: str, message: str, category: str, task_id: str = None):
     """
@@ -775,7 +1507,11 @@ def show_toast_notification(title: str, message: str, category: str, task_id: st
     
     try:
         toast = ToastNotification(title, message, category, task_id)
+        # Окно учитывается в лимитах сразу, еще до показа в GUI-потоке
+        active_windows.add(toast)
         toast_queue.put(toast)
+        if toast_manager:
+            toast_manager.wakeup()
         return True
     except Exception:
         try:
@@ -789,32 +1525,36 @@ def show_toast_notification(title: str, message: str, category: str, task_id: st
         except Exception:
             return False
 
-def format_task_message(task: Dict, category: str) -> tuple:
+def open_task_page(task_id):
+    """Открывает задачу в браузере"""
+    try:
+        account_url = app_config['planfix']['account_url'].replace('/rest', '')
+        task_url = f"{account_url}/task/{task_id}/"
+        webbrowser.open(task_url)
+    except Exception:
+        task_url = f"https://planfix.com/task/{task_id}/"
+        webbrowser.open(task_url)
+
+def format_digest_line(task: Task) -> str:
+    """
+    Строка задачи в окне-сводке. В профиле classify название берется из догруженных
+    подробностей, пока их нет - вместо названия многоточие
+    """
+    name = task.name
+    if planfix_api and task.id in planfix_api.details:
+        name = planfix_api.details[task.id].name
+    elif planfix_api and planfix_api.needs_details(task):
+        name = '…'
+    end_date = task.end_date_text if task.end_date_text not in ('', 'Не указана') else '—'
+    return f"#{task.id}  {name}  ({end_date})"
+
+def format_task_message(task: Task, category: str) -> tuple:
     """
     Форматирует сообщение для задачи
     """
-    task_name = task.get('name', 'Задача без названия')
-    
-    end_date_info = task.get('endDateTime')
-    end_date_str = 'Не указана'
-    
-    if end_date_info:
-        if isinstance(end_date_info, dict):
-            end_date_str = (end_date_info.get('date') or 
-                          end_date_info.get('datetime') or 
-                          'Указана')
-        else:
-            end_date_str = str(end_date_info)
-    
-    assignees = task.get('assignees', {})
-    assignee_names = []
-    if assignees:
-        users = assignees.get('users', [])
-        for user in users:
-            name = user.get('name', f"ID:{user.get('id')}")
-            assignee_names.append(name)
-    
-    assignee_text = ', '.join(assignee_names) if assignee_names else 'Не назначен'
+    task_name = task.name
+    end_date_str = task.end_date_text
+    assignee_text = ', '.join(task.assignees) if task.assignees else 'Не назначен'
     
     formatted_date = end_date_str
     if end_date_str and end_date_str not in ['Не указана', 'Указана']:
@@ -859,122 +1599,423 @@ def format_task_message(task: Dict, category: str) -> tuple:
     
     return title, message
 
-def load_config() -> bool:
+def update_stats(tasks: List[Task], categorized_tasks: Dict[str, List[Task]]):
     """
-    Загружает конфигурацию из файла в глобальную переменную app_config
-    С подробной диагностикой
+    Обновляет статистику для трея
     """
-    global app_config
+    current_stats['total'] = len(tasks)
+    current_stats['overdue'] = len(categorized_tasks.get('overdue', []))
+    current_stats['urgent'] = len(categorized_tasks.get('urgent', []))
+
+def dispatch_notifications(categorized_tasks: Dict[str, List[Task]]) -> int:
+    """
+    Ставит в очередь уведомления по категоризованным задачам.
+    Не блокирует поток: интервал между появлением окон выдерживает ToastManager.
+    Возвращает количество новых уведомлений
+    """
+    new_notifications = 0
+    for category, tasks_list in categorized_tasks.items():
+        if not app_config['notifications'].get(category, True):
+            continue
+        
+        # Текст нужен только задачам, которые пройдут проверку и поместятся в лимиты окон
+        free_slots = min(
+            app_config['max_total_windows'] - active_windows.count(),
+            app_config['max_windows_per_category'] - active_windows.count(category)
+        )
+        if free_slots <= 0:
+            continue
+        
+        to_show = list(islice(
+            (task for task in tasks_list if should_show_notification(str(task.id), category)),
+            free_slots
+        ))
+        if planfix_api and to_show:
+            to_show = planfix_api.load_details(to_show)
+            
+        for task in to_show:
+            task_id = str(task.id)
+            title, message = format_task_message(task, category)
+            
+            if show_toast_notification(title, message, category, task_id):
+                new_notifications += 1
+                metrics.inc('notifications_shown_total', category=category)
+                print(f"📬 Показано уведомление: {category} - {task.name}")
+    
+    return new_notifications
+
+def apply_digest_mode(categorized_tasks: Dict[str, List[Task]], changed_ids=None) -> Dict[str, List[Task]]:
+    """
+    Режим сводки (digest_threshold > 0): категория, в которой задач больше порога,
+    показывается одним окном-сводкой со всем списком. Возвращает задачи для отдельных
+    уведомлений: в таких категориях только изменившиеся с прошлой проверки (changed_ids),
+    причем категоризуются и проверяются лишь они, а не весь список.
+    changed_ids=None - изменения неизвестны, по таким категориям только сводка
+    """
+    threshold = app_config['digest_threshold']
+    if threshold <= 0:
+        return categorized_tasks
+    
+    to_notify = dict(categorized_tasks)
+    changed_by_category = None
+    
+    for category, tasks_list in categorized_tasks.items():
+        enabled = app_config['notifications'].get(category, True)
+        digest = digests.get(category)
+        
+        if not enabled or len(tasks_list) <= threshold:
+            # Категория снова помещается в отдельные окна - сводку убираем
+            if digest and digest.update([]):
+                queue_digest(digest)
+            continue
+        
+        if digest is None:
+            digest = digests[category] = DigestNotification(category)
+        if digest.update(tasks_list):
+            queue_digest(digest)
+        
+        if changed_by_category is None:
+            snapshot = planfix_api.snapshot if planfix_api else {}
+            changed_tasks = [snapshot[task_id] for task_id in (changed_ids or ()) if task_id in snapshot]
+            changed_by_category = categorize_tasks(changed_tasks)
+        changed = changed_by_category.get(category, [])
+        # Если изменилась почти вся категория (например, первая проверка), хватит сводки
+        to_notify[category] = changed if len(changed) <= threshold else []
+    
+    return to_notify
+
+def load_digest_details(category: str):
+    """Догружает названия задач, видимых в окне-сводке, и обновляет его"""
+    digest = digests.get(category)
+    if not digest or not planfix_api:
+        return
+    
+    tasks = []
+    while digest.pending_details:
+        tasks.append(digest.pending_details.popleft())
+    if tasks:
+        planfix_api.load_details(tasks)
+        queue_digest(digest)
+
+def queue_digest(digest: DigestNotification):
+    """Ставит сводку в очередь GUI-потока на показ, обновление или скрытие"""
+    toast_queue.put(digest)
+    if toast_manager:
+        toast_manager.wakeup()
+    metrics.inc('digest_updates_total', category=digest.category)
+
+def next_midnight() -> datetime.datetime:
+    """
+    Начало следующих суток - момент, когда задачи переходят в «срочные» и «просроченные»
+    """
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    return datetime.datetime.combine(tomorrow, datetime.time(0, 0))
+
+def poll_tasks() -> int:
+    """
+    Опрашивает Planfix и показывает уведомления по результатам.
+    Вызывается только из потока мониторинга (PlanfixAPI хранит состояние опроса).
+    Возвращает количество новых уведомлений
+    """
+    global current_tasks, last_check_time, poll_counter
+    
+    cleanup_closed_windows()
+    
+    # Получаем задачи
+    with metrics.timer('poll_stage_seconds', stage='fetch'):
+        tasks = planfix_api.get_tasks()
+    metrics.inc('polls_total', result='degraded' if planfix_api.degraded else 'ok')
+    metrics.inc('sync_changed_tasks_total', len(planfix_api.last_changed_ids))
+    if planfix_api.degraded:
+        print(f"⚠️ Planfix не ответил, используются данные последней успешной проверки ({len(tasks)} задач)")
+        if not tasks:
+            return 0
+    elif not tasks:
+        # Успешный пустой ответ - настоящее состояние: статистика, трей и кэш обнуляются
+        print("ℹ️ Активных задач нет")
+    
+    current_tasks = tasks
+    with metrics.timer('poll_stage_seconds', stage='categorize'):
+        categorized_tasks = categorize_tasks(tasks)
+    
+    # Обновляем статистику
+    update_stats(tasks, categorized_tasks)
+    
+    print(f"📊 Найдено задач: {current_stats['total']} (просрочено: {current_stats['overdue']}, срочно: {current_stats['urgent']})")
+    
+    # Показываем уведомления
+    with metrics.timer('poll_stage_seconds', stage='dispatch'):
+        to_notify = apply_digest_mode(categorized_tasks, planfix_api.last_changed_ids)
+        new_notifications = dispatch_notifications(to_notify)
+    
+    if new_notifications == 0:
+        print("📭 Новых уведомлений нет")
+    
+    if not planfix_api.degraded:
+        last_check_time = datetime.datetime.now()
+        with metrics.timer('poll_stage_seconds', stage='cache'):
+            save_task_cache(tasks)
+    update_tray_icon()
     
+    # Периодическая очистка
+    poll_counter += 1
+    if poll_counter >= 10:
+        cleanup_old_closed_tasks()
+        poll_counter = 0
+    
+    return new_notifications
+
+def notify_check_result(new_notifications: int):
+    """Сообщает в трее результат проверки, запрошенной пользователем"""
+    if not tray_icon:
+        return
+    if planfix_api.degraded:
+        tray_icon.notify("Planfix не ответил, показаны данные последней проверки", "Planfix Reminder")
+    elif new_notifications > 0:
+        tray_icon.notify(f"Найдено {new_notifications} новых уведомлений", "Planfix Reminder")
+    else:
+        tray_icon.notify(f"Найдено {current_stats['total']} задач, новых уведомлений нет", "Planfix Reminder")
+
+def notify_snoozed_task(task_id: str):
+    """
+    Показывает уведомление по задаче, у которой закончилось время отложения
+    (по данным последней проверки, без запроса к API)
+    """
+    for task in current_tasks:
+        if str(task.id) == task_id:
+            dispatch_notifications(categorize_tasks([task]))
+            return
+
+def process_task_event(task_id: str):
+    """
+    Обрабатывает событие webhook по одной задаче: обновляет снимок и сразу
+    показывает уведомление, если оно нужно, без полного опроса Planfix
+    """
+    global current_tasks
+    
+    try:
+        task = planfix_api.refresh_task(task_id)
+    except PlanfixError as e:
+        print(f"⚠️ Не удалось получить задачу {task_id} по событию webhook, дождемся опроса: {e}")
+        return
+    
+    current_tasks = list(planfix_api.snapshot.values())
+    update_stats(current_tasks, categorize_tasks(current_tasks))
+    update_tray_icon()
+    save_task_cache(current_tasks)
+    
+    if task is None:
+        print(f"🔔 Событие по задаче {task_id}: задача закрыта или больше не относится к вам")
+        return
+    
+    print(f"🔔 Событие по задаче {task_id}: {task.name}")
+    if not is_paused:
+        dispatch_notifications(categorize_tasks([task]))
+
+def on_webhook_event(task_id: str):
+    """
+    Вызывается приемником webhook: передает событие в поток мониторинга.
+    Повторные события по той же задаче до обработки сливаются в одно
+    """
+    metrics.inc('webhook_events_total')
+    scheduler.schedule_in(0, 'task_event', task_id)
+
+def start_webhook_receiver():
+    """Запускает приемник webhook, если он включен в config.ini (webhook_port)"""
+    global webhook_receiver
+    
+    if not app_config['webhook_port']:
+        return
+    
+    from webhook_receiver import WebhookReceiver
+    try:
+        webhook_receiver = WebhookReceiver(
+            on_webhook_event,
+            host=app_config['webhook_host'],
+            port=app_config['webhook_port'],
+            secret=app_config['webhook_secret']
+        ).start()
+        print(f"✅ Приемник webhook: {webhook_receiver.url} (сверка с Planfix каждые {app_config['reconcile_interval']} сек)")
+    except OSError as e:
+        webhook_receiver = None
+        print(f"⚠️ Не удалось запустить приемник webhook на порту {app_config['webhook_port']}: {e}")
+
+def dump_metrics():
+    """Сохраняет метрики в JSON-файл metrics_file (если он задан в config.ini)"""
+    if not app_config['metrics_file']:
+        return
+    
+    try:
+        metrics.dump_json(app_config['metrics_file'])
+    except OSError as e:
+        print(f"⚠️ Не удалось сохранить метрики: {e}")
+
+def start_metrics():
+    """Регистрирует показатели очереди и снимка и запускает сервер метрик (metrics_port)"""
+    # Очередь toast_queue GUI-поток сразу перекладывает в ToastManager.pending - считаем обе
+    metrics.gauge('toast_queue_depth', lambda: toast_queue.qsize() + (len(toast_manager.pending) if toast_manager else 0))
+    metrics.gauge('toast_windows_open', active_windows.count)
+    metrics.gauge('snapshot_tasks', lambda: len(planfix_api.snapshot) if planfix_api else 0)
+    metrics.gauge('planfix_circuit_cooldown_seconds', lambda: planfix_api.client.cooldown() if planfix_api else 0)
+    
+    if not app_config['metrics_port']:
+        return
+    
+    from metrics import start_metrics_server
+    try:
+        start_metrics_server(app_config['metrics_host'], app_config['metrics_port'])
+        print(f"✅ Метрики: http://{app_config['metrics_host']}:{app_config['metrics_port']}/metrics")
+    except OSError as e:
+        print(f"⚠️ Не удалось запустить сервер метрик на порту {app_config['metrics_port']}: {e}")
+
+def refresh_categories():
+    """
+    Пересчитывает категории задач последней проверки (после смены суток)
+    """
+    if not current_tasks:
+        return
+    
+    categorized_tasks = categorize_tasks(current_tasks)
+    update_stats(current_tasks, categorized_tasks)
+    update_tray_icon()
+    
+    if not is_paused:
+        dispatch_notifications(apply_digest_mode(categorized_tasks))
+
+def handle_scheduled_event(kind: str, key):
+    """
+    Обрабатывает событие планировщика в потоке мониторинга
+    """
+    if kind == 'poll':
+        # key == 'manual' - проверка, запрошенная из меню трея (выполняется и на паузе)
+        manual = key == 'manual'
+        if is_paused and not manual:
+            # Опрос возобновится по окончании паузы
+            return
+        try:
+            with metrics.timer('poll_seconds'):
+                new_notifications = poll_tasks()
+            dump_metrics()
+            if manual:
+                notify_check_result(new_notifications)
+            # С webhook изменения приходят сразу, опрос нужен только для сверки
+            interval = app_config['reconcile_interval'] if webhook_receiver else app_config['check_interval']
+            if planfix_api.degraded:
+                # Повторяем раньше, но не раньше, чем автомат защиты пропустит запрос
+                interval = min(interval, max(DEGRADED_RETRY_INTERVAL, planfix_api.client.cooldown()))
+            scheduler.schedule_in(interval, 'poll')
+        except Exception as e:
+            print(f"❌ Ошибка в мониторинге: {e}")
+            if manual and tray_icon:
+                tray_icon.notify(f"Ошибка проверки: {str(e)[:50]}", "Planfix Reminder")
+            scheduler.schedule_in(DEGRADED_RETRY_INTERVAL, 'poll')
+    elif kind == 'snooze':
+        if not is_paused:
+            notify_snoozed_task(key)
+    elif kind == 'digest_details':
+        load_digest_details(key)
+    elif kind == 'task_event':
+        with metrics.timer('webhook_event_seconds'):
+            process_task_event(key)
+    elif kind == 'midnight':
+        scheduler.schedule(next_midnight(), 'midnight')
+        refresh_categories()
+    elif kind == 'resume':
+        resume_monitoring()
+
+@lru_cache(maxsize=1)
+def find_config_path():
+    """
+    Путь к config.ini: текущая директория, затем директория скрипта.
+    Ищется один раз за запуск (None - файл не найден)
+    """
+    for path in (Path.cwd() / 'config.ini', Path(__file__).parent.absolute() / 'config.ini'):
+        if path.is_file():
+            return path
+    return None
+
+def print_config_search_diagnostics():
+    """Подробно выводит, где искался config.ini и что лежит в этих директориях"""
     print("=== ДИАГНОСТИКА ПОИСКА КОНФИГА ===")
     
-    # Определяем возможные пути к конфигу
     script_dir = Path(__file__).parent.absolute()
     current_dir = Path.cwd()
     
     print(f"Текущая рабочая директория: {current_dir}")
     print(f"Директория скрипта: {script_dir}")
-    print()
-    
-    config_paths = [
-        current_dir / 'config.ini',
-        script_dir / 'config.ini',
-        Path('config.ini'),
-    ]
-    
-    config_file_path = None
-    
-    # Ищем конфиг в разных местах
-    for i, path in enumerate(config_paths, 1):
-        print(f"🔍 Путь {i}: {path}")
-        print(f"   Абсолютный: {path.absolute()}")
-        print(f"   Существует: {path.exists()}")
-        
-        if path.exists():
-            try:
-                size = path.stat().st_size
-                print(f"   ✅ Размер: {size} байт")
-                config_file_path = path
-                break
-            except Exception as e:
-                print(f"   ❌ Ошибка доступа: {e}")
-        else:
-            print(f"   ❌ Файл не найден")
-        print()
     
-    if not config_file_path:
-        print("🚨 ФАЙЛ CONFIG.INI НЕ НАЙДЕН!")
-        
-        print(f"\n📂 Содержимое текущей директории ({current_dir}):")
+    for directory in dict.fromkeys((current_dir, script_dir)):
+        print(f"\n📂 Содержимое {directory}:")
         try:
-            for item in sorted(current_dir.iterdir()):
+            for item in sorted(directory.iterdir()):
                 if item.is_file():
                     print(f"   📄 {item.name}")
                 else:
                     print(f"   📁 {item.name}/")
         except Exception as e:
             print(f"   ❌ Ошибка чтения: {e}")
-        
-        if current_dir != script_dir:
-            print(f"\n📂 Содержимое директории скрипта ({script_dir}):")
-            try:
-                for item in sorted(script_dir.iterdir()):
-                    if item.is_file():
-                        print(f"   📄 {item.name}")
-                    else:
-                        print(f"   📁 {item.name}/")
-            except Exception as e:
-                print(f"   ❌ Ошибка чтения: {e}")
-        
-        return False
+
+def load_config() -> bool:
+    """
+    Загружает конфигурацию из файла в глобальную переменную app_config.
+    Подробная диагностика выводится только если конфиг загрузить не удалось
+    """
+    global app_config
     
-    print(f"✅ НАЙДЕН CONFIG.INI: {config_file_path}")
+    config_file_path = find_config_path()
+    if not config_file_path:
+        print("🚨 ФАЙЛ CONFIG.INI НЕ НАЙДЕН!")
+        print_config_search_diagnostics()
+        return False
     
-    # Читаем конфиг с разными кодировками
+    # Читаем конфиг с разными кодировками, подробности копим на случай ошибки
     config = configparser.ConfigParser()
     encodings_to_try = ['utf-8', 'cp1251', 'windows-1251', 'latin-1']
+    diagnostics = []
     
     config_loaded = False
     for encoding in encodings_to_try:
         try:
-            print(f"Пробую кодировку: {encoding}")
+            diagnostics.append(f"Пробую кодировку: {encoding}")
             config.read(str(config_file_path), encoding=encoding)
             
             # Проверяем что секции загрузились
             sections = config.sections()
-            print(f"  Найдены секции: {sections}")
+            diagnostics.append(f"  Найдены секции: {sections}")
             
             if 'Planfix' not in sections:
-                print(f"  ❌ Секция [Planfix] не найдена")
+                diagnostics.append(f"  ❌ Секция [Planfix] не найдена")
                 continue
                 
             # Проверяем обязательные поля
             api_token = config.get('Planfix', 'api_token', fallback='')
             account_url = config.get('Planfix', 'account_url', fallback='')
             
-            print(f"  API Token: {'***' + api_token[-4:] if len(api_token) > 4 else 'НЕ ЗАДАН'}")
-            print(f"  Account URL: {account_url}")
+            diagnostics.append(f"  API Token: {'***' + api_token[-4:] if len(api_token) > 4 else 'НЕ ЗАДАН'}")
+            diagnostics.append(f"  Account URL: {account_url}")
             
             if not api_token or api_token in ['ВАШ_API_ТОКЕН', 'YOUR_API_TOKEN', 'YOUR_API_TOKEN_HERE']:
-                print(f"  ❌ API токен не настроен")
+                diagnostics.append(f"  ❌ API токен не настроен")
                 continue
                 
             if not account_url.endswith('/rest'):
-                print(f"  ❌ URL должен заканчиваться на /rest")
+                diagnostics.append(f"  ❌ URL должен заканчиваться на /rest")
                 continue
             
             config_loaded = True
-            print(f"  ✅ Конфиг успешно загружен с кодировкой {encoding}")
             break
             
         except Exception as e:
-            print(f"  ❌ Ошибка с кодировкой {encoding}: {e}")
+            diagnostics.append(f"  ❌ Ошибка с кодировкой {encoding}: {e}")
             continue
     
     if not config_loaded:
-        print("❌ НЕ УДАЛОСЬ ЗАГРУЗИТЬ КОНФИГ!")
+        print(f"❌ НЕ УДАЛОСЬ ЗАГРУЗИТЬ КОНФИГ: {config_file_path}")
+        print("\n".join(diagnostics))
         return False
     
+    print(f"✅ Конфиг: {config_file_path} ({encoding})")
+    
     try:
         # Загружаем настройки
         app_config['planfix']['api_token'] = config['Planfix']['api_token']
@@ -990,6 +2031,31 @@ def load_config() -> bool:
         app_config['check_interval'] = int(config.get('Settings', 'check_interval', fallback=300))
         app_config['max_windows_per_category'] = int(config.get('Settings', 'max_windows_per_category', fallback=5))
         app_config['max_total_windows'] = int(config.get('Settings', 'max_total_windows', fallback=10))
+        app_config['max_parallel_requests'] = max(1, int(config.get('Settings', 'max_parallel_requests', fallback=4)))
+        app_config['http_pool_size'] = max(1, int(config.get('Settings', 'http_pool_size', fallback=10)))
+        app_config['requests_per_second'] = max(0.0, float(config.get('Settings', 'requests_per_second', fallback=5)))
+        app_config['max_retries'] = max(0, int(config.get('Settings', 'max_retries', fallback=3)))
+        app_config['toast_stagger_ms'] = max(0, int(config.get('Settings', 'toast_stagger_ms', fallback=300)))
+        app_config['digest_threshold'] = max(0, int(config.get('Settings', 'digest_threshold', fallback=0)))
+        app_config['incremental_sync'] = config.getboolean('Settings', 'incremental_sync', fallback=False)
+        app_config['full_sync_every'] = max(1, int(config.get('Settings', 'full_sync_every', fallback=12)))
+        app_config['field_profile'] = config.get('Settings', 'field_profile', fallback='classify').strip().lower()
+        if app_config['field_profile'] not in FIELD_PROFILES:
+            print(f"⚠️ Неизвестный field_profile '{app_config['field_profile']}', используется classify")
+            app_config['field_profile'] = 'classify'
+        app_config['team_server_url'] = config.get('Settings', 'team_server_url', fallback='').strip()
+        app_config['team_server_token'] = config.get('Settings', 'team_server_token', fallback='').strip()
+        if app_config['team_server_url'] and app_config['planfix']['filter_id']:
+            print("⚠️ team_server_url работает только с ролями, используется filter_id и прямой опрос")
+        app_config['webhook_port'] = max(0, int(config.get('Settings', 'webhook_port', fallback=0)))
+        app_config['webhook_host'] = config.get('Settings', 'webhook_host', fallback='127.0.0.1').strip()
+        app_config['webhook_secret'] = config.get('Settings', 'webhook_secret', fallback='').strip()
+        app_config['reconcile_interval'] = max(60, int(config.get('Settings', 'reconcile_interval', fallback=1800)))
+        app_config['metrics_port'] = max(0, int(config.get('Settings', 'metrics_port', fallback=0)))
+        app_config['metrics_host'] = config.get('Settings', 'metrics_host', fallback='127.0.0.1').strip()
+        app_config['metrics_file'] = config.get('Settings', 'metrics_file', fallback='').strip()
+        app_config['use_cache'] = config.getboolean('Settings', 'use_cache', fallback=True)
+        app_config['cache_file'] = config.get('Settings', 'cache_file', fallback='planfix_cache.db')
         
         app_config['notifications']['current'] = config.getboolean('Settings', 'notify_current', fallback=True)
         app_config['notifications']['urgent'] = config.getboolean('Settings', 'notify_urgent', fallback=True)
@@ -1001,10 +2067,6 @@ def load_config() -> bool:
             app_config['roles']['include_assigner'] = config.getboolean('Roles', 'include_assigner', fallback=True)
             app_config['roles']['include_auditor'] = config.getboolean('Roles', 'include_auditor', fallback=True)
         
-        print("✅ Все настройки успешно загружены")
-        print(f"   Filter ID: {app_config['planfix']['filter_id'] or 'НЕ ИСПОЛЬЗУЕТСЯ'}")
-        print(f"   User ID: {app_config['planfix']['user_id']}")
-        print("=" * 35)
         return True
         
     except Exception as e:
@@ -1015,43 +2077,66 @@ def load_config() -> bool:
 # ФУНКЦИИ СИСТЕМНОГО ТРЕЯ
 # ========================================
 
-def create_tray_icon():
-    """Создает иконку для системного трея"""
+def tray_icon_state() -> str:
+    """Состояние, которое показывает иконка трея: paused/overdue/urgent/ok"""
+    if is_paused:
+        return 'paused'
+    if current_stats['overdue'] > 0:
+        return 'overdue'
+    if current_stats['urgent'] > 0:
+        return 'urgent'
+    return 'ok'
+
+@lru_cache(maxsize=1)
+def get_tray_font():
+    """Шрифт буквы на иконке (загружается с диска один раз)"""
+    try:
+        from PIL import ImageFont
+        return ImageFont.truetype("arial.ttf", 24)
+    except:
+        return None
+
+def render_tray_icon(state: str):
+    """Рисует иконку трея для состояния"""
     # Создаем простую иконку программно
     image = Image.new('RGBA', (64, 64), (0, 0, 0, 0))
     draw = ImageDraw.Draw(image)
     
-    # Определяем цвет по состоянию
-    global current_stats, is_paused
-    
-    if is_paused:
-        color = (128, 128, 128)  # Серый - на паузе
-    elif current_stats['overdue'] > 0:
-        color = (255, 68, 68)    # Красный - есть просроченные
-    elif current_stats['urgent'] > 0:
-        color = (255, 136, 0)    # Оранжевый - есть срочные
-    else:
-        color = (0, 200, 0)      # Зеленый - все хорошо
-    
     # Рисуем круг
-    draw.ellipse([8, 8, 56, 56], fill=color, outline=(255, 255, 255), width=2)
+    draw.ellipse([8, 8, 56, 56], fill=TRAY_COLORS[state], outline=(255, 255, 255), width=2)
     
     # Добавляем букву P
-    try:
-        from PIL import ImageFont
-        font = ImageFont.truetype("arial.ttf", 24)
-    except:
-        font = None
-    
-    draw.text((32, 32), "P", fill=(255, 255, 255), anchor="mm", font=font)
+    draw.text((32, 32), "P", fill=(255, 255, 255), anchor="mm", font=get_tray_font())
     
     return image
 
+def create_tray_icon():
+    """Возвращает иконку для текущего состояния (из кэша, рисуется один раз на состояние)"""
+    state = tray_icon_state()
+    image = tray_icon_images.get(state)
+    if image is None:
+        image = tray_icon_images[state] = render_tray_icon(state)
+    return image
+
+def prerender_tray_icons():
+    """Заранее рисует иконки всех состояний"""
+    for state in TRAY_COLORS:
+        if state not in tray_icon_images:
+            tray_icon_images[state] = render_tray_icon(state)
+
 def update_tray_icon():
-    """Обновляет иконку в трее"""
-    global tray_icon
+    """
+    Обновляет иконку и меню трея. Вызывается при каждом изменении состояния
+    (проверка, событие webhook, пауза, смена суток), поэтому периодически
+    перестраивать меню не нужно. Иконка заменяется, только если изменилось состояние
+    """
+    global tray_icon, shown_tray_state
     if tray_icon:
-        tray_icon.icon = create_tray_icon()
+        state = tray_icon_state()
+        if state != shown_tray_state:
+            tray_icon.icon = create_tray_icon()
+            shown_tray_state = state
+        tray_icon.menu = get_tray_menu()
 
 def get_tray_menu():
     """Создает меню для системного трея"""
@@ -1094,51 +2179,19 @@ def get_tray_menu():
     return menu
 
 def check_tasks_now():
-    """Принудительно проверяет задачи сейчас"""
-    global last_check_time
-    try:
-        if planfix_api:
-            tasks = planfix_api.get_filtered_tasks()
-            categorized_tasks = categorize_tasks(tasks)
-            
-            # Обновляем статистику
-            current_stats['total'] = len(tasks)
-            current_stats['overdue'] = len(categorized_tasks['overdue'])
-            current_stats['urgent'] = len(categorized_tasks['urgent'])
-            
-            # Показываем уведомления
-            new_notifications = 0
-            for category, tasks_list in categorized_tasks.items():
-                if not app_config['notifications'].get(category, True):
-                    continue
-                    
-                for task in tasks_list:
-                    task_id = str(task.get('id'))
-                    title, message = format_task_message(task, category)
-                    
-                    if show_toast_notification(title, message, category, task_id):
-                        new_notifications += 1
-                        time.sleep(0.5)
-            
-            last_check_time = datetime.datetime.now()
-            update_tray_icon()
-            
-            # Показываем balloon tip с результатом
-            if tray_icon:
-                if new_notifications > 0:
-                    tray_icon.notify(f"Найдено {new_notifications} новых уведомлений", "Planfix Reminder")
-                else:
-                    tray_icon.notify(f"Найдено {len(tasks)} задач, новых уведомлений нет", "Planfix Reminder")
-                    
-    except Exception as e:
-        if tray_icon:
-            tray_icon.notify(f"Ошибка проверки: {str(e)[:50]}", "Planfix Reminder")
+    """
+    Принудительно проверяет задачи сейчас.
+    Проверка выполняется в потоке мониторинга, как обычный опрос: PlanfixAPI
+    хранит снимок и состояние опроса, и два опроса одновременно его портят
+    """
+    scheduler.schedule_in(0, 'poll', 'manual')
 
 def pause_monitoring(minutes: int):
     """Ставит мониторинг на паузу"""
     global is_paused, pause_until
     is_paused = True
     pause_until = datetime.datetime.now() + datetime.timedelta(minutes=minutes)
+    scheduler.schedule(pause_until, 'resume')
     update_tray_icon()
     
     if tray_icon:
@@ -1150,6 +2203,7 @@ def pause_until_tomorrow():
     is_paused = True
     tomorrow = datetime.date.today() + datetime.timedelta(days=1)
     pause_until = datetime.datetime.combine(tomorrow, datetime.time(9, 0))
+    scheduler.schedule(pause_until, 'resume')
     update_tray_icon()
     
     if tray_icon:
@@ -1160,6 +2214,9 @@ def resume_monitoring():
     global is_paused, pause_until
     is_paused = False
     pause_until = None
+    scheduler.cancel('resume')
+    # Сразу проверяем задачи, пропущенные за время паузы
+    scheduler.schedule_in(0, 'poll')
     update_tray_icon()
     
     if tray_icon:
@@ -1224,8 +2281,10 @@ def on_double_click(icon, item):
 
 def create_and_run_tray():
     """Создает и запускает системный трей"""
-    global tray_icon
+    global tray_icon, shown_tray_state
     
+    prerender_tray_icons()
+    shown_tray_state = tray_icon_state()
     tray_icon = pystray.Icon(
         name="Planfix Reminder",
         icon=create_tray_icon(),
@@ -1233,15 +2292,6 @@ def create_and_run_tray():
         menu=get_tray_menu()
     )
     
-    # Обновляем меню каждые 30 секунд
-    def update_menu():
-        while True:
-            time.sleep(30)
-            if tray_icon:
-                tray_icon.menu = get_tray_menu()
-    
-    threading.Thread(target=update_menu, daemon=True).start()
-    
     # Запускаем трей
     tray_icon.run_detached()
 
@@ -1249,7 +2299,7 @@ def main():
     """
     Основная функция программы с системным треем
     """
-    global planfix_api, current_stats, last_check_time
+    global planfix_api, current_stats, last_check_time, toast_manager
     
     print("🚀 Запуск Planfix Reminder...")
     print("=" * 40)
@@ -1283,9 +2333,15 @@ def main():
     print("\n🌐 Подключение к Planfix API...")
     planfix_api = PlanfixAPI()
     
-    # Тестируем соединение
+    # Восстанавливаем состояние из локального кэша
+    cached_tasks = open_task_cache()
+    if cached_tasks:
+        update_stats(cached_tasks, categorize_tasks(cached_tasks))
+        print(f"💾 Из кэша загружено задач: {len(cached_tasks)}, закрытых уведомлений: {len(closed_tasks)}")
+    
+    # Тестируем соединение (при наличии кэша проверка выполнится фоновым обновлением)
     print("🔄 Проверка подключения...")
-    if not planfix_api.test_connection():
+    if not cached_tasks and not planfix_api.test_connection():
         print("❌ Не удалось подключиться к Planfix API")
         
         try:
@@ -1313,6 +2369,9 @@ def main():
     print(f"   User ID: {app_config['planfix']['user_id']}")
     print(f"   Интервал проверки: {app_config['check_interval']} сек")
     
+    start_webhook_receiver()
+    start_metrics()
+    
     print("\n🎯 Создание системного трея...")
     # Создаем и запускаем системный трей
     try:
@@ -1336,71 +2395,27 @@ def main():
     
     # Запускаем мониторинг задач в отдельном потоке
     def monitor_tasks():
-        global current_stats, last_check_time, is_paused, pause_until
-        cleanup_counter = 0
+        global current_tasks
         
-        while True:
+        # Сразу показываем уведомления по задачам из кэша (как при опросе - с учетом
+        # режима сводки), первый опрос затем сверит их с Planfix
+        if cached_tasks:
+            current_tasks = cached_tasks
             try:
-                # Проверяем не на паузе ли мы
-                if is_paused:
-                    if pause_until and datetime.datetime.now() >= pause_until:
-                        # Время паузы истекло
-                        resume_monitoring()
-                    else:
-                        # Все еще на паузе
-                        time.sleep(60)  # Проверяем каждую минуту
-                        continue
-                
-                cleanup_closed_windows()
-                
-                # Получаем задачи
-                tasks = planfix_api.get_filtered_tasks()
-                if not tasks:
-                    print("ℹ️ Задач не найдено или ошибка получения")
-                    time.sleep(app_config['check_interval'])
-                    continue
-                    
-                categorized_tasks = categorize_tasks(tasks)
-                
-                # Обновляем статистику
-                current_stats['total'] = len(tasks)
-                current_stats['overdue'] = len(categorized_tasks.get('overdue', []))
-                current_stats['urgent'] = len(categorized_tasks.get('urgent', []))
-                
-                print(f"📊 Найдено задач: {current_stats['total']} (просрочено: {current_stats['overdue']}, срочно: {current_stats['urgent']})")
-                
-                # Показываем уведомления
-                new_notifications = 0
-                for category, tasks_list in categorized_tasks.items():
-                    if not app_config['notifications'].get(category, True):
-                        continue
-                        
-                    for task in tasks_list:
-                        task_id = str(task.get('id'))
-                        title, message = format_task_message(task, category)
-                        
-                        if show_toast_notification(title, message, category, task_id):
-                            new_notifications += 1
-                            print(f"📬 Показано уведомление: {category} - {task.get('name', 'Без названия')}")
-                        time.sleep(1)
-                
-                if new_notifications == 0:
-                    print("📭 Новых уведомлений нет")
-                
-                last_check_time = datetime.datetime.now()
-                update_tray_icon()
-                
-                # Периодическая очистка
-                cleanup_counter += 1
-                if cleanup_counter >= 10:
-                    cleanup_old_closed_tasks()
-                    cleanup_counter = 0
-                
-                time.sleep(app_config['check_interval'])
-                
+                dispatch_notifications(apply_digest_mode(categorize_tasks(cached_tasks)))
             except Exception as e:
-                print(f"❌ Ошибка в мониторинге: {e}")
-                time.sleep(30)
+                print(f"❌ Ошибка показа уведомлений из кэша: {e}")
+        
+        scheduler.schedule_in(0, 'poll')
+        scheduler.schedule(next_midnight(), 'midnight')
+        
+        # Поток спит до ближайшего события планировщика
+        while True:
+            for kind, key in scheduler.wait():
+                try:
+                    handle_scheduled_event(kind, key)
+                except Exception as e:
+                    print(f"❌ Ошибка обработки события {kind}: {e}")
     
     monitor_thread = threading.Thread(target=monitor_tasks, daemon=True)
     monitor_thread.start()
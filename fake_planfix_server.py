@@ -0,0 +1,317 @@
+import gzip
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Dict, Any, Tuple
+from urllib.parse import parse_qs
+
+# Типы фильтров по ролям, которые понимает заглушка (как в Planfix)
+ROLE_FILTER_TYPES = {
+    2: 'assignees',
+    3: 'assigner',
+    4: 'auditors',
+}
+
+def generate_tasks(count: int, users_count: int = 20, seed: int = 42) -> List[Dict[Any, Any]]:
+    """Генерирует синтетические задачи в формате ответа task/list"""
+    rnd = random.Random(seed)
+    statuses = [
+        {'id': 1, 'name': 'Новая'},
+        {'id': 2, 'name': 'В работе'},
+        {'id': 3, 'name': 'Выполненная'},
+    ]
+    tasks = []
+
+    for task_id in range(1, count + 1):
+        end_day = rnd.randint(-10, 30)
+        end_date = time.strftime('%d-%m-%Y', time.localtime(time.time() + end_day * 86400))
+        assignees = rnd.sample(range(1, users_count + 1), k=rnd.randint(1, 3))
+        auditors = rnd.sample(range(1, users_count + 1), k=rnd.randint(0, 2))
+
+        tasks.append({
+            'id': task_id,
+            'name': f'Синтетическая задача {task_id}',
+            'description': 'Описание задачи ' * rnd.randint(5, 40),
+            'endDateTime': {'date': end_date},
+            'startDateTime': {'date': end_date},
+            'status': rnd.choices(statuses, weights=[3, 6, 1])[0],
+            'priority': rnd.choice(['NotUrgent', 'Urgent']),
+            'overdue': end_day < 0,
+            'assignees': {'users': [{'id': f'user:{u}', 'name': f'Сотрудник {u}'} for u in assignees]},
+            'participants': {'users': []},
+            'auditors': {'users': [{'id': f'user:{u}', 'name': f'Сотрудник {u}'} for u in auditors]},
+            'assigner': {'id': f'user:{rnd.randint(1, users_count)}', 'name': 'Постановщик'},
+        })
+
+    return tasks
+
+def generate_users(count: int = 20) -> List[Dict[Any, Any]]:
+    """Генерирует синтетических пользователей в формате ответа user/list"""
+    return [
+        {
+            'id': user_id,
+            'name': 'Сотрудник',
+            'lastname': f'Номер {user_id}',
+            'email': f'user{user_id}@example.com',
+            'position': 'Менеджер',
+        }
+        for user_id in range(1, count + 1)
+    ]
+
+def anonymize_account(tasks: List[Dict], users: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Заменяет названия, описания и имена на синтетический текст той же длины.
+    Структура, роли, сроки и статусы сохраняются, поэтому записанное
+    из рабочего аккаунта можно хранить и прогонять в бенчмарках
+    """
+    def mask(text, label: str) -> str:
+        if not isinstance(text, str) or not text:
+            return text
+        return (label * (len(text) // len(label) + 1))[:len(text)]
+
+    def mask_person(person: Dict) -> Dict:
+        if not isinstance(person, dict):
+            return person
+        return dict(person, name=f"Сотрудник {str(person.get('id', '')).replace('user:', '')}")
+
+    anonymized_tasks = []
+    for task in tasks:
+        task = dict(task, name=mask(task.get('name'), 'Задача '), description=mask(task.get('description'), 'Текст '))
+        for role in ('assignees', 'participants', 'auditors'):
+            if isinstance(task.get(role), dict):
+                task[role] = dict(task[role], users=[mask_person(u) for u in task[role].get('users', [])])
+        if 'assigner' in task:
+            task['assigner'] = mask_person(task['assigner'])
+        anonymized_tasks.append(task)
+
+    anonymized_users = [
+        dict(user, name='Сотрудник', lastname=f"Номер {user.get('id', '')}", midname='',
+             email=f"user{user.get('id', '')}@example.com")
+        for user in users
+    ]
+    return anonymized_tasks, anonymized_users
+
+def save_fixture(path: str, tasks: List[Dict], users: List[Dict]):
+    """Сохраняет аккаунт (задачи и пользователей) в файл фикстуры (.json или .json.gz)"""
+    data = json.dumps({'tasks': tasks, 'users': users}, ensure_ascii=False).encode('utf-8')
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wb') as f:
+        f.write(data)
+
+def load_fixture(path: str) -> Tuple[List[Dict], List[Dict]]:
+    """Загружает задачи и пользователей из файла фикстуры"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        data = json.loads(f.read())
+    return data.get('tasks', []), data.get('users', [])
+
+class FakePlanfixServer:
+    """
+    Локальная заглушка Planfix REST API для бенчмарков без доступа к сети.
+    Поддерживает task/list с пагинацией, filterId и фильтрами по ролям, а также user/list.
+    error_rate - доля запросов, на которые отвечает ошибкой error_status
+    (с заголовком Retry-After, если задан retry_after).
+    max_page_size - наибольший размер страницы, который отдает сервер (в Planfix - 100).
+    include_total - добавлять в ответы списков общее количество (total): клиент тогда
+    запрашивает все страницы одной волной, иначе - волнами до первой неполной страницы
+    """
+    def __init__(self, tasks: List[Dict] = None, latency: float = 0.05, users: List[Dict] = None,
+                 error_rate: float = 0.0, error_status: int = 503, retry_after: float = None,
+                 max_page_size: int = 100, include_total: bool = False):
+        self.tasks = tasks if tasks is not None else generate_tasks(500)
+        self.users = users if users is not None else generate_users()
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.include_total = include_total
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.requests_count = 0
+        self.errors_count = 0
+        self.bytes_sent = 0
+        self._random = random.Random(1)
+        self._filter_cache = {}  # фильтры по ролям: подходящие задачи
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """URL в формате account_url из config.ini"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/rest"
+
+    def start(self) -> 'FakePlanfixServer':
+        """Запускает сервер в фоновом потоке"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+
+                if self.path.endswith('/task/list'):
+                    body = server._task_list(payload)
+                elif self.path.endswith('/user/list'):
+                    body = server._user_list(payload)
+                else:
+                    body = {'result': 'fail', 'error': f'Unknown endpoint {self.path}'}
+
+                server._respond(self, body)
+
+            def do_GET(self):
+                path, _, query = self.path.partition('?')
+                params = parse_qs(query)
+                task_id = path.rstrip('/').rsplit('/', 1)[-1]
+
+                if '/task/' in path and task_id.isdigit():
+                    body = server._task_get(int(task_id), params.get('fields', [''])[0])
+                else:
+                    body = {'result': 'fail', 'error': f'Unknown endpoint {path}'}
+
+                server._respond(self, body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def update_task(self, task_id: int, **changes):
+        """Изменяет поля задачи (как если бы ее отредактировали в Planfix)"""
+        for task in self.tasks:
+            if task['id'] == task_id:
+                task.update(changes)
+                with self._lock:
+                    self._filter_cache.clear()
+                return
+
+    def stop(self):
+        """Останавливает сервер"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _respond(self, handler, body: Dict, status: int = 200):
+        """Отправляет JSON-ответ с искусственной задержкой"""
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            inject_error = self.error_rate and self._random.random() < self.error_rate
+            if inject_error:
+                self.errors_count += 1
+                status = self.error_status
+                body = {'result': 'fail', 'error': 'Injected error'}
+
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            self.requests_count += 1
+            self.bytes_sent += len(data)
+
+        handler.send_response(status)
+        if inject_error and self.retry_after is not None:
+            handler.send_header('Retry-After', str(self.retry_after))
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _task_list(self, payload: Dict) -> Dict:
+        """Обрабатывает task/list"""
+        tasks = self._filtered_tasks(payload.get('filters', []))
+
+        offset = int(payload.get('offset', 0))
+        page_size = min(int(payload.get('pageSize', 100)), self.max_page_size)
+        page = tasks[offset:offset + page_size]
+
+        fields = payload.get('fields')
+        page = [self._project(task, fields) for task in page]
+
+        return self._list_response('tasks', page, len(tasks))
+
+    def _filtered_tasks(self, filters: List[Dict]) -> List[Dict]:
+        """
+        Задачи, подходящие под фильтры по ролям. Результат запоминается до изменения
+        задач, чтобы страницы большого аккаунта не перебирали весь список заново
+        """
+        key = tuple(
+            (ROLE_FILTER_TYPES[f.get('type')], f.get('value'))
+            for f in filters if f.get('type') in ROLE_FILTER_TYPES
+        )
+        if not key:
+            return self.tasks
+
+        with self._lock:
+            tasks = self._filter_cache.get(key)
+        if tasks is None:
+            tasks = self.tasks
+            for role_key, user_value in key:
+                tasks = [t for t in tasks if self._has_role(t, role_key, user_value)]
+            with self._lock:
+                self._filter_cache[key] = tasks
+        return tasks
+
+    def _user_list(self, payload: Dict) -> Dict:
+        """Обрабатывает user/list"""
+        offset = int(payload.get('offset', 0))
+        page_size = min(int(payload.get('pageSize', 100)), self.max_page_size)
+        page = self.users[offset:offset + page_size]
+
+        fields = payload.get('fields')
+        page = [self._project(user, fields) for user in page]
+
+        return self._list_response('users', page, len(self.users))
+
+    def _list_response(self, items_key: str, page: List[Dict], total: int) -> Dict:
+        """Ответ task/list или user/list (с total, если включен include_total)"""
+        if self.include_total:
+            return {'result': 'success', 'total': total, items_key: page}
+        return {'result': 'success', items_key: page}
+
+    def _task_get(self, task_id: int, fields: str) -> Dict:
+        """Обрабатывает GET task/{id}"""
+        for task in self.tasks:
+            if task['id'] == task_id:
+                return {'result': 'success', 'task': self._project(task, fields)}
+        return {'result': 'fail', 'error': f'Task {task_id} not found'}
+
+    @staticmethod
+    def _project(task: Dict, fields: str) -> Dict:
+        """Оставляет в задаче только запрошенные поля"""
+        if not fields:
+            return task
+        wanted = set(fields.split(','))
+        return {k: v for k, v in task.items() if k in wanted}
+
+    @staticmethod
+    def _has_role(task: Dict, role_key: str, user_value: str) -> bool:
+        """Проверяет участие пользователя в задаче в указанной роли"""
+        if role_key == 'assigner':
+            return task.get('assigner', {}).get('id') == user_value
+        return any(u.get('id') == user_value for u in task.get(role_key, {}).get('users', []))
+
+def post_task_event(url: str, task_id, secret: str = '', event: str = 'task.update') -> int:
+    """
+    Отправляет синтетическое webhook-событие Planfix об изменении задачи
+    (в формате, который ожидает webhook_receiver). Возвращает HTTP-статус ответа
+    """
+    data = json.dumps({'event': event, 'task': {'id': str(task_id)}}).encode('utf-8')
+    request = urllib.request.Request(url, data=data, method='POST', headers={'Content-Type': 'application/json'})
+    if secret:
+        request.add_header('X-Webhook-Secret', secret)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return response.status
@@ -0,0 +1,106 @@
+import codecs
+import json
+from typing import Iterable, Iterator, Dict, Any
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+class _Buffer:
+    """Текстовый буфер поверх потока байтов (UTF-8 декодируется по частям)"""
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Дочитывает следующую порцию данных. False - поток закончился"""
+        if self.eof:
+            return False
+
+        # Уже разобранную часть выбрасываем, чтобы буфер не рос
+        self.text = self.text[self.pos:]
+        self.pos = 0
+
+        for chunk in self._chunks:
+            if chunk:
+                self.text += self._decoder.decode(chunk)
+                return True
+
+        self.text += self._decoder.decode(b'', final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Следующий значимый символ (пробелы пропускаются), '' - конец потока"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str):
+        """Пропускает ожидаемый символ"""
+        if self.peek() != char:
+            raise ValueError(f"Ожидался '{char}' в позиции {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Разбирает одно JSON-значение целиком, дочитывая поток при необходимости"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+
+            # Число в самом конце буфера может продолжиться в следующей порции
+            if end == len(self.text) and not self.eof and self.fill():
+                continue
+
+            self.pos = end
+            return value
+
+def iter_array_items(chunks: Iterable[bytes], items_key: str, meta: Dict[str, Any] = None) -> Iterator[Any]:
+    """
+    Потоково разбирает JSON-объект ответа API и выдает элементы массива items_key
+    по одному, не загружая весь ответ в память.
+    Остальные поля верхнего уровня (result, error, total...) складываются в meta
+    """
+    if meta is None:
+        meta = {}
+
+    buffer = _Buffer(chunks)
+    buffer.expect('{')
+    if buffer.peek() == '}':
+        return
+
+    while True:
+        key = buffer.value()
+        buffer.expect(':')
+
+        if key == items_key and buffer.peek() == '[':
+            buffer.expect('[')
+            if buffer.peek() == ']':
+                buffer.pos += 1
+            else:
+                while True:
+                    yield buffer.value()
+                    if buffer.peek() == ',':
+                        buffer.pos += 1
+                        continue
+                    buffer.expect(']')
+                    break
+        else:
+            meta[key] = buffer.value()
+
+        if buffer.peek() == ',':
+            buffer.pos += 1
+            continue
+        buffer.expect('}')
+        return
@@ -0,0 +1,39 @@
+import importlib
+import threading
+from typing import Any
+
+class LazyModule:
+    """
+    Отложенный импорт: модуль (или его атрибут) загружается при первом обращении.
+    Тяжелые GUI-библиотеки (tkinter, pystray, PIL, plyer) так не замедляют запуск
+    и не нужны путям, которые до них не доходят (проверка конфига, бенчмарки).
+    Ошибка импорта возникает при первом использовании, а не при запуске
+    """
+    def __init__(self, name: str, attribute: str = None):
+        self._name = name
+        self._attribute = attribute
+        self._target = None
+        self._lock = threading.Lock()
+
+    def resolve(self) -> Any:
+        """Импортирует модуль (один раз) и возвращает его"""
+        target = self._target
+        if target is None:
+            with self._lock:
+                if self._target is None:
+                    module = importlib.import_module(self._name)
+                    self._target = getattr(module, self._attribute) if self._attribute else module
+                target = self._target
+        return target
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._target is not None
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self.resolve(), item)
+
+    def __repr__(self):
+        name = f"{self._name}.{self._attribute}" if self._attribute else self._name
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<LazyModule {name} ({state})>"
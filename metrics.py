@@ -0,0 +1,202 @@
+"""
+Встроенные метрики: счетчики, таймеры этапов и показатели (gauge).
+Снимаются в горячих местах (запросы к Planfix, разбор JSON, этапы опроса,
+очередь уведомлений) и отдаются в формате Prometheus по локальному HTTP
+или сохраняются в JSON-файл
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Tuple
+
+import serializer
+
+class MetricsRegistry:
+    """
+    Потокобезопасный реестр метрик. Метрика определяется именем и метками:
+    inc('planfix_requests_total', endpoint='task/list', status=200)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}   # (name, labels): значение
+        self._timers = {}     # (name, labels): [count, sum, max]
+        self._gauges = {}     # name: функция без аргументов
+        self._help = {}       # name: описание
+
+    def describe(self, name: str, help_text: str):
+        """Задает описание метрики (строка # HELP)"""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Увеличивает счетчик"""
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Учитывает длительность этапа"""
+        key = (name, self._labels(labels))
+        with self._lock:
+            stats = self._timers.get(key)
+            if stats is None:
+                self._timers[key] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                stats[2] = max(stats[2], seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Замеряет длительность блока with"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def gauge(self, name: str, func: Callable[[], float]):
+        """Регистрирует показатель, значение которого считается при чтении метрик"""
+        self._gauges[name] = func
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Все метрики в виде словаря (для JSON)"""
+        with self._lock:
+            counters = dict(self._counters)
+            timers = {key: list(stats) for key, stats in self._timers.items()}
+
+        result = {'timestamp': time.time(), 'counters': [], 'timers': [], 'gauges': {}}
+        for (name, labels), value in sorted(counters.items()):
+            result['counters'].append({'name': name, 'labels': dict(labels), 'value': value})
+        for (name, labels), (count, total, maximum) in sorted(timers.items()):
+            result['timers'].append({
+                'name': name, 'labels': dict(labels),
+                'count': count, 'sum': round(total, 6), 'max': round(maximum, 6),
+            })
+        for name, value in self._gauge_values().items():
+            result['gauges'][name] = value
+        return result
+
+    def render_prometheus(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        with self._lock:
+            counters = dict(self._counters)
+            timers = {key: list(stats) for key, stats in self._timers.items()}
+
+        lines = []
+        described = set()
+
+        def header(name: str, kind: str):
+            if name in described:
+                return
+            described.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter')
+            lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+        # Строки одной метрики в формате Prometheus должны идти подряд
+        for timer_name in sorted({name for name, _ in timers}):
+            series = sorted((labels, stats) for (name, labels), stats in timers.items() if name == timer_name)
+            header(timer_name, 'summary')
+            for labels, (count, total, _) in series:
+                lines.append(f"{timer_name}_count{self._format_labels(labels)} {count}")
+                lines.append(f"{timer_name}_sum{self._format_labels(labels)} {total:.6f}")
+            header(f"{timer_name}_max", 'gauge')
+            for labels, (_, _, maximum) in series:
+                lines.append(f"{timer_name}_max{self._format_labels(labels)} {maximum:.6f}")
+
+        for name, value in self._gauge_values().items():
+            header(name, 'gauge')
+            lines.append(f"{name} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+    def dump_json(self, path: str):
+        """Сохраняет снимок метрик в JSON-файл"""
+        serializer.dump_file(self.snapshot(), path)
+
+    def reset(self):
+        """Обнуляет счетчики и таймеры (показатели остаются)"""
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def counter_value(self, name: str, **labels) -> float:
+        """Текущее значение счетчика (сумма по всем меткам, если метки не заданы)"""
+        with self._lock:
+            if labels:
+                return self._counters.get((name, self._labels(labels)), 0)
+            return sum(value for (counter, _), value in self._counters.items() if counter == name)
+
+    def _gauge_values(self) -> Dict[str, float]:
+        values = {}
+        for name, func in list(self._gauges.items()):
+            try:
+                values[name] = func()
+            except Exception:
+                continue
+        return values
+
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> Tuple:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    @staticmethod
+    def _format_labels(labels: Tuple) -> str:
+        if not labels:
+            return ''
+        escaped = (
+            f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for key, value in labels
+        )
+        return '{' + ','.join(escaped) + '}'
+
+# Общий реестр процесса
+registry = MetricsRegistry()
+
+registry.describe('planfix_requests_total', 'Запросы к Planfix API по endpoint и HTTP-статусу')
+registry.describe('planfix_request_seconds', 'Длительность запросов к Planfix API')
+registry.describe('planfix_response_bytes_total', 'Получено байт от Planfix API')
+registry.describe('planfix_retries_total', 'Повторы временных ошибок Planfix API')
+registry.describe('json_decode_seconds', 'Разбор JSON-ответов')
+
+def make_metrics_server(host: str, port: int, metrics: MetricsRegistry = registry):
+    """
+    HTTP-сервер метрик: GET /metrics - формат Prometheus, GET /metrics.json - JSON
+    """
+    # http.server нужен только при включенном сервере метрик
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            path = self.path.split('?', 1)[0].rstrip('/')
+            if path.endswith('/metrics.json'):
+                self._respond(200, serializer.dumps(metrics.snapshot()), 'application/json')
+            elif path.endswith('/metrics'):
+                self._respond(200, metrics.render_prometheus().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+            else:
+                self._respond(404, b'Not found\n', 'text/plain')
+
+        def _respond(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+def start_metrics_server(host: str, port: int, metrics: MetricsRegistry = registry):
+    """Запускает сервер метрик в фоновом потоке"""
+    server = make_metrics_server(host, port, metrics)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
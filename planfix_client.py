@@ -0,0 +1,451 @@
+import datetime
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import serializer
+from json_stream import iter_array_items
+from metrics import registry as metrics
+
+# Максимальный размер страницы списков Planfix (task/list, user/list)
+PAGE_SIZE = 100
+
+# HTTP-статусы временных ошибок, при которых запрос повторяется
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Размер порции при потоковом чтении ответа
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class PlanfixError(Exception):
+    """
+    Ошибка запроса к Planfix API (сеть, HTTP-статус или result=fail).
+    transient - временная ошибка (сеть, 429, 5xx), запрос имеет смысл повторить
+    """
+    def __init__(self, message: str, status_code: int = None, transient: bool = False,
+                 retry_after: float = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.transient = transient
+        self.retry_after = retry_after
+
+class PlanfixUnavailableError(PlanfixError):
+    """Planfix временно недоступен: автомат защиты открыт, запросы не отправляются"""
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов «ведро с токенами».
+    Допускает всплеск до capacity запросов, в среднем - не больше rate в секунду.
+    При ответах 429 скорость снижается вдвое, при успешных - постепенно восстанавливается
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Забирает токен, при необходимости дожидаясь его появления"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self):
+        """Снижает скорость после ответа 429"""
+        with self._lock:
+            self.rate = max(self.max_rate / 10, self.rate / 2)
+
+    def speed_up(self):
+        """Понемногу возвращает скорость к заданной после успешного ответа"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+class CircuitBreaker:
+    """
+    Автомат защиты: после failure_threshold подряд неудачных запросов (с учетом повторов)
+    запросы не отправляются reset_timeout секунд. Затем пропускается один пробный запрос:
+    успех закрывает автомат, ошибка открывает его снова
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._open_timeout = reset_timeout
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self._open_timeout:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        """Отмечает запрос, на который Planfix ответил"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Отмечает неудачный запрос"""
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._open_timeout = self.reset_timeout
+            self._trial_in_flight = False
+
+    def trip(self, seconds: float):
+        """Открывает автомат на seconds секунд (Planfix попросил не обращаться - Retry-After)"""
+        with self._lock:
+            self._failures += 1
+            self._opened_at = time.monotonic()
+            self._open_timeout = max(seconds, self.reset_timeout)
+            self._trial_in_flight = False
+
+    def cooldown(self) -> float:
+        """Сколько секунд осталось до пробного запроса (0 - автомат закрыт)"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._open_timeout - (time.monotonic() - self._opened_at))
+
+class PlanfixClient:
+    """
+    Общий клиент Planfix REST API для напоминалки и инструментов администратора.
+    Одна сессия с пулом keep-alive соединений, сжатием gzip и ограничением
+    количества одновременных запросов. Параллельные запросы (страницы списков,
+    запросы по ролям и пользователям) переиспользуют несколько TLS-соединений
+    вместо отдельного рукопожатия на каждый запрос.
+    rate_limit - не больше указанного числа запросов в секунду (0 - без ограничения).
+    Временные ошибки (сеть, 429, 5xx) повторяются до max_retries раз с экспоненциальной
+    задержкой со случайным разбросом; Retry-After из ответа приостанавливает все запросы
+    клиента (Retry-After длиннее backoff_max не пережидается, а открывает автомат защиты
+    на это время). Если Planfix не отвечает, автомат защиты перестает отправлять запросы
+    и сразу выбрасывает PlanfixUnavailableError
+    """
+    def __init__(self, account_url: str, api_token: str, max_concurrency: int = 4,
+                 pool_size: int = 10, timeout: int = 30, rate_limit: float = 0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30,
+                 failure_threshold: int = 5, reset_timeout: float = 60):
+        self.account_url = account_url.rstrip('/')
+        self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._bucket = TokenBucket(rate_limit) if rate_limit and rate_limit > 0 else None
+        self._hold_until = 0.0
+        self._hold_lock = threading.Lock()
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=max(pool_size, self.max_concurrency),
+            max_retries=0
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+            'Authorization': f'Bearer {api_token}'
+        })
+
+    def post(self, endpoint: str, payload: Dict, timeout: int = None) -> Dict[str, Any]:
+        """Выполняет POST-запрос и возвращает JSON-ответ"""
+        return self._request('POST', endpoint, data=serializer.dumps(payload), timeout=timeout)
+
+    def get(self, endpoint: str, params: Dict = None, timeout: int = None) -> Dict[str, Any]:
+        """Выполняет GET-запрос и возвращает JSON-ответ"""
+        return self._request('GET', endpoint, params=params, timeout=timeout)
+
+    def cooldown(self) -> float:
+        """Сколько секунд Planfix считается недоступным (0 - запросы разрешены)"""
+        return self.breaker.cooldown()
+
+    def _request(self, method: str, endpoint: str, timeout: int = None, **kwargs) -> Dict[str, Any]:
+        """
+        Выполняет запрос с лимитами, повторами временных ошибок и автоматом защиты.
+        Параметры items_key/transform включают потоковый разбор ответа (см. _send)
+        """
+        url = f"{self.account_url}/{endpoint.lstrip('/')}"
+
+        if not self.breaker.allow():
+            metrics.inc('planfix_circuit_rejected_total')
+            raise PlanfixUnavailableError(
+                f"Planfix временно недоступен, повтор через {self.breaker.cooldown():.0f} с",
+                transient=True
+            )
+
+        attempt = 0
+        while True:
+            try:
+                data = self._send(method, url, timeout, **kwargs)
+            except PlanfixError as e:
+                if not e.transient:
+                    # Planfix ответил - ошибка в самом запросе
+                    self.breaker.record_success()
+                    raise
+
+                retry_after = e.retry_after
+                if (retry_after or 0) > self.backoff_max:
+                    # Долгую паузу не пережидаем в потоке запроса: запросы сразу
+                    # отклоняются автоматом защиты, опрос переходит в режим degraded
+                    self.breaker.trip(retry_after)
+                    raise
+                if attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    raise
+
+                attempt += 1
+                metrics.inc('planfix_retries_total', endpoint=self._endpoint_label(url))
+                if retry_after is None:
+                    time.sleep(self._backoff(attempt))
+                continue
+            except Exception:
+                self.breaker.record_failure()
+                raise
+
+            self.breaker.record_success()
+            if self._bucket:
+                self._bucket.speed_up()
+            return data
+
+    def _send(self, method: str, url: str, timeout: int = None, items_key: str = None,
+              transform: Callable = None, fields: str = None, **kwargs) -> Dict[str, Any]:
+        """
+        Отправляет один запрос с учетом лимита частоты и одновременных запросов.
+        Если задан items_key, элементы массива ответа сразу пропускаются через
+        transform (None - элемент отбрасывается) и исходные данные не накапливаются
+        """
+        self._throttle()
+
+        endpoint = self._endpoint_label(url)
+        status = 'error'
+        start = time.perf_counter()
+        try:
+            with self._semaphore:
+                try:
+                    response = self.session.request(
+                        method, url, timeout=timeout or self.timeout, stream=items_key is not None, **kwargs
+                    )
+                except requests.RequestException as e:
+                    raise PlanfixError(f"Ошибка соединения: {e}", transient=True) from e
+
+                status = response.status_code
+                if items_key is not None and response.status_code == 200:
+                    with response:
+                        return self._read_items(response, items_key, transform, fields, endpoint)
+
+                if response.status_code != 200:
+                    transient = response.status_code in RETRY_STATUSES
+                    retry_after = self._parse_retry_after(response.headers.get('Retry-After')) if transient else None
+                    if response.status_code == 429:
+                        if self._bucket:
+                            self._bucket.slow_down()
+                        if retry_after is None:
+                            retry_after = self._backoff(1)
+                    if retry_after is not None:
+                        # Пауза для всех потоков не дольше backoff_max, остальное - автомат защиты
+                        self._hold(min(retry_after, self.backoff_max))
+                    raise PlanfixError(
+                        f"HTTP {response.status_code}: {response.text[:200]}",
+                        response.status_code,
+                        transient=transient,
+                        retry_after=retry_after
+                    )
+
+                metrics.inc('planfix_response_bytes_total', len(response.content), endpoint=endpoint)
+                try:
+                    with metrics.timer('json_decode_seconds', endpoint=endpoint):
+                        data = serializer.loads(response.content)
+                except ValueError as e:
+                    raise PlanfixError(f"Некорректный JSON в ответе: {e}", response.status_code) from e
+        finally:
+            metrics.observe('planfix_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+            metrics.inc('planfix_requests_total', endpoint=endpoint, status=status)
+
+        if isinstance(data, dict) and data.get('result') == 'fail':
+            raise PlanfixError(f"API: {data.get('error', 'Неизвестная ошибка')}", response.status_code)
+
+        return data
+
+    def _endpoint_label(self, url: str) -> str:
+        """Endpoint для меток метрик: без адреса аккаунта и с {id} вместо номеров"""
+        path = url[len(self.account_url):] if url.startswith(self.account_url) else url
+        return '/'.join('{id}' if part.isdigit() else part for part in path.strip('/').split('/'))
+
+    def _read_items(self, response, items_key: str, transform: Callable = None,
+                    fields: str = None, endpoint: str = None) -> Dict[str, Any]:
+        """
+        Читает массив items_key из ответа.
+        Со стандартным json ответ разбирается потоково по элементам. С быстрой
+        библиотекой (orjson/msgspec) страница (не больше PAGE_SIZE элементов) разбирается
+        целиком, а с msgspec - сразу в компактные записи только с полями fields
+        """
+        items = []
+        received = 0
+        try:
+            if serializer.BACKEND == 'json':
+                # Разбор идет вперемешку с чтением сети, поэтому отдельно не замеряется
+                data = {}
+                source = iter_array_items(self._count_bytes(response, endpoint), items_key, data)
+            else:
+                content = response.content
+                metrics.inc('planfix_response_bytes_total', len(content), endpoint=endpoint)
+                with metrics.timer('json_decode_seconds', endpoint=endpoint):
+                    data = serializer.decode_list(content, items_key, fields)
+                source = data.pop(items_key, None) or []
+
+            for item in source:
+                received += 1
+                if transform is not None:
+                    item = transform(item)
+                    if item is None:
+                        continue
+                items.append(item)
+        except requests.RequestException as e:
+            raise PlanfixError(f"Ошибка соединения: {e}", transient=True) from e
+        except ValueError as e:
+            raise PlanfixError(f"Некорректный JSON в ответе: {e}", response.status_code) from e
+
+        if data.get('result') == 'fail':
+            raise PlanfixError(f"API: {data.get('error', 'Неизвестная ошибка')}", response.status_code)
+
+        data[items_key] = items
+        data['_received'] = received
+        return data
+
+    @staticmethod
+    def _count_bytes(response, endpoint: str) -> Iterable[bytes]:
+        """Порции потокового ответа с учетом полученных байт в метриках"""
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            metrics.inc('planfix_response_bytes_total', len(chunk), endpoint=endpoint)
+            yield chunk
+
+    def _throttle(self):
+        """Дожидается окончания паузы по Retry-After и токена лимита частоты"""
+        with self._hold_lock:
+            delay = self._hold_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        if self._bucket:
+            self._bucket.acquire()
+
+    def _hold(self, seconds: float):
+        """Приостанавливает все запросы клиента на seconds секунд"""
+        with self._hold_lock:
+            self._hold_until = max(self._hold_until, time.monotonic() + seconds)
+
+    def _backoff(self, attempt: int) -> float:
+        """Экспоненциальная задержка перед повтором со случайным разбросом (full jitter)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _parse_retry_after(value: str) -> float:
+        """Разбирает заголовок Retry-After (секунды или HTTP-дата)"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_at - datetime.datetime.now(retry_at.tzinfo)).total_seconds())
+
+    def map(self, func: Callable, items: Iterable) -> List:
+        """
+        Выполняет func для каждого элемента параллельно (не больше max_concurrency потоков).
+        Результаты возвращаются в порядке элементов
+        """
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=min(len(items), self.max_concurrency)) as executor:
+            return list(executor.map(func, items))
+
+    def fetch_pages(self, endpoint: str, payload: Dict, items_key: str,
+                    transform: Callable = None) -> List[Any]:
+        """
+        Получает все страницы списка (task/list, user/list).
+        Первая страница запрашивается сразу, остальные - параллельно. Если API вернул
+        общее количество, все оставшиеся страницы запрашиваются одной волной, иначе -
+        волнами по max_concurrency до первой неполной страницы.
+        Ответы разбираются потоково; transform, если задан, применяется к каждому
+        элементу по мере получения (None - элемент отбрасывается), так что в памяти
+        копятся только итоговые записи.
+        Результат упорядочен по offset и без дублей по id
+        """
+        def keyed(item):
+            # id сохраняется для удаления дублей, даже если transform его не оставит
+            record = transform(item) if transform is not None else item
+            return None if record is None else (item.get('id'), record)
+
+        def fetch_page(offset: int):
+            data = self._request(
+                'POST', endpoint, data=serializer.dumps(dict(payload, offset=offset, pageSize=PAGE_SIZE)),
+                items_key=items_key, transform=keyed, fields=payload.get('fields')
+            )
+            # Длина страницы нужна до фильтрации - по ней определяется последняя страница
+            return data[items_key], data.get('_received', 0), data.get('total')
+
+        first_items, first_received, total = fetch_page(0)
+        pages = {0: first_items}
+
+        if first_received >= PAGE_SIZE:
+            if total is not None:
+                offsets = list(range(PAGE_SIZE, int(total), PAGE_SIZE))
+                pages.update(zip(offsets, (items for items, _, _ in self.map(fetch_page, offsets))))
+            else:
+                next_offset = PAGE_SIZE
+                while True:
+                    offsets = [next_offset + i * PAGE_SIZE for i in range(self.max_concurrency)]
+                    results = self.map(fetch_page, offsets)
+                    pages.update(zip(offsets, (items for items, _, _ in results)))
+
+                    if any(received < PAGE_SIZE for _, received, _ in results):
+                        break
+                    next_offset = offsets[-1] + PAGE_SIZE
+
+        all_items = []
+        ids_seen = set()
+        for offset in sorted(pages):
+            for item_id, record in pages[offset]:
+                if item_id not in ids_seen:
+                    ids_seen.add(item_id)
+                    all_items.append(record)
+
+        return all_items
+
+    def close(self):
+        """Закрывает соединения"""
+        self.session.close()
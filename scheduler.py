@@ -0,0 +1,68 @@
+import datetime
+import heapq
+import itertools
+import threading
+from typing import List, Tuple, Hashable
+
+class EventScheduler:
+    """
+    Планировщик событий на куче.
+    Поток мониторинга спит в wait() до ближайшего события (опрос API, окончание
+    отложенного уведомления, смена суток, окончание паузы) и ничего не делает между ними.
+    Событие определяется парой (вид, ключ); повторное планирование заменяет прежнее
+    """
+    def __init__(self):
+        self._heap = []
+        self._latest = {}  # (kind, key): порядковый номер актуальной записи
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+    def schedule(self, when: datetime.datetime, kind: str, key: Hashable = None):
+        """Планирует событие на момент when (заменяет ранее запланированное с тем же ключом)"""
+        with self._condition:
+            seq = next(self._counter)
+            self._latest[(kind, key)] = seq
+            heapq.heappush(self._heap, (when, seq, kind, key))
+            self._condition.notify()
+
+    def schedule_in(self, seconds: float, kind: str, key: Hashable = None):
+        """Планирует событие через seconds секунд"""
+        self.schedule(datetime.datetime.now() + datetime.timedelta(seconds=seconds), kind, key)
+
+    def cancel(self, kind: str, key: Hashable = None):
+        """Отменяет запланированное событие"""
+        with self._condition:
+            self._latest.pop((kind, key), None)
+
+    def is_scheduled(self, kind: str, key: Hashable = None) -> bool:
+        """Проверяет, запланировано ли событие"""
+        with self._condition:
+            return (kind, key) in self._latest
+
+    def wait(self) -> List[Tuple[str, Hashable]]:
+        """
+        Блокирует поток до наступления ближайшего события.
+        Возвращает список наступивших событий [(kind, key), ...]
+        """
+        with self._condition:
+            while True:
+                now = datetime.datetime.now()
+                due = []
+
+                while self._heap:
+                    when, seq, kind, key = self._heap[0]
+                    if self._latest.get((kind, key)) != seq:
+                        # Запись отменена или заменена более новой
+                        heapq.heappop(self._heap)
+                        continue
+                    if when > now:
+                        break
+                    heapq.heappop(self._heap)
+                    del self._latest[(kind, key)]
+                    due.append((kind, key))
+
+                if due:
+                    return due
+
+                timeout = (self._heap[0][0] - now).total_seconds() if self._heap else None
+                self._condition.wait(timeout)
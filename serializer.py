@@ -0,0 +1,120 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict, List
+
+# Быстрые JSON-библиотеки необязательны: без них используется стандартный json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+elif msgspec is not None:
+    BACKEND = 'msgspec'
+else:
+    BACKEND = 'json'
+
+# Типизированный разбор списков (только запрошенные поля, без промежуточных словарей)
+TYPED_DECODING = msgspec is not None
+
+if msgspec is not None:
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+
+def dumps(obj: Any) -> bytes:
+    """Сериализует объект в JSON (UTF-8)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    if msgspec is not None:
+        return _msgspec_encoder.encode(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def loads(data) -> Any:
+    """Разбирает JSON из bytes или str. Ошибки разбора - ValueError"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if msgspec is not None:
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+    return json.loads(data)
+
+def dump_file(obj: Any, path: str):
+    """Сохраняет объект в JSON-файл с отступами (читаемый человеком)"""
+    if msgspec is not None:
+        # msgspec умеет сериализовать и записи типизированного разбора
+        data = msgspec.json.format(_msgspec_encoder.encode(obj), indent=2)
+    elif orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def load_file(path: str) -> Any:
+    """Загружает JSON-файл"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+def decode_list(data: bytes, items_key: str, fields: str = None) -> Dict[str, Any]:
+    """
+    Разбирает ответ списка (task/list, user/list).
+    С msgspec и известным списком полей элементы разбираются сразу в компактные
+    записи только с этими полями (остальные поля ответа пропускаются без создания
+    объектов). Записи поддерживают get() и [] как словари
+    """
+    if not TYPED_DECODING or not fields:
+        return loads(data)
+
+    names = tuple(sorted({name.strip() for name in fields.split(',') if name.strip()}))
+    if not all(name.isidentifier() for name in names):
+        return loads(data)
+
+    try:
+        payload = _list_decoder(items_key, names).decode(data)
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
+
+    return {
+        'result': payload.result,
+        'error': payload.error,
+        'total': payload.total,
+        items_key: getattr(payload, items_key),
+    }
+
+def _record_get(self, key: str, default=None):
+    value = getattr(self, key, None)
+    return default if value is None else value
+
+def _record_getitem(self, key: str):
+    try:
+        return getattr(self, key)
+    except AttributeError:
+        raise KeyError(key) from None
+
+@lru_cache(maxsize=32)
+def _list_decoder(items_key: str, names: tuple):
+    """Декодер ответа списка с элементами из полей names"""
+    record_type = msgspec.defstruct(
+        'PlanfixRecord',
+        [(name, Any, None) for name in names],
+        namespace={'get': _record_get, '__getitem__': _record_getitem}
+    )
+    list_type = msgspec.defstruct(
+        'PlanfixList',
+        [
+            ('result', Any, None),
+            ('error', Any, None),
+            ('total', Any, None),
+            (items_key, List[record_type], []),
+        ]
+    )
+    return msgspec.json.Decoder(list_type)
@@ -0,0 +1,120 @@
+import datetime
+import sqlite3
+import threading
+from typing import List, Dict, Iterable, Optional
+
+import serializer
+from task_model import Task
+
+class TaskCache:
+    """
+    Локальное хранилище состояния напоминалки (SQLite):
+    последний снимок задач, догруженные поля уведомлений (профиль classify),
+    закрытые/отложенные уведомления и время последней проверки.
+    Позволяет показать категории и статистику сразу после запуска, до первого запроса к API
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                position INTEGER NOT NULL,
+                task_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS details (
+                task_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS closed_tasks (
+                task_id TEXT PRIMARY KEY,
+                closed_time TEXT NOT NULL,
+                snooze_until TEXT,
+                auto_closed INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._conn.commit()
+
+    def load_tasks(self) -> List[Task]:
+        """Загружает последний сохраненный снимок задач"""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM tasks ORDER BY position").fetchall()
+        return [Task.from_dict(serializer.loads(data)) for (data,) in rows]
+
+    def save_tasks(self, tasks: List[Task]):
+        """Заменяет сохраненный снимок задач"""
+        rows = [
+            (position, str(task.id), serializer.dumps(task.to_dict()).decode('utf-8'))
+            for position, task in enumerate(tasks)
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tasks")
+            self._conn.executemany("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?)", rows)
+
+    def load_details(self) -> List[Task]:
+        """Загружает сохраненные записи с полями уведомлений"""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM details").fetchall()
+        return [Task.from_dict(serializer.loads(data)) for (data,) in rows]
+
+    def save_details(self, tasks: Iterable[Task]):
+        """Заменяет сохраненные записи с полями уведомлений"""
+        rows = [(str(task.id), serializer.dumps(task.to_dict()).decode('utf-8')) for task in tasks]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM details")
+            self._conn.executemany("INSERT OR REPLACE INTO details VALUES (?, ?)", rows)
+
+    def load_closed_tasks(self) -> Dict[str, Dict]:
+        """Загружает закрытые и отложенные уведомления"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id, closed_time, snooze_until, auto_closed FROM closed_tasks"
+            ).fetchall()
+
+        closed = {}
+        for task_id, closed_time, snooze_until, auto_closed in rows:
+            closed[task_id] = {
+                'closed_time': datetime.datetime.fromisoformat(closed_time),
+                'snooze_until': datetime.datetime.fromisoformat(snooze_until) if snooze_until else None,
+                'auto_closed': bool(auto_closed)
+            }
+        return closed
+
+    def save_closed_tasks(self, closed_tasks: Dict[str, Dict]):
+        """Заменяет сохраненные закрытые и отложенные уведомления"""
+        rows = [
+            (
+                task_id,
+                info['closed_time'].isoformat(),
+                info['snooze_until'].isoformat() if info['snooze_until'] else None,
+                int(info.get('auto_closed', False))
+            )
+            for task_id, info in list(closed_tasks.items())
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM closed_tasks")
+            self._conn.executemany("INSERT INTO closed_tasks VALUES (?, ?, ?, ?)", rows)
+
+    def load_last_check_time(self) -> Optional[datetime.datetime]:
+        """Загружает время последней успешной проверки"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_check_time'").fetchone()
+        return datetime.datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def save_last_check_time(self, check_time: datetime.datetime):
+        """Сохраняет время последней успешной проверки"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('last_check_time', ?)",
+                (check_time.isoformat(),)
+            )
+
+    def close(self):
+        """Закрывает базу"""
+        with self._lock:
+            self._conn.close()
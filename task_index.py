@@ -0,0 +1,136 @@
+from collections import defaultdict
+from typing import List, Dict, Any, Iterable, Set
+
+from task_model import REPORT_CLOSED_STATUSES, normalize_user_id
+
+# Роли пользователя в задаче (как в колонках отчета администратора)
+ROLE_NAMES = ('assignee', 'assigner', 'auditor')
+
+# Поля задачи, достаточные для построения индекса
+INDEX_FIELDS = "id,status,overdue,assignees,participants,auditors,assigner"
+
+class TaskIndex:
+    """
+    Инвертированный индекс активных задач: (id пользователя, роль) -> множество id задач.
+    Строится по одной выгрузке всего списка задач, после чего статистика любого
+    пользователя считается операциями над множествами без запросов к API.
+    Участники задачи учитываются как контролеры (колонка "КОНТР")
+    """
+    def __init__(self):
+        self.by_user_role = defaultdict(set)  # (user_id, role): {task_id}
+        self.overdue_ids = set()
+        self.tasks_count = 0
+
+    @classmethod
+    def build(cls, tasks: Iterable[Dict[Any, Any]]) -> 'TaskIndex':
+        """Строит индекс по задачам из task/list"""
+        return cls.from_entries(cls.entry(task) for task in tasks)
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[tuple]) -> 'TaskIndex':
+        """Строит индекс по компактным записям entry()"""
+        index = cls()
+        for entry in entries:
+            index.add_entry(entry)
+        return index
+
+    @classmethod
+    def entry(cls, task: Dict[Any, Any]) -> tuple:
+        """
+        Компактная запись задачи для индекса: (id, просрочена, ((пользователь, роль), ...)).
+        Для закрытых задач возвращает None. Подходит как transform потоковой загрузки,
+        чтобы не хранить исходные словари задач
+        """
+        status = task.get('status', {})
+        status_name = status.get('name', '') if isinstance(status, dict) else str(status)
+        if status_name in REPORT_CLOSED_STATUSES:
+            return None
+
+        memberships = [
+            (normalize_user_id(user.get('id', '')), 'assignee')
+            for user in cls._users(task.get('assignees'))
+        ]
+
+        assigner = task.get('assigner')
+        if isinstance(assigner, dict) and assigner.get('id'):
+            memberships.append((normalize_user_id(assigner['id']), 'assigner'))
+
+        for key in ('auditors', 'participants'):
+            memberships.extend(
+                (normalize_user_id(user.get('id', '')), 'auditor')
+                for user in cls._users(task.get(key))
+            )
+
+        return task.get('id'), bool(task.get('overdue', False)), tuple(memberships)
+
+    def add(self, task: Dict[Any, Any]):
+        """Добавляет задачу в индекс (закрытые задачи пропускаются)"""
+        self.add_entry(self.entry(task))
+
+    def add_entry(self, entry: tuple):
+        """Добавляет компактную запись entry() в индекс"""
+        if entry is None:
+            return
+
+        task_id, overdue, memberships = entry
+        self.tasks_count += 1
+        if overdue:
+            self.overdue_ids.add(task_id)
+
+        for membership in memberships:
+            self.by_user_role[membership].add(task_id)
+
+    def remove_entry(self, entry: tuple):
+        """Удаляет ранее добавленную запись entry() из индекса"""
+        if entry is None:
+            return
+
+        task_id, overdue, memberships = entry
+        self.tasks_count -= 1
+        if overdue:
+            self.overdue_ids.discard(task_id)
+
+        for membership in memberships:
+            ids = self.by_user_role.get(membership)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del self.by_user_role[membership]
+
+    def task_ids(self, user_id, role: str = None) -> Set:
+        """Активные задачи пользователя в роли (или во всех ролях)"""
+        user_key = normalize_user_id(user_id)
+        roles = ROLE_NAMES if role is None else (role,)
+
+        ids = set()
+        for role_name in roles:
+            ids |= self.by_user_role.get((user_key, role_name), set())
+        return ids
+
+    def users(self) -> Set[str]:
+        """Пользователи, участвующие хотя бы в одной активной задаче"""
+        return {user_key for user_key, _ in self.by_user_role}
+
+    def stats(self, user_id) -> Dict[str, int]:
+        """Статистика пользователя в формате PlanfixUserManager.get_user_tasks_count"""
+        user_key = normalize_user_id(user_id)
+        stats = {}
+        all_task_ids = set()
+
+        for role_name in ROLE_NAMES:
+            ids = self.by_user_role.get((user_key, role_name), set())
+            all_task_ids |= ids
+            stats[f'{role_name}_count'] = len(ids)
+            stats[f'{role_name}_overdue'] = len(ids & self.overdue_ids)
+
+        stats['total'] = len(all_task_ids)
+        stats['overdue'] = len(all_task_ids & self.overdue_ids)
+        stats['current'] = stats['total'] - stats['overdue']
+        return stats
+
+    @staticmethod
+    def _users(group) -> List[Dict]:
+        """Список пользователей из поля assignees/auditors/participants"""
+        if isinstance(group, dict):
+            return group.get('users', [])
+        return []
@@ -0,0 +1,247 @@
+import datetime
+import re
+from functools import lru_cache
+from typing import Dict, Any
+
+# Битовая маска ролей пользователя в задаче
+ROLE_ASSIGNEE = 1   # исполнитель
+ROLE_ASSIGNER = 2   # постановщик
+ROLE_AUDITOR = 4    # контролер/участник
+
+# Статусы закрытых задач (такие задачи не показываются)
+CLOSED_STATUSES = ('Выполненная', 'Отменена', 'Закрыта', 'Завершенная')
+
+# Статусы, которые отчет администратора не считает активными (исторически только эти два:
+# отмененные и закрытые задачи в отчете учитываются)
+REPORT_CLOSED_STATUSES = ('Выполненная', 'Завершенная')
+
+# Основные форматы дат Planfix: 31-12-2025, 31.12.2025, 2025-12-31
+_DMY_DASH_RE = re.compile(r'(\d{1,2})-(\d{1,2})-(\d{4})')
+_DMY_DOT_RE = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})')
+_YMD_DASH_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})')
+
+@lru_cache(maxsize=4096)
+def parse_end_date(date_str: str):
+    """
+    Разбирает дату окончания задачи (результат кэшируется по исходной строке).
+    Частые форматы разбираются заранее скомпилированными регулярками,
+    остальные - перебором форматов strptime. Возвращает date или None
+    """
+    if not isinstance(date_str, str) or not date_str:
+        return None
+    
+    try:
+        if 'T' in date_str:
+            return datetime.datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
+        
+        for pattern, order in ((_DMY_DASH_RE, 'dmy'), (_DMY_DOT_RE, 'dmy'), (_YMD_DASH_RE, 'ymd')):
+            match = pattern.fullmatch(date_str)
+            if match:
+                first, month, last = (int(part) for part in match.groups())
+                try:
+                    if order == 'dmy':
+                        return datetime.date(last, month, first)
+                    return datetime.date(first, month, last)
+                except ValueError:
+                    break
+        
+        if '-' in date_str:
+            formats_to_try = ['%d-%m-%Y', '%Y-%m-%d', '%d-%m-%y']
+        elif '.' in date_str:
+            formats_to_try = ['%d.%m.%Y', '%d.%m.%y']
+        else:
+            return None
+        
+        for date_format in formats_to_try:
+            try:
+                return datetime.datetime.strptime(date_str, date_format).date()
+            except ValueError:
+                continue
+    except Exception:
+        pass
+    
+    return None
+
+@lru_cache(maxsize=4096)
+def _parse_fallback_end_date(date_str: str):
+    """Разбирает устаревшее поле endDate"""
+    if not isinstance(date_str, str) or not date_str:
+        return None
+    
+    try:
+        if 'T' in date_str:
+            return datetime.datetime.fromisoformat(date_str.replace('Z', '+00:00')).date()
+        for date_format in ['%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y']:
+            try:
+                return datetime.datetime.strptime(date_str, date_format).date()
+            except ValueError:
+                continue
+    except Exception:
+        pass
+    
+    return None
+
+def get_task_end_date(task: Dict):
+    """
+    Возвращает дату окончания задачи (date или None)
+    """
+    end_date_info = task.get('endDateTime')
+    end_date = None
+    
+    if end_date_info:
+        if isinstance(end_date_info, dict):
+            date_str = (end_date_info.get('datetime') or 
+                      end_date_info.get('date') or 
+                      end_date_info.get('dateTimeUtcSeconds'))
+        else:
+            date_str = str(end_date_info)
+        
+        if date_str:
+            end_date = parse_end_date(date_str)
+    
+    if not end_date:
+        end_date = _parse_fallback_end_date(task.get('endDate', ''))
+    
+    return end_date
+
+def normalize_user_id(user_id) -> str:
+    """Приводит id пользователя к виду без префикса 'user:'"""
+    user_id = str(user_id)
+    return user_id[5:] if user_id.startswith('user:') else user_id
+
+@lru_cache(maxsize=64)
+def user_id_variants(user_id) -> frozenset:
+    """
+    Все формы, в которых id пользователя приходит в задачах API ('1', 'user:1', 1).
+    Проверка роли сводится к поиску в множестве без normalize_user_id на каждого участника
+    """
+    user_key = normalize_user_id(user_id)
+    variants = {user_key, f'user:{user_key}'}
+    if user_key.isdigit():
+        variants.add(int(user_key))
+    return frozenset(variants)
+
+class Task:
+    """
+    Компактная запись задачи, получаемая один раз при загрузке из ответа task/list.
+    Хранит только то, что нужно категоризации, уведомлениям и трею
+    """
+    __slots__ = ('id', 'name', 'end_date', 'end_date_text', 'status_id', 'overdue', 'roles', 'assignees')
+
+    def __init__(self, id, name: str, end_date: datetime.date = None, end_date_text: str = 'Не указана',
+                 status_id=None, overdue: bool = False, roles: int = 0, assignees: tuple = ()):
+        self.id = id
+        self.name = name
+        self.end_date = end_date
+        self.end_date_text = end_date_text
+        self.status_id = status_id
+        self.overdue = overdue
+        self.roles = roles
+        self.assignees = assignees
+
+    @classmethod
+    def from_api(cls, task: Dict[Any, Any], user_id: str = None) -> 'Task':
+        """
+        Создает запись из задачи в формате Planfix API.
+        Вызывается для каждой задачи каждого полного опроса, поэтому поля читаются
+        по одному разу, без вспомогательных вызовов на каждого участника
+        """
+        get = task.get
+        end_date_info = get('endDateTime')
+        end_date_text = 'Не указана'
+        end_date = None
+        if end_date_info:
+            # Текст - по date, дата - по datetime (как в get_task_end_date)
+            if isinstance(end_date_info, dict):
+                end_date_text = end_date_info.get('date') or end_date_info.get('datetime') or 'Указана'
+                date_str = (end_date_info.get('datetime') or
+                            end_date_info.get('date') or
+                            end_date_info.get('dateTimeUtcSeconds'))
+            else:
+                end_date_text = date_str = str(end_date_info)
+            if date_str:
+                end_date = parse_end_date(date_str)
+        if not end_date:
+            end_date = _parse_fallback_end_date(get('endDate', ''))
+        
+        status = get('status')
+        status_id = status.get('id') if isinstance(status, dict) else status
+        
+        group = get('assignees')
+        assignee_users = (group.get('users') or ()) if isinstance(group, dict) else ()
+        assignees = tuple([user.get('name', f"ID:{user.get('id')}") for user in assignee_users])
+        
+        roles = 0
+        if user_id is not None:
+            user_keys = user_id_variants(user_id)
+            for user in assignee_users:
+                if user.get('id') in user_keys:
+                    roles = ROLE_ASSIGNEE
+                    break
+            assigner = get('assigner')
+            if isinstance(assigner, dict) and assigner.get('id') in user_keys:
+                roles |= ROLE_ASSIGNER
+            for key in ('auditors', 'participants'):
+                group = get(key)
+                if isinstance(group, dict) and any(user.get('id') in user_keys for user in group.get('users') or ()):
+                    roles |= ROLE_AUDITOR
+                    break
+        
+        return cls(
+            get('id'),
+            get('name', 'Задача без названия'),
+            end_date,
+            end_date_text,
+            status_id,
+            bool(get('overdue', False)),
+            roles,
+            assignees
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Task':
+        """Восстанавливает запись из словаря to_dict (локальный кэш)"""
+        end_date = data.get('end_date')
+        return cls(
+            id=data['id'],
+            name=data.get('name', 'Задача без названия'),
+            end_date=datetime.date.fromisoformat(end_date) if end_date else None,
+            end_date_text=data.get('end_date_text', 'Не указана'),
+            status_id=data.get('status_id'),
+            overdue=data.get('overdue', False),
+            roles=data.get('roles', 0),
+            assignees=tuple(data.get('assignees', ()))
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Сериализует запись в словарь"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'end_date_text': self.end_date_text,
+            'status_id': self.status_id,
+            'overdue': self.overdue,
+            'roles': self.roles,
+            'assignees': list(self.assignees)
+        }
+
+    def fingerprint(self) -> tuple:
+        """Отпечаток полей, по которым определяется изменение задачи"""
+        return (self.status_id, self.end_date, self.overdue)
+
+    @staticmethod
+    def api_fingerprint(task: Dict[Any, Any]) -> tuple:
+        """
+        Тот же отпечаток, но прямо по задаче в формате API - без создания записи.
+        Нужен, чтобы не пересоздавать Task для задач, которые не изменились
+        """
+        status = task.get('status')
+        return (
+            status.get('id') if isinstance(status, dict) else status,
+            get_task_end_date(task),
+            bool(task.get('overdue', False))
+        )
+
+    def __repr__(self):
+        return f"Task(id={self.id!r}, name={self.name!r}, end_date={self.end_date!r}, overdue={self.overdue!r})"
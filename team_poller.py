@@ -0,0 +1,320 @@
+"""
+Общий сервер опроса Planfix для всей команды.
+Опрашивает Planfix один раз за всех сотрудников, держит в памяти индекс задач
+по пользователям и ролям и отдает каждой напоминалке ее задачи по локальному HTTP.
+Напоминалки подключаются настройкой team_server_url в config.ini.
+Запуск: python team_poller.py (настройки - admin_config.ini)
+"""
+
+import configparser
+import datetime
+import ipaddress
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List, Dict, Any, Iterable
+from urllib.parse import urlparse, parse_qs
+
+import serializer
+from admin_user_manager import load_admin_config, load_admin_settings
+from planfix_client import PlanfixClient, PlanfixError
+from task_index import TaskIndex, ROLE_NAMES, INDEX_FIELDS
+from task_model import Task, CLOSED_STATUSES, ROLE_ASSIGNEE, ROLE_ASSIGNER, ROLE_AUDITOR
+
+# Поля для записи задачи и индекса по ролям
+TEAM_FIELDS = "id,name,endDateTime,status,overdue,assignees,participants,auditors,assigner"
+# Проверка изменений между полными загрузками: статус, сроки и участники (без названий)
+PROBE_FIELDS = INDEX_FIELDS + ",endDateTime"
+
+ROLE_BITS = {
+    'assignee': ROLE_ASSIGNEE,
+    'assigner': ROLE_ASSIGNER,
+    'auditor': ROLE_AUDITOR,
+}
+
+def _is_active(task: Dict) -> bool:
+    """Активна ли задача (не в закрытом статусе)"""
+    status = task.get('status', {})
+    status_name = status.get('name', '') if isinstance(status, dict) else str(status)
+    return status_name not in CLOSED_STATUSES
+
+class TeamPoller:
+    """
+    Снимок активных задач всей команды с индексом (пользователь, роль) -> задачи.
+    Первый опрос и каждый full_sync_every-й загружают весь список, остальные
+    проверяют статус, сроки и участников и догружают по id лишь изменившиеся задачи,
+    так что число запросов зависит от изменений, а не от числа рабочих мест
+    """
+    def __init__(self, client: PlanfixClient, full_sync_every: int = 12):
+        self.client = client
+        self.full_sync_every = full_sync_every
+        self.records = {}    # task_id: Task
+        self.entries = {}    # task_id: TaskIndex.entry
+        self.index = TaskIndex()
+        self.version = 0
+        self.last_poll = None
+        self.degraded = False
+        self._position = {}  # task_id: порядок в списке Planfix
+        self._polls_since_full_sync = 0
+        self._responses = {}  # (user_id, roles): (version, тело ответа), сбрасывается каждым опросом
+        self._lock = threading.RLock()
+
+    def poll(self):
+        """Обновляет снимок (ошибки Planfix не сбрасывают последний удачный снимок)"""
+        try:
+            if not self.records or self._polls_since_full_sync >= self.full_sync_every:
+                changed = self._full_sync()
+            else:
+                changed = self._incremental_sync()
+        except PlanfixError as e:
+            with self._lock:
+                self.degraded = True
+                self.version += 1
+            print(f"⚠️ Planfix не ответил, отдается последний снимок: {e}")
+            return
+
+        with self._lock:
+            self.degraded = False
+            self.last_poll = datetime.datetime.now()
+            self.version += 1
+        print(f"📊 Задач в снимке: {len(self.records)}, изменилось: {changed}")
+
+    def _full_sync(self) -> int:
+        """Полностью перезагружает снимок"""
+        loaded = self.client.fetch_pages(
+            "task/list", {"fields": TEAM_FIELDS}, 'tasks',
+            transform=lambda task: (Task.from_api(task), TaskIndex.entry(task)) if _is_active(task) else None
+        )
+
+        with self._lock:
+            changed = sum(
+                1 for record, _ in loaded
+                if record.id not in self.records or self.records[record.id].fingerprint() != record.fingerprint()
+            ) + len(set(self.records) - {record.id for record, _ in loaded})
+            self.records = {record.id: record for record, _ in loaded}
+            self.entries = {record.id: entry for record, entry in loaded}
+            self.index = TaskIndex.from_entries(self.entries.values())
+            self._position = {task_id: position for position, task_id in enumerate(self.records)}
+            self._polls_since_full_sync = 0
+
+        return changed
+
+    def _incremental_sync(self) -> int:
+        """
+        Проверяет статус, сроки и участников всех задач и догружает только изменившиеся.
+        Задача считается изменившейся, если у нее другой отпечаток Task или другая
+        запись индекса (сменились исполнители, постановщик или контролеры)
+        """
+        probe = self.client.fetch_pages(
+            "task/list", {"fields": PROBE_FIELDS}, 'tasks',
+            transform=lambda task: (Task.api_fingerprint(task), TaskIndex.entry(task)) if _is_active(task) else None
+        )
+        self._polls_since_full_sync += 1
+
+        with self._lock:
+            probe_ids = [entry[0] for _, entry in probe]
+            removed = set(self.records) - set(probe_ids)
+            changed_ids = [
+                entry[0] for fingerprint, entry in probe
+                if entry[0] not in self.records
+                or self.records[entry[0]].fingerprint() != fingerprint
+                or self.entries.get(entry[0]) != entry
+            ]
+
+        details = self.client.map(self._get_task, changed_ids)
+
+        with self._lock:
+            for task_id in removed:
+                self.records.pop(task_id, None)
+                self.index.remove_entry(self.entries.pop(task_id, None))
+            self._position = {task_id: position for position, task_id in enumerate(probe_ids)}
+
+            for task_id, task in zip(changed_ids, details):
+                # Если догрузить не удалось, повторим на следующем опросе
+                if not task:
+                    continue
+                self.index.remove_entry(self.entries.pop(task_id, None))
+                self.records[task_id] = Task.from_api(task)
+                self.entries[task_id] = TaskIndex.entry(task)
+                self.index.add_entry(self.entries[task_id])
+
+        return len(removed) + len(changed_ids)
+
+    def _get_task(self, task_id) -> Dict[str, Any]:
+        """Получает одну задачу по id (None при ошибке)"""
+        try:
+            return self.client.get(f"task/{task_id}", params={"fields": TEAM_FIELDS}).get('task')
+        except PlanfixError:
+            return None
+
+    def tasks_for(self, user_id, roles: Iterable[str] = ROLE_NAMES) -> List[Dict[str, Any]]:
+        """Задачи пользователя в указанных ролях (в формате Task.to_dict)"""
+        roles = [role for role in roles if role in ROLE_BITS]
+
+        with self._lock:
+            task_ids = set()
+            for role in roles:
+                task_ids |= self.index.task_ids(user_id, role)
+
+            user_roles = {role: self.index.task_ids(user_id, role) for role in ROLE_NAMES}
+            result = []
+            for task_id in sorted(task_ids, key=lambda task_id: self._position.get(task_id, 0)):
+                data = self.records[task_id].to_dict()
+                data['roles'] = sum(bit for role, bit in ROLE_BITS.items() if task_id in user_roles[role])
+                result.append(data)
+
+        return result
+
+    def response_for(self, user_id: str, roles: tuple) -> bytes:
+        """Тело ответа /tasks (кэшируется до следующего опроса)"""
+        key = (user_id, roles)
+        with self._lock:
+            cached = self._responses.get(key)
+            if cached and cached[0] == self.version:
+                return cached[1]
+            version = self.version
+
+        body = serializer.dumps({
+            'result': 'success',
+            'degraded': self.degraded,
+            'last_poll': self.last_poll.isoformat() if self.last_poll else None,
+            'tasks': self.tasks_for(user_id, roles),
+        })
+
+        with self._lock:
+            if version != self.version:
+                self._responses.clear()
+            self._responses[key] = (version, body)
+        return body
+
+def make_server(poller: TeamPoller, access_token: str, host: str, port: int) -> ThreadingHTTPServer:
+    """
+    HTTP-сервер для напоминалок:
+    GET /tasks?user_id=<id>&roles=assignee,assigner,auditor - задачи сотрудника,
+    GET /health - состояние снимка.
+    Если задан access_token, запросы без заголовка Authorization: Bearer <access_token> отклоняются
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if access_token and self.headers.get('Authorization') != f'Bearer {access_token}':
+                self._respond(401, serializer.dumps({'result': 'fail', 'error': 'Unauthorized'}))
+                return
+
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+
+            if url.path.rstrip('/').endswith('/tasks'):
+                user_id = params.get('user_id', [''])[0]
+                if not user_id:
+                    self._respond(400, serializer.dumps({'result': 'fail', 'error': 'user_id is required'}))
+                    return
+                roles = params.get('roles', [','.join(ROLE_NAMES)])[0]
+                body = poller.response_for(user_id, tuple(sorted(filter(None, roles.split(',')))))
+                self._respond(200, body)
+            elif url.path.rstrip('/').endswith('/health'):
+                self._respond(200, serializer.dumps({
+                    'result': 'success',
+                    'degraded': poller.degraded,
+                    'last_poll': poller.last_poll.isoformat() if poller.last_poll else None,
+                    'tasks_count': len(poller.records),
+                }))
+            else:
+                self._respond(404, serializer.dumps({'result': 'fail', 'error': f'Unknown endpoint {url.path}'}))
+
+        def _respond(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+def run_poll_loop(poller: TeamPoller, interval: int, stop_event: threading.Event):
+    """Опрашивает Planfix каждые interval секунд до установки stop_event"""
+    while not stop_event.is_set():
+        poller.poll()
+        # При недоступности Planfix повторяем не раньше, чем пропустит автомат защиты
+        wait = max(interval, poller.client.cooldown()) if poller.degraded else interval
+        stop_event.wait(wait)
+
+def is_loopback_host(host: str) -> bool:
+    """Доступен ли адрес только с этой машины (localhost, 127.0.0.0/8, ::1)"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def load_team_settings() -> Dict[str, Any]:
+    """Загружает настройки сервера из секции [TeamPoller] admin_config.ini (лимиты запросов - из [Settings])"""
+    config = configparser.ConfigParser()
+    config.read('admin_config.ini', encoding='utf-8')
+
+    settings = load_admin_settings()
+    settings.update({
+        'host': config.get('TeamPoller', 'host', fallback='127.0.0.1'),
+        'port': config.getint('TeamPoller', 'port', fallback=8765),
+        'poll_interval': max(10, config.getint('TeamPoller', 'poll_interval', fallback=60)),
+        'full_sync_every': max(1, config.getint('TeamPoller', 'full_sync_every', fallback=12)),
+        'access_token': config.get('TeamPoller', 'access_token', fallback=''),
+    })
+    return settings
+
+def main():
+    print("🛰️ PLANFIX TEAM POLLER - общий опрос задач для команды")
+    print("=" * 60)
+
+    api_token, account_url = load_admin_config()
+    if not api_token:
+        return
+
+    settings = load_team_settings()
+    if not settings['access_token'] and not is_loopback_host(settings['host']):
+        print(f"❌ Сервер на адресе {settings['host']} доступен по сети: задайте access_token в [TeamPoller]")
+        print("   Без access_token сервер можно запустить только на 127.0.0.1")
+        return
+
+    client = PlanfixClient(
+        account_url, api_token,
+        max_concurrency=settings['max_parallel_requests'],
+        rate_limit=settings['requests_per_second']
+    )
+    poller = TeamPoller(client, full_sync_every=settings['full_sync_every'])
+
+    # Адрес проверяется до первой загрузки, чтобы ошибка в host/port была видна сразу
+    try:
+        server = make_server(poller, settings['access_token'], settings['host'], settings['port'])
+    except OSError as e:
+        print(f"❌ Не удалось запустить сервер на {settings['host']}:{settings['port']}: {e}")
+        print("   Проверьте host и port в секции [TeamPoller] admin_config.ini")
+        return
+
+    print("⏳ Первичная загрузка задач...")
+    poller.poll()
+
+    stop_event = threading.Event()
+    threading.Thread(
+        target=run_poll_loop, args=(poller, settings['poll_interval'], stop_event), daemon=True
+    ).start()
+
+    print(f"✅ Сервер запущен: http://{settings['host']}:{settings['port']} (опрос каждые {settings['poll_interval']} с)")
+    print("   В config.ini сотрудников: team_server_url = http://<адрес сервера>:<порт>")
+    if not settings['access_token']:
+        print("⚠️ access_token не задан - задачи отдаются без проверки доступа (только локально)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Остановка сервера")
+    finally:
+        stop_event.set()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
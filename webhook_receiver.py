@@ -0,0 +1,127 @@
+"""
+Локальный приемник webhook-событий Planfix.
+Planfix (процесс/сценарий с действием "Отправить webhook") сообщает об изменении
+задачи, и напоминалка сразу перепроверяет только ее, не дожидаясь опроса.
+Ожидаемое тело запроса (JSON), например: {"event": "task.update", "task": {"id": "{{Задача.Номер}}"}}
+Номер задачи также принимается в полях task_id/taskId/id и в параметре task_id строки запроса.
+События принимаются только методом POST, номер задачи - только из цифр
+"""
+
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Dict, Any, Optional
+from urllib.parse import urlparse, parse_qs
+
+import serializer
+
+# Максимальный размер тела события (Planfix присылает короткие JSON)
+MAX_BODY_SIZE = 64 * 1024
+
+def task_id_from_event(payload: Dict[str, Any]) -> Optional[str]:
+    """Извлекает номер задачи из тела события (None, если его нет)"""
+    if not isinstance(payload, dict):
+        return None
+
+    task = payload.get('task')
+    candidates = [task.get('id') if isinstance(task, dict) else task]
+    candidates += [payload.get(key) for key in ('task_id', 'taskId', 'id')]
+
+    for candidate in candidates:
+        if candidate is not None and str(candidate).strip():
+            return str(candidate).strip()
+    return None
+
+class WebhookReceiver:
+    """
+    HTTP-приемник событий: на каждое POST-событие с номером задачи вызывает
+    on_task_event(task_id) и сразу отвечает 200, не дожидаясь обработки.
+    Номер задачи подставляется в путь запроса task/{id}, поэтому все, кроме цифр, отклоняется (400).
+    Если задан secret, он должен прийти в заголовке X-Webhook-Secret
+    или в параметре secret строки запроса
+    """
+    def __init__(self, on_task_event: Callable[[str], None], host: str = '127.0.0.1', port: int = 8766,
+                 secret: str = ''):
+        self.on_task_event = on_task_event
+        self.secret = secret
+        self.events_count = 0
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'WebhookReceiver':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                self._handle()
+
+            def _handle(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+
+                if receiver.secret and receiver.secret not in (
+                    self.headers.get('X-Webhook-Secret'), params.get('secret', [None])[0]
+                ):
+                    self._respond(403, {'result': 'fail', 'error': 'Forbidden'})
+                    return
+
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_BODY_SIZE:
+                    self._respond(413, {'result': 'fail', 'error': 'Payload too large'})
+                    return
+
+                payload = {}
+                if length:
+                    try:
+                        payload = serializer.loads(self.rfile.read(length))
+                    except ValueError:
+                        self._respond(400, {'result': 'fail', 'error': 'Invalid JSON'})
+                        return
+
+                task_id = task_id_from_event(payload) or params.get('task_id', [None])[0]
+                if not task_id:
+                    self._respond(400, {'result': 'fail', 'error': 'task id is required'})
+                    return
+                if not (task_id.isascii() and task_id.isdigit()):
+                    self._respond(400, {'result': 'fail', 'error': 'task id must be numeric'})
+                    return
+
+                receiver.events_count += 1
+                try:
+                    receiver.on_task_event(task_id)
+                except Exception as e:
+                    print(f"❌ Ошибка обработки события webhook: {e}")
+                self._respond(200, {'result': 'success'})
+
+            def _respond(self, status: int, body: Dict):
+                data = serializer.dumps(body)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
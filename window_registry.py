@@ -0,0 +1,81 @@
+import threading
+from collections import Counter
+
+class WindowRegistry:
+    """
+    Реестр окон уведомлений с индексом по task_id и счетчиками по категориям.
+    Окно регистрируется при постановке в очередь (add), отмечается при показе
+    (mark_shown) и удаляется при закрытии (remove). Проверки лимитов и расчет
+    позиции выполняются за O(1) без перебора списка окон
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._windows = set()
+        self._by_task = {}               # task_id: окно
+        self._category_counts = Counter()
+        self._shown = set()
+        self._shown_counts = Counter()
+
+    def add(self, window):
+        """Регистрирует окно (в том числе еще не показанное)"""
+        with self._lock:
+            if window in self._windows:
+                return
+            self._windows.add(window)
+            self._category_counts[window.category] += 1
+            if window.task_id:
+                self._by_task[window.task_id] = window
+
+    def mark_shown(self, window):
+        """Отмечает окно как показанное на экране"""
+        with self._lock:
+            if window in self._windows and window not in self._shown:
+                self._shown.add(window)
+                self._shown_counts[window.category] += 1
+
+    def remove(self, window):
+        """Удаляет окно из реестра (повторный вызов безопасен)"""
+        with self._lock:
+            if window not in self._windows:
+                return
+            self._windows.discard(window)
+            self._category_counts[window.category] -= 1
+            if window.task_id and self._by_task.get(window.task_id) is window:
+                del self._by_task[window.task_id]
+            if window in self._shown:
+                self._shown.discard(window)
+                self._shown_counts[window.category] -= 1
+
+    def prune(self):
+        """Удаляет окна, помеченные закрытыми, но не снятые с учета"""
+        with self._lock:
+            for window in [w for w in self._windows if w.is_closed]:
+                self.remove(window)
+
+    def has_task(self, task_id) -> bool:
+        """Есть ли открытое окно для задачи"""
+        with self._lock:
+            return task_id in self._by_task
+
+    def count(self, category: str = None) -> int:
+        """Количество окон (всего или в категории)"""
+        with self._lock:
+            if category is None:
+                return len(self._windows)
+            return self._category_counts[category]
+
+    def shown_count(self, category: str) -> int:
+        """Количество уже показанных окон категории"""
+        with self._lock:
+            return self._shown_counts[category]
+
+    def __len__(self):
+        return self.count()
+
+    def __contains__(self, window):
+        with self._lock:
+            return window in self._windows
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._windows))